@@ -1,195 +1,656 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import networkx as nx
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
 from models import Order, Customer
+import inspect
+import os
 import sqlite3
-from functools import lru_cache
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from scipy import sparse
+from bulk_io import iter_batches
+from cache import CacheInfo, ResultCache
+from charts import CHARTS, network_layout, render_chart
+from columnar import OrderBatch, read_order_batch, to_datetime64
+from db import ConnectionPool, Database, connect, resolve_pragmas
+from migrations import CITY_SQL
+from money import money_column
+from layout import LayoutCache, layout_path
+from rollups import has_rollups
+
+# Число строк матрицы клиент x товар, перемножаемых за один шаг
+NETWORK_BLOCK_SIZE = 512
+
+# Размер пачки при чтении пар (клиент, товар) из базы
+NETWORK_FETCH_SIZE = 50000
+
+# Отсечение графа клиентов по умолчанию: не больше NETWORK_TOP_K связей на
+# клиента, товары с числом покупателей больше NETWORK_MAX_PRODUCT_CUSTOMERS
+# не учитываются (иначе бестселлер дает квадратичное число пар)
+NETWORK_TOP_K = 20
+NETWORK_MAX_PRODUCT_CUSTOMERS = 1000
+
+
+def _month_end_alias() -> str:
+    """Обозначение конца месяца: 'ME' в pandas 2.2+, 'M' в более ранних версиях"""
+    try:
+        pd.tseries.frequencies.to_offset('ME')
+        return 'ME'
+    except ValueError:
+        return 'M'
+
+
+# Частоты pandas для периодов динамики продаж
+SALES_PERIODS = {'D': 'D', 'W': 'W', 'M': _month_end_alias()}
+
+# Колонки загрузчиков DataFrame и их SQL-выражения
+ORDER_COLUMNS = {
+    'id': 'o.id',
+    'customer_id': 'o.customer_id',
+    'order_date': 'o.order_date',
+    'status': 'o.status',
+    'total_amount': 'o.total_cents / 100.0',
+    'customer_name': 'c.name',
+    'email': 'c.email',
+    'address': 'c.address',
+}
+DEFAULT_ORDER_COLUMNS = ['id', 'order_date', 'status', 'total_amount', 'customer_name', 'email', 'address']
+
+CUSTOMER_COLUMNS = {
+    'id': 'id',
+    'name': 'name',
+    'email': 'email',
+    'phone': 'phone',
+    'address': 'address',
+    'registration_date': 'registration_date',
+    'city': CITY_SQL,
+}
+DEFAULT_CUSTOMER_COLUMNS = ['id', 'name', 'email', 'phone', 'address', 'registration_date']
+
+PRODUCT_COLUMNS = dict({name: name for name in ('id', 'name', 'description', 'category', 'stock')},
+                       price='price_cents / 100.0')
+
+# Федеральные округа крупных городов для группировки по регионам
+REGIONS = {
+    'Москва': 'Центральный',
+    'Воронеж': 'Центральный',
+    'Ярославль': 'Центральный',
+    'Санкт-Петербург': 'Северо-Западный',
+    'Калининград': 'Северо-Западный',
+    'Ростов-на-Дону': 'Южный',
+    'Краснодар': 'Южный',
+    'Волгоград': 'Южный',
+    'Махачкала': 'Северо-Кавказский',
+    'Нижний Новгород': 'Приволжский',
+    'Казань': 'Приволжский',
+    'Самара': 'Приволжский',
+    'Уфа': 'Приволжский',
+    'Пермь': 'Приволжский',
+    'Екатеринбург': 'Уральский',
+    'Челябинск': 'Уральский',
+    'Тюмень': 'Уральский',
+    'Новосибирск': 'Сибирский',
+    'Омск': 'Сибирский',
+    'Красноярск': 'Сибирский',
+    'Иркутск': 'Сибирский',
+    'Владивосток': 'Дальневосточный',
+    'Хабаровск': 'Дальневосточный',
+}
+UNKNOWN_CITY = 'Не указан'
+OTHER_REGION = 'Другие'
+
+# Колонки с малым числом различных значений и колонки дат
+CATEGORY_COLUMNS = ('status', 'category', 'city')
+DATE_COLUMNS = ('order_date', 'registration_date')
+
+Frames = Union[pd.DataFrame, Iterator[pd.DataFrame]]
+
+# Отчеты панели аналитики: имя -> (метод DataAnalyzer, аргументы по умолчанию)
+REPORTS = {
+    'top_customers': ('get_top_customers', {}),
+    'top_products': ('get_top_products', {}),
+    'sales_trend': ('get_sales_trend', {'period': 'W'}),
+    'geography': ('get_customer_geography', {}),
+    'regions': ('get_customer_geography', {'by': 'region'}),
+    'network': ('create_customer_network', {}),
+}
+
+# Число потоков для параллельного расчета отчетов
+REPORT_WORKERS = 4
+
+
+class ReportRun(NamedTuple):
+    """Результаты расчета набора отчетов и время каждого из них в секундах"""
+    results: Dict[str, Any]
+    errors: Dict[str, BaseException]
+    timings: Dict[str, float]
+    elapsed: float
+
+
+def _select_list(columns: List[str], available: Dict[str, str]) -> str:
+    """Список выражений SELECT для запрошенных колонок"""
+    unknown = [col for col in columns if col not in available]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return ', '.join(available[col] if available[col] == col else f'{available[col]} AS {col}'
+                     for col in columns)
+
+
+def _parse_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Преобразование колонок дат в datetime64[s] по тем же правилам, что и
+    OrderBatch.order_date (columnar.to_datetime64): пустые и нераспознанные
+    даты - NaT, поэтому сравнения и группировки по датам совпадают.
+    """
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            values = df[col].astype(object)
+            df[col] = to_datetime64(values.where(values.notna(), None).tolist())
+    return df
+
+
+def _freeze(value: Any) -> Any:
+    """Хешируемое представление аргумента для ключа кэша"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+def cached(method):
+    """
+    Кэширование результата метода DataAnalyzer по имени метода и аргументам.
+
+    DataFrame и Series отдаются копиями, чтобы изменения у вызывающего кода
+    не попадали в кэш; графы и прочие объекты отдаются как есть.
+    """
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__name__,) + tuple((name, _freeze(value))
+                                         for name, value in bound.arguments.items())[1:]
+        result = self._cache.get(key, self.data_version(), lambda: method(self, *args, **kwargs))
+        if isinstance(result, (pd.DataFrame, pd.Series)):
+            return result.copy()
+        return result
+
+    return wrapper
 
 
 class DataAnalyzer:
-    def __init__(self, db_path: str = "data/database.db"):
+    def __init__(self, db_path: str = "data/database.db", profile: str = 'default',
+                 cache_size: int = 32, cache_ttl: Optional[float] = 600.0,
+                 report_workers: int = REPORT_WORKERS):
         self.db_path = db_path
-
-    def get_orders_dataframe(self) -> pd.DataFrame:
-        """Получение данных заказов в виде DataFrame"""
-        with sqlite3.connect(self.db_path) as conn:
-            query = '''
-                SELECT o.id, o.order_date, o.status, o.total_amount,
-                       c.name as customer_name, c.email, c.address
-                FROM orders o
-                JOIN customers c ON o.customer_id = c.id
-            '''
-            return pd.read_sql_query(query, conn)
-
-    def get_customers_dataframe(self) -> pd.DataFrame:
-        """Получение данных клиентов в виде DataFrame"""
-        with sqlite3.connect(self.db_path) as conn:
-            return pd.read_sql_query('SELECT * FROM customers', conn)
-
+        self.profile = profile
+        if not os.path.exists(db_path):
+            # Соединение только для чтения не создает файл: новая пустая база
+            # создается в последней версии схемы так же, как в Database
+            Database(db_path, profile).close()
+        # Аналитика только читает: соединения открываются в режиме только для чтения
+        self._pool = ConnectionPool(db_path, resolve_pragmas(profile), read_only=True)
+        # PRAGMA data_version меняется, только когда данные зафиксировало другое
+        # соединение, поэтому версия читается через отдельное соединение без записи
+        self._probe: Optional[sqlite3.Connection] = None
+        self._probe_lock = threading.Lock()
+        self._cache = ResultCache(cache_size, cache_ttl)
+        self.report_workers = report_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Раскладка графа клиентов сохраняется рядом с базой между показами
+        self.layout_cache = LayoutCache(layout_path(db_path))
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Постоянное соединение текущего потока с PRAGMA выбранного профиля"""
+        return self._pool.get()
+
+    def close(self):
+        """Остановка потоков отчетов и закрытие всех открытых соединений"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._pool.close()
+        with self._probe_lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+
+    def data_version(self) -> int:
+        """Версия данных: меняется после каждой фиксации изменений в базе"""
+        with self._probe_lock:
+            if self._probe is None:
+                self._probe = connect(self.db_path, read_only=True)
+            return self._probe.execute('PRAGMA data_version').fetchone()[0]
+
+    def run_reports(self, names: Optional[Iterable[str]] = None,
+                    params: Optional[Dict[str, Dict[str, Any]]] = None) -> ReportRun:
+        """
+        Параллельный расчет отчетов из REPORTS (по умолчанию - всех).
+
+        Каждый отчет выполняется в потоке пула со своим соединением только
+        для чтения; SQLite и pandas отпускают GIL на время запросов, так что
+        общее время близко к времени самого долгого отчета. Пересекающиеся
+        отчеты (города и регионы) используют общий результат через кэш,
+        который вычисляет одинаковые запросы один раз. params задает
+        аргументы отдельных отчетов. Ошибка одного отчета не прерывает
+        остальные и попадает в errors.
+        """
+        names = list(names or REPORTS)
+        unknown = [name for name in names if name not in REPORTS]
+        if unknown:
+            raise ValueError(f"Unknown reports: {', '.join(unknown)}")
+        params = params or {}
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.report_workers,
+                                                thread_name_prefix='report')
+        start = time.perf_counter()
+        futures = {name: self._executor.submit(self._run_report, name, params.get(name, {}))
+                   for name in names}
+
+        results, errors, timings = {}, {}, {}
+        for name, future in futures.items():
+            result, error, timings[name] = future.result()
+            if error is None:
+                results[name] = result
+            else:
+                errors[name] = error
+        return ReportRun(results, errors, timings, time.perf_counter() - start)
+
+    def _run_report(self, name: str, params: Dict[str, Any]) -> Tuple[Any, Optional[BaseException], float]:
+        """Расчет одного отчета в потоке пула: (результат, ошибка, время)"""
+        method, defaults = REPORTS[name]
+        start = time.perf_counter()
+        try:
+            result = getattr(self, method)(**dict(defaults, **params))
+        except Exception as e:
+            return None, e, time.perf_counter() - start
+        return result, None, time.perf_counter() - start
+
+    def cache_info(self) -> CacheInfo:
+        """Статистика кэша результатов"""
+        return self._cache.info()
+
+    def clear_cache(self):
+        """Сброс кэша результатов"""
+        self._cache.clear()
+
+    def _read_frames(self, query: str, params: List[Any], columns: List[str],
+                     chunksize: Optional[int]) -> Frames:
+        """Чтение запроса в DataFrame с типами колонок (или итератор по chunksize строк)"""
+        dtypes = {col: 'category' for col in columns if col in CATEGORY_COLUMNS} or None
+        if chunksize is None:
+            with self._get_connection() as conn:
+                return _parse_dates(pd.read_sql_query(query, conn, params=params, dtype=dtypes))
+
+        def chunks():
+            # Соединение берется в потоке, который читает итератор
+            with self._get_connection() as conn:
+                for chunk in pd.read_sql_query(query, conn, params=params, dtype=dtypes,
+                                               chunksize=chunksize):
+                    yield _parse_dates(chunk)
+
+        return chunks()
+
+    def get_orders_dataframe(self, columns: Optional[List[str]] = None, start: Optional[Any] = None,
+                             end: Optional[Any] = None, chunksize: Optional[int] = None) -> Frames:
+        """
+        Получение данных заказов в виде DataFrame.
+
+        columns - нужные колонки из ORDER_COLUMNS (клиенты присоединяются,
+        только если запрошены их колонки), [start, end] - диапазон дат
+        заказа. order_date возвращается как datetime64[s] (как в OrderBatch), status - как
+        category. При заданном chunksize возвращается итератор DataFrame.
+        """
+        columns = list(columns or DEFAULT_ORDER_COLUMNS)
+        available = dict(ORDER_COLUMNS, total_amount=f"{self._money_column('orders', 'o')} / 100.0")
+        query = f'SELECT {_select_list(columns, available)} FROM orders o'
+        if any(ORDER_COLUMNS[col].startswith('c.') for col in columns):
+            query += ' JOIN customers c ON o.customer_id = c.id'
+
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('o.order_date >= ?')
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            # Конец диапазона включается целиком, вместе со временем заказа
+            conditions.append('o.order_date < ?')
+            params.append((pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).strftime('%Y-%m-%d'))
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+
+        return self._read_frames(query, params, columns, chunksize)
+
+    @cached
+    def get_order_batch(self, start: Optional[Any] = None, end: Optional[Any] = None) -> OrderBatch:
+        """
+        Позиции заказов за [start, end] в колоночном OrderBatch.
+
+        Пакет только для чтения, поэтому из кэша отдается без копирования;
+        итоги и группировки считаются методами OrderBatch на NumPy.
+        """
+        with self._get_connection() as conn:
+            return read_order_batch(conn, start, end)
+
+    def get_customers_dataframe(self, columns: Optional[List[str]] = None,
+                                chunksize: Optional[int] = None) -> Frames:
+        """Получение данных клиентов в виде DataFrame (колонки из CUSTOMER_COLUMNS, включая city)"""
+        columns = list(columns or DEFAULT_CUSTOMER_COLUMNS)
+        available = dict(CUSTOMER_COLUMNS, city=self._city_column())
+        query = f'SELECT {_select_list(columns, available)} FROM customers'
+        return self._read_frames(query, [], columns, chunksize)
+
+    def _city_column(self) -> str:
+        """Колонка city после миграции или выражение по адресу в старых базах"""
+        with self._get_connection() as conn:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(customers)')]
+        return 'city' if 'city' in columns else CITY_SQL
+
+    def _money_column(self, table_name: str, alias: str = '') -> str:
+        """Денежная колонка в копейках (в старых базах - перевод суммы в рублях)"""
+        with self._get_connection() as conn:
+            return money_column(conn, table_name, alias)
+
+    def get_products_dataframe(self, columns: Optional[List[str]] = None,
+                               chunksize: Optional[int] = None) -> Frames:
+        """Получение данных товаров в виде DataFrame (category - как category)"""
+        columns = list(columns or PRODUCT_COLUMNS)
+        available = dict(PRODUCT_COLUMNS, price=f"{self._money_column('products')} / 100.0")
+        query = f'SELECT {_select_list(columns, available)} FROM products'
+        return self._read_frames(query, [], columns, chunksize)
+
+    @cached
     def get_top_customers(self, limit: int = 5) -> pd.DataFrame:
-        """Топ N клиентов по количеству заказов"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Топ N клиентов по количеству заказов (суммы складываются в копейках)"""
+        with self._get_connection() as conn:
+            if not has_rollups(conn):
+                query = f'''
+                    SELECT c.name, c.email, COUNT(o.id) as order_count,
+                           SUM({money_column(conn, 'orders', 'o')}) / 100.0 as total_spent
+                    FROM customers c
+                    LEFT JOIN orders o ON c.id = o.customer_id
+                    GROUP BY c.id
+                    ORDER BY order_count DESC, total_spent DESC
+                    LIMIT ?
+                '''
+                return pd.read_sql_query(query, conn, params=(limit,))
+
+            # Чтение с конца индекса агрегатной таблицы
             query = '''
-                SELECT c.name, c.email, COUNT(o.id) as order_count, 
-                       SUM(o.total_amount) as total_spent
-                FROM customers c
-                LEFT JOIN orders o ON c.id = o.customer_id
-                GROUP BY c.id
-                ORDER BY order_count DESC, total_spent DESC
+                SELECT c.name, c.email, s.order_count, s.total_spent_cents / 100.0 AS total_spent
+                FROM customer_stats s
+                JOIN customers c ON c.id = s.customer_id
+                ORDER BY s.order_count DESC, s.total_spent_cents DESC
                 LIMIT ?
             '''
-            return pd.read_sql_query(query, conn, params=(limit,))
-
-    def get_sales_trend(self, period: str = 'D') -> pd.DataFrame:
-        """Динамика продаж по периодам"""
-        df = self.get_orders_dataframe()
-        df['order_date'] = pd.to_datetime(df['order_date'])
-        df.set_index('order_date', inplace=True)
-
-        if period == 'D':
-            return df.resample('D')['total_amount'].sum().fillna(0)
-        elif period == 'W':
-            return df.resample('W')['total_amount'].sum().fillna(0)
-        elif period == 'M':
-            return df.resample('M')['total_amount'].sum().fillna(0)
-        else:
-            return df.resample('D')['total_amount'].sum().fillna(0)
-
+            df = pd.read_sql_query(query, conn, params=(limit,))
+            if len(df) < limit:
+                # Клиентов с заказами меньше limit: дополняем клиентами без заказов
+                rest = pd.read_sql_query('''
+                    SELECT name, email, 0 as order_count, NULL as total_spent
+                    FROM customers
+                    WHERE id NOT IN (SELECT customer_id FROM customer_stats)
+                    LIMIT ?
+                ''', conn, params=(limit - len(df),))
+                if len(rest):
+                    df = pd.concat([df, rest], ignore_index=True) if len(df) else rest
+                    df['total_spent'] = df['total_spent'].astype(float)
+            return df
+
+    @cached
+    def get_sales_trend(self, period: str = 'D', start: Optional[Any] = None,
+                        end: Optional[Any] = None) -> pd.Series:
+        """
+        Динамика продаж по периодам ('D', 'W' или 'M') за [start, end].
+
+        Читаются только дневные итоги из sales_daily (в базах без нее они
+        считаются группировкой в SQL), недели и месяцы собираются из дней.
+        Суммы складываются в целых копейках и переводятся в рубли в конце.
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('day >= ?')
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            conditions.append('day <= ?')
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+        date_range = ''.join(f' AND {condition}' for condition in conditions)
+
+        with self._get_connection() as conn:
+            if has_rollups(conn, 'sales_daily'):
+                query = f'SELECT day, total_cents FROM sales_daily WHERE 1{date_range} ORDER BY day'
+            else:
+                query = f'''
+                    SELECT day, COALESCE(SUM(cents), 0) AS total_cents
+                    FROM (SELECT date(order_date) AS day, {money_column(conn, 'orders')} AS cents FROM orders)
+                    WHERE day IS NOT NULL{date_range}
+                    GROUP BY day ORDER BY day
+                '''
+            daily = pd.read_sql_query(query, conn, params=params)
+
+        index = pd.DatetimeIndex(pd.to_datetime(daily['day'], format='%Y-%m-%d'), name='order_date')
+        cents = pd.Series(daily['total_cents'].to_numpy(dtype=np.int64), index=index, name='total_amount')
+        return cents.resample(SALES_PERIODS.get(period, 'D')).sum() / 100
+
+    @cached
     def get_top_products(self, limit: int = 10) -> pd.DataFrame:
         """Топ товаров по продажам"""
-        with sqlite3.connect(self.db_path) as conn:
-            query = '''
-                SELECT p.name, p.category, 
-                       SUM(oi.quantity) as total_quantity,
-                       SUM(oi.quantity * oi.unit_price) as total_revenue
-                FROM order_items oi
-                JOIN products p ON oi.product_id = p.id
-                GROUP BY p.id
-                ORDER BY total_revenue DESC
-                LIMIT ?
-            '''
+        with self._get_connection() as conn:
+            if has_rollups(conn):
+                query = '''
+                    SELECT p.name, p.category, s.total_quantity, s.total_revenue_cents / 100.0 AS total_revenue
+                    FROM product_stats s
+                    JOIN products p ON p.id = s.product_id
+                    ORDER BY s.total_revenue_cents DESC
+                    LIMIT ?
+                '''
+            else:
+                query = f'''
+                    SELECT p.name, p.category,
+                           SUM(oi.quantity) as total_quantity,
+                           SUM(oi.quantity * {money_column(conn, 'order_items', 'oi')}) / 100.0 as total_revenue
+                    FROM order_items oi
+                    JOIN products p ON oi.product_id = p.id
+                    GROUP BY p.id
+                    ORDER BY total_revenue DESC
+                    LIMIT ?
+                '''
             return pd.read_sql_query(query, conn, params=(limit,))
 
     def plot_sales_trend(self, period: str = 'D'):
         """Визуализация динамики продаж"""
-        sales_data = self.get_sales_trend(period)
-
-        plt.figure(figsize=(12, 6))
-        sales_data.plot(kind='line', marker='o')
-        plt.title('Динамика продаж')
-        plt.xlabel('Дата')
-        plt.ylabel('Сумма продаж')
-        plt.grid(True)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.show()
+        self._show_chart('sales_trend', self.get_sales_trend(period))
 
     def plot_top_customers(self):
         """Визуализация топ клиентов"""
-        top_customers = self.get_top_customers()
-
-        plt.figure(figsize=(10, 6))
-        plt.barh(top_customers['name'], top_customers['order_count'])
-        plt.title('Топ клиентов по количеству заказов')
-        plt.xlabel('Количество заказов')
-        plt.ylabel('Клиенты')
-        plt.tight_layout()
-        plt.show()
+        self._show_chart('top_customers', self.get_top_customers())
 
     def plot_top_products(self):
         """Визуализация топ товаров"""
-        top_products = self.get_top_products()
-
-        plt.figure(figsize=(12, 6))
-        plt.bar(top_products['name'], top_products['total_revenue'])
-        plt.title('Топ товаров по выручке')
-        plt.xlabel('Товары')
-        plt.ylabel('Выручка')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        plt.show()
-
-    def create_customer_network(self):
-        """Создание графа связей клиентов"""
+        self._show_chart('top_products', self.get_top_products())
+
+    @cached
+    def create_customer_network(self, min_weight: int = 1, top_k: Optional[int] = NETWORK_TOP_K,
+                                max_product_customers: Optional[int] = NETWORK_MAX_PRODUCT_CUSTOMERS,
+                                block_size: int = NETWORK_BLOCK_SIZE) -> nx.Graph:
+        """
+        Создание графа связей клиентов.
+
+        Вес ребра - число различных товаров, купленных обоими клиентами.
+        Параметры отсечения описаны в co_purchase_edges; по умолчанию граф
+        ограничен (NETWORK_TOP_K, NETWORK_MAX_PRODUCT_CUSTOMERS), None
+        отключает отсечение.
+        """
         G = nx.Graph()
 
-        # Получаем данные о заказах и товарах
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             # Добавляем клиентов как узлы
-            customers_df = pd.read_sql_query('SELECT id, name, address FROM customers', conn)
-            for _, row in customers_df.iterrows():
-                G.add_node(row['id'], name=row['name'], address=row['address'])
+            customers = conn.execute('SELECT id, name, address FROM customers').fetchall()
+            G.add_nodes_from((customer_id, {'name': name, 'address': address})
+                             for customer_id, name, address in customers)
 
-            # Добавляем связи между клиентами, которые покупали одинаковые товары
-            query = '''
-                SELECT o1.customer_id as cust1, o2.customer_id as cust2, 
-                       COUNT(DISTINCT oi1.product_id) as common_products
-                FROM order_items oi1
-                JOIN order_items oi2 ON oi1.product_id = oi2.product_id 
-                    AND oi1.order_id != oi2.order_id
-                JOIN orders o1 ON oi1.order_id = o1.id
-                JOIN orders o2 ON oi2.order_id = o2.id
-                WHERE o1.customer_id != o2.customer_id
-                GROUP BY o1.customer_id, o2.customer_id
-                HAVING common_products > 0
-            '''
-            edges_df = pd.read_sql_query(query, conn)
+            # Пары (клиент, товар) читаются пачками в компактные массивы
+            cursor = conn.execute('''
+                SELECT o.customer_id, oi.product_id
+                FROM order_items oi
+                JOIN orders o ON oi.order_id = o.id
+                JOIN customers c ON o.customer_id = c.id
+                WHERE oi.product_id IS NOT NULL
+            ''')
+            batches = [np.array(rows, dtype=np.int64).reshape(-1, 2)
+                       for rows in iter_batches(cursor, NETWORK_FETCH_SIZE)]
 
-            for _, row in edges_df.iterrows():
-                G.add_edge(row['cust1'], row['cust2'], weight=row['common_products'])
+        pairs = np.concatenate(batches) if batches else np.empty((0, 2), dtype=np.int64)
+        sources, targets, weights = co_purchase_edges(
+            pairs[:, 0], pairs[:, 1], min_weight=min_weight, top_k=top_k,
+            max_product_customers=max_product_customers, block_size=block_size)
+        G.add_weighted_edges_from(zip(sources.tolist(), targets.tolist(), weights.tolist()))
 
         return G
 
     def plot_customer_network(self):
         """Визуализация графа клиентов"""
         G = self.create_customer_network()
+        self._show_chart('network', G, pos=network_layout(G, self.layout_cache))
+
+    @cached
+    def get_customer_geography(self, by: str = 'city',
+                               regions: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        Географическое распределение клиентов.
+
+        by='city' - число клиентов по городам, by='region' - по регионам
+        (regions сопоставляет город региону, по умолчанию REGIONS; прочие
+        города попадают в 'Другие'). Группировка выполняется в SQL по
+        колонке city, поэтому адреса в pandas не загружаются.
+        """
+        if by not in ('city', 'region'):
+            raise ValueError(f"Unknown grouping: {by}")
+
+        if by == 'city':
+            query = f'''
+                SELECT {self._city_column()} AS city, COUNT(*) AS count
+                FROM customers
+                GROUP BY 1
+                ORDER BY count DESC, city
+            '''
+            with self._get_connection() as conn:
+                return pd.read_sql_query(query, conn)
 
-        plt.figure(figsize=(14, 10))
-        pos = nx.spring_layout(G, k=1, iterations=50)
-
-        # Рисуем узлы
-        nx.draw_networkx_nodes(G, pos, node_size=500, node_color='lightblue', alpha=0.9)
-
-        # Рисуем ребра с толщиной, пропорциональной весу
-        edges = G.edges(data=True)
-        weights = [data['weight'] for _, _, data in edges]
-        nx.draw_networkx_edges(G, pos, width=[w / 2 for w in weights], alpha=0.6)
-
-        # Подписи узлов
-        labels = {node: G.nodes[node]['name'] for node in G.nodes()}
-        nx.draw_networkx_labels(G, pos, labels, font_size=8)
-
-        plt.title('Граф связей клиентов (по общим товарам)')
-        plt.axis('off')
-        plt.tight_layout()
-        plt.show()
-
-    def get_customer_geography(self) -> pd.DataFrame:
-        """Географическое распределение клиентов"""
-        df = self.get_customers_dataframe()
-
-        # Простой анализ по городам (предполагаем, что город в начале адреса)
-        df['city'] = df['address'].apply(lambda x: x.split(',')[0].strip() if x and ',' in x else 'Не указан')
-
-        return df['city'].value_counts().reset_index()
+        # Регионы собираются из кэшированного распределения по городам
+        df = self.get_customer_geography('city')
+        regions = REGIONS if regions is None else regions
+        region = df['city'].map(regions).where(df['city'] != UNKNOWN_CITY, UNKNOWN_CITY).fillna(OTHER_REGION)
+        grouped = df.groupby(region.rename('region'))['count'].sum()
+        return grouped.sort_values(ascending=False, kind='stable').reset_index()
 
     def plot_customer_geography(self):
         """Визуализация географического распределения"""
-        geo_data = self.get_customer_geography()
-
-        plt.figure(figsize=(12, 8))
-        plt.pie(geo_data['count'], labels=geo_data['city'], autopct='%1.1f%%')
-        plt.title('Географическое распределение клиентов')
-        plt.tight_layout()
-        plt.show()
-
-
-# Функции для сортировки с использованием лямбда-выражений
-sort_orders_by_date = lambda orders: sorted(orders, key=lambda x: x.order_date, reverse=True)
-sort_orders_by_amount = lambda orders: sorted(orders, key=lambda x: x.total_amount, reverse=True)
+        self._show_chart('geography', self.get_customer_geography())
+
+    @staticmethod
+    def _show_chart(name: str, data: Any, **options):
+        """Интерактивный показ графика из charts.CHARTS"""
+        fig = plt.figure(figsize=CHARTS[name].figsize)
+        try:
+            render_chart(name, data, fig, **options)
+            plt.show()
+        finally:
+            plt.close(fig)
+
+
+def co_purchase_edges(customer_ids: np.ndarray, product_ids: np.ndarray, min_weight: int = 1,
+                      top_k: Optional[int] = None, max_product_customers: Optional[int] = None,
+                      block_size: int = NETWORK_BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ребра графа совместных покупок по парам (клиент, товар).
+
+    Строится разреженная бинарная матрица клиент x товар B; веса связей -
+    элементы B @ B.T, которые вычисляются блоками по block_size строк,
+    так что в памяти одновременно находится только один блок произведения.
+    Связи с весом меньше min_weight отбрасываются. При заданном top_k у
+    каждого клиента остаются k самых сильных связей (ребро сохраняется,
+    если оно входит в top_k хотя бы одного из двух клиентов). Товары,
+    купленные более чем max_product_customers клиентами, не учитываются:
+    бестселлер связывает почти всех и делает граф квадратичным.
+
+    Возвращает массивы (клиент 1, клиент 2, вес), где клиент 1 < клиент 2.
+    """
+    customer_ids = np.asarray(customer_ids, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if not len(customer_ids):
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64)
+
+    customers, rows = np.unique(customer_ids, return_inverse=True)
+    products, cols = np.unique(product_ids, return_inverse=True)
+    # Повторные покупки товара суммируются при построении и сводятся к 1
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                                  shape=(len(customers), len(products)))
+    incidence.data[:] = 1
+    if max_product_customers is not None:
+        buyers = np.bincount(incidence.indices, minlength=len(products))
+        incidence = incidence[:, np.flatnonzero(buyers <= max_product_customers)]
+    transposed = incidence.T.tocsr()
+
+    sources, targets, weights = [], [], []
+    for start in range(0, len(customers), block_size):
+        block = (incidence[start:start + block_size] @ transposed).tocoo()
+        row = block.row.astype(np.int64) + start
+        col = block.col.astype(np.int64)
+        data = block.data
+        keep = (data >= min_weight) & (row != col)
+        if top_k is None:
+            # Каждая пара встречается дважды, оставляем одну
+            keep &= row < col
+        row, col, data = row[keep], col[keep], data[keep]
+
+        if top_k is not None and len(data):
+            # Сортировка по клиенту, затем по убыванию веса; ранг - позиция внутри клиента.
+            # Один составной ключ сортируется в несколько раз быстрее lexsort по трем
+            span = int(data.max()) + 1
+            order = np.argsort(((row - start) * span + (span - 1 - data)) * len(customers) + col)
+            row, col, data = row[order], col[order], data[order]
+            rank = np.arange(len(row)) - np.searchsorted(row, row)
+            keep = rank < top_k
+            row, col, data = np.minimum(row, col)[keep], np.maximum(row, col)[keep], data[keep]
+
+        sources.append(row)
+        targets.append(col)
+        weights.append(data)
+
+    row, col, data = np.concatenate(sources), np.concatenate(targets), np.concatenate(weights)
+    if top_k is not None:
+        # Ребро, попавшее в top_k обоих клиентов, оставляем один раз
+        _, unique = np.unique(row * len(customers) + col, return_index=True)
+        row, col, data = row[unique], col[unique], data[unique]
+
+    return customers[row], customers[col], data.astype(np.int64)
+
+
+# Функции для сортировки: списки заказов - через sorted, OrderBatch - через NumPy
+def sort_orders_by_date(orders):
+    """Заказы от новых к старым"""
+    if isinstance(orders, OrderBatch):
+        return orders.sort_orders('date')
+    return sorted(orders, key=lambda x: x.order_date, reverse=True)
+
+
+def sort_orders_by_amount(orders):
+    """Заказы по убыванию суммы"""
+    if isinstance(orders, OrderBatch):
+        return orders.sort_orders('amount')
+    return sorted(orders, key=lambda x: x.total_amount or 0, reverse=True)
 
 
 # Рекурсивная функция для анализа вложенных данных
@@ -0,0 +1,733 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки производительности системы управления заказами
+Запуск: python benchmark.py [имя_бенчмарка ...]
+"""
+
+import csv
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import sqlite3
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+
+import pandas as pd
+
+from analysis import DataAnalyzer, REGIONS, REPORTS, sort_orders_by_amount
+from charts import CHARTS, save_chart
+from dashboard import export_dashboards, store_name
+from layout import LayoutCache
+from db import Database, OutOfStockError, PRAGMA_PROFILES
+from models import Customer, Product, Order
+from money import to_cents
+from validation import validate_frame, validate_rows
+
+
+@contextmanager
+def temp_database(**kwargs):
+    """Временная база данных, удаляемая после бенчмарка"""
+    test_dir = tempfile.mkdtemp()
+    db = Database(os.path.join(test_dir, "bench.db"), **kwargs)
+    try:
+        yield db
+    finally:
+        db.close()
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def measure(func, repeat: int) -> float:
+    """Среднее время одного вызова в микросекундах"""
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def report(title: str, before: float, after: float):
+    print(f"{title:<20} до: {before:9.1f} мкс   после: {after:9.1f} мкс   "
+          f"ускорение: x{before / after:.1f}")
+
+
+def bench_connection(repeat: int = 2000):
+    """Задержка одиночных запросов: новое соединение на вызов против постоянного"""
+    with temp_database() as db:
+        customer_id = db.add_customer(Customer(name="Клиент", email="client@test.com"))
+        product_id = db.add_product(Product(name="Товар", price=10.0, stock=5))
+
+        # Старое поведение: соединение открывается и закрывается на каждый вызов
+        def fresh_get_customer(_):
+            with sqlite3.connect(db.db_path) as conn:
+                conn.execute('SELECT * FROM customers WHERE id = ?', (customer_id,)).fetchone()
+            conn.close()
+
+        def fresh_get_product(_):
+            with sqlite3.connect(db.db_path) as conn:
+                conn.execute('SELECT * FROM products WHERE id = ?', (product_id,)).fetchone()
+            conn.close()
+
+        def fresh_add_customer(i):
+            with sqlite3.connect(db.db_path) as conn:
+                conn.execute('''
+                    INSERT INTO customers (name, email, phone, address, registration_date)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (f"Клиент {i}", "", "", "", ""))
+                conn.commit()
+            conn.close()
+
+        report("get_customer", measure(fresh_get_customer, repeat),
+               measure(lambda _: db.get_customer(customer_id), repeat))
+        report("get_product", measure(fresh_get_product, repeat),
+               measure(lambda _: db.get_product(product_id), repeat))
+        write_repeat = max(repeat // 10, 1)
+        report("add_customer", measure(fresh_add_customer, write_repeat),
+               measure(lambda i: db.add_customer(Customer(name=f"Клиент {i}")), write_repeat))
+
+
+def bench_profiles(orders: int = 500, seconds: float = 2.0):
+    """Пропускная способность записи заказов и конкуренция чтения/записи по профилям PRAGMA"""
+    for profile in PRAGMA_PROFILES:
+        with temp_database(profile=profile) as db:
+            customer = Customer(name="Клиент")
+            customer.id = db.add_customer(customer)
+            product = Product(name="Товар", price=10.0, stock=5)
+            product.id = db.add_product(product)
+
+            def make_order():
+                order = Order(customer=customer)
+                order.add_item(product, 2)
+                return order
+
+            # Пропускная способность: каждый заказ - отдельная транзакция
+            start = time.perf_counter()
+            for _ in range(orders):
+                db.add_order(make_order())
+            insert_rate = orders / (time.perf_counter() - start)
+
+            # Конкуренция: аналитика читает в цикле, пока форма заказов пишет
+            analyzer = DataAnalyzer(db.db_path, profile=profile)
+            stop = threading.Event()
+            reads = [0]
+
+            def reader():
+                while not stop.is_set():
+                    analyzer.get_orders_dataframe()
+                    reads[0] += 1
+
+            thread = threading.Thread(target=reader)
+            thread.start()
+            latencies = []
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                db.add_order(make_order())
+                latencies.append(time.perf_counter() - start)
+            stop.set()
+            thread.join()
+            analyzer.close()
+
+            latencies.sort()
+            print(f"{profile:<12} вставка: {insert_rate:8.0f} заказов/с   "
+                  f"при чтении: {len(latencies) / seconds:7.0f} заказов/с, "
+                  f"{reads[0] / seconds:5.0f} чтений/с, "
+                  f"p99 записи: {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} мс")
+
+
+def bench_import(rows: int = 200000, chunk_size: int = 5000):
+    """Импорт из CSV и JSON: построчный execute против пакетного executemany"""
+    with temp_database() as db:
+        test_dir = os.path.dirname(db.db_path)
+        # order_items имеет индексы, поэтому на ней заметен эффект defer_indexes
+        csv_path = os.path.join(test_dir, "order_items.csv")
+        json_path = os.path.join(test_dir, "order_items.json")
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write("order_id,product_id,quantity,unit_price\n")
+            for i in range(rows):
+                f.write(f"{(i * 7919) % rows},{(i * 104729) % 5000},{i % 10 + 1},{i % 1000}.99\n")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump([{'order_id': i, 'product_id': i % 5000, 'quantity': 1, 'unit_price': 9.99}
+                       for i in range(rows)], f, indent=2)
+
+        # Старое поведение: execute на каждую строку
+        start = time.perf_counter()
+        with sqlite3.connect(db.db_path) as conn:
+            cursor = conn.cursor()
+            with open(csv_path, 'r', encoding='utf-8') as csvfile:
+                reader = csv.reader(csvfile)
+                # Цена в рублях переводится в копейки так же, как в bulk_insert
+                columns = ['unit_price_cents' if col == 'unit_price' else col for col in next(reader)]
+                price_index = columns.index('unit_price_cents')
+                placeholders = ', '.join(['?'] * len(columns))
+                for row in reader:
+                    row[price_index] = to_cents(row[price_index])
+                    cursor.execute(f'INSERT INTO order_items ({", ".join(columns)}) VALUES ({placeholders})', row)
+            conn.commit()
+        conn.close()
+        before = time.perf_counter() - start
+
+        def clear():
+            with db._get_connection() as conn:
+                conn.execute('DELETE FROM order_items')
+
+        clear()
+        stats = db.import_from_csv('order_items', csv_path, chunk_size=chunk_size)
+        clear()
+        deferred = db.import_from_csv('order_items', csv_path, chunk_size=chunk_size, defer_indexes=True)
+        clear()
+
+        print(f"CSV построчно:             {rows / before:10.0f} строк/с")
+        print(f"CSV пакетно:               {stats.rows_per_second:10.0f} строк/с")
+        print(f"CSV пакетно, defer_indexes:{deferred.rows_per_second:10.0f} строк/с")
+
+        # Пиковая память импорта JSON: json.load всего файла против потокового чтения
+        tracemalloc.start()
+        with open(json_path, 'r', encoding='utf-8') as jsonfile:
+            data = json.load(jsonfile)
+        del data
+        loaded_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        stats = db.import_from_json('order_items', json_path, chunk_size=chunk_size)
+        streamed_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(f"JSON json.load, пик памяти:        {loaded_peak / 2 ** 20:8.1f} МБ (только чтение)")
+        print(f"JSON потоковый импорт, пик памяти: {streamed_peak / 2 ** 20:8.1f} МБ")
+
+
+def _export_worker(db_path: str, filename: str, mode: str):
+    """Экспорт в отдельном процессе; возвращает (секунды, байты, прирост пикового RSS в МБ)"""
+    # ru_maxrss в Linux - в КиБ
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    db = Database(db_path)
+    start = time.perf_counter()
+    if mode == 'fetchall-json':
+        # Старое поведение: весь результат и список словарей в памяти
+        with db._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM order_items')
+            rows = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+            data = [dict(zip(columns, row)) for row in rows]
+            with open(filename, 'w', encoding='utf-8') as jsonfile:
+                json.dump(data, jsonfile, indent=2, ensure_ascii=False)
+    elif mode == 'fetchall-csv':
+        with db._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM order_items')
+            rows = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(columns)
+                writer.writerows(rows)
+    elif mode.startswith('csv'):
+        db.export_to_csv('order_items', filename)
+    else:
+        db.export_to_json('order_items', filename)
+    elapsed = time.perf_counter() - start
+    db.close()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, os.path.getsize(filename), (peak - baseline) / 1024
+
+
+def bench_export(rows: int = 500000):
+    """Пиковая память и скорость экспорта order_items в разных форматах"""
+    with temp_database() as db:
+        test_dir = os.path.dirname(db.db_path)
+        db.bulk_insert('order_items', ['order_id', 'product_id', 'quantity', 'unit_price'],
+                       ([i // 3, i % 5000, i % 10 + 1, (i % 1000) + 0.99] for i in range(rows)))
+
+        runs = [
+            ('fetchall-csv', 'old.csv'),
+            ('fetchall-json', 'old.json'),
+            ('csv', 'order_items.csv'),
+            ('csv.gz', 'order_items.csv.gz'),
+            ('json', 'order_items.json'),
+            ('jsonl', 'order_items.jsonl'),
+            ('jsonl.gz', 'order_items.jsonl.gz'),
+        ]
+        for mode, name in runs:
+            # Новый процесс на каждый прогон, чтобы пиковый RSS не накапливался
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                elapsed, size, rss = pool.submit(_export_worker, db.db_path,
+                                                 os.path.join(test_dir, name), mode).result()
+            # МБ/с считается по размеру записанного (для .gz - сжатого) файла
+            print(f"{mode:<14} прирост RSS: {rss:7.1f} МБ   {size / 2 ** 20 / elapsed:7.1f} МБ/с   "
+                  f"{rows / elapsed:9.0f} строк/с   файл: {size / 2 ** 20:6.1f} МБ")
+
+
+def bench_pagination(rows: int = 200000):
+    """Первый экран списка клиентов: полная выборка против keyset-страницы"""
+    with temp_database() as db:
+        db.bulk_insert('customers', ['name', 'email', 'registration_date'],
+                       ([f"Клиент {i:06d}", f"c{i}@test.com", "2024-01-01"] for i in range(rows)))
+
+        start = time.perf_counter()
+        db.get_all_customers()
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        page = db.get_customers_page()
+        first = time.perf_counter() - start
+
+        # Глубокая страница: ключ из середины списка
+        start = time.perf_counter()
+        db.get_customers_page((f"Клиент {rows // 2:06d}", rows // 2))
+        deep = time.perf_counter() - start
+
+        print(f"get_all_customers:    {full * 1000:8.1f} мс ({rows} строк)")
+        print(f"первая страница:      {first * 1000:8.2f} мс ({len(page.rows)} строк)")
+        print(f"страница из середины: {deep * 1000:8.2f} мс")
+
+
+def _fill_purchases(db: Database, customers: int, products: int, items: int):
+    """Клиенты с одним заказом из items товаров; популярность товаров неравномерна"""
+    db.bulk_insert('customers', ['name', 'registration_date'],
+                   ([f"Клиент {i}", "2024-01-01"] for i in range(customers)))
+    db.bulk_insert('orders', ['customer_id', 'order_date', 'status', 'total_amount'],
+                   ([i + 1, "2024-01-01", "completed", 0.0] for i in range(customers)))
+    # Квадрат равномерного числа смещает выбор к товарам с малыми ID
+    db.bulk_insert('order_items', ['order_id', 'product_id', 'quantity', 'unit_price'],
+                   ([i // items + 1, int(products * ((i * 0.6180339887) % 1) ** 2) + 1, 1, 1.0]
+                    for i in range(customers * items)))
+
+
+def bench_network(customers: int = 100000, products: int = 20000, items: int = 5,
+                  small: int = 3000):
+    """Граф совместных покупок: самосоединение order_items против разреженного произведения"""
+    with temp_database() as db:
+        _fill_purchases(db, small, products // 10, items)
+        analyzer = DataAnalyzer(db.db_path)
+
+        # Старое поведение: самосоединение по товару и GROUP BY пар клиентов
+        start = time.perf_counter()
+        with sqlite3.connect(db.db_path) as conn:
+            edges = conn.execute('''
+                SELECT o1.customer_id, o2.customer_id, COUNT(DISTINCT oi1.product_id)
+                FROM order_items oi1
+                JOIN order_items oi2 ON oi1.product_id = oi2.product_id
+                    AND oi1.order_id != oi2.order_id
+                JOIN orders o1 ON oi1.order_id = o1.id
+                JOIN orders o2 ON oi2.order_id = o2.id
+                WHERE o1.customer_id != o2.customer_id
+                GROUP BY o1.customer_id, o2.customer_id
+            ''').fetchall()
+        conn.close()
+        before = time.perf_counter() - start
+
+        start = time.perf_counter()
+        G = analyzer.create_customer_network()
+        after = time.perf_counter() - start
+        analyzer.close()
+
+        print(f"{small} клиентов, самосоединение: {before:8.2f} с ({len(edges) // 2} ребер)")
+        print(f"{small} клиентов, разреженно:     {after:8.2f} с ({G.number_of_edges()} ребер)")
+
+    with temp_database() as db:
+        _fill_purchases(db, customers, products, items)
+        analyzer = DataAnalyzer(db.db_path)
+        # Без отсечения граф на этих данных содержит ~18 млн ребер; {} - отсечение по умолчанию
+        for options in ({}, {'min_weight': 2, 'max_product_customers': None}):
+            start = time.perf_counter()
+            G = analyzer.create_customer_network(**options)
+            elapsed = time.perf_counter() - start
+            # ru_maxrss в Linux - в КиБ
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{customers} клиентов, {options}: {elapsed:6.2f} с, "
+                  f"{G.number_of_edges()} ребер, пиковый RSS {peak:.0f} МБ")
+            del G
+        analyzer.close()
+
+
+def bench_rollups(customers: int = 20000, orders: int = 300000, repeat: int = 20):
+    """Топ-N клиентов и товаров: агрегирование по истории против агрегатных таблиц"""
+    with temp_database() as db:
+        _fill_purchases(db, customers, 2000, 1)
+        db.bulk_insert('products', ['name', 'price', 'category', 'stock'],
+                       ([f"Товар {i}", 9.99, f"Категория {i % 20}", 100] for i in range(2000)))
+        db.bulk_insert('orders', ['customer_id', 'order_date', 'status', 'total_amount'],
+                       ([i % customers + 1, f"2024-{i % 12 + 1:02d}-01", "completed", float(i % 500)]
+                        for i in range(orders)))
+        db.bulk_insert('order_items', ['order_id', 'product_id', 'quantity', 'unit_price'],
+                       ([customers + i + 1, i % 2000 + 1, i % 5 + 1, 9.99] for i in range(orders)))
+        analyzer = DataAnalyzer(db.db_path)
+
+        with sqlite3.connect(db.db_path) as conn:
+            # Старое поведение: COUNT/SUM по всем заказам на каждый запрос
+            customers_before = measure(lambda _: conn.execute('''
+                SELECT c.name, c.email, COUNT(o.id) as order_count, SUM(o.total_cents) as total_spent
+                FROM customers c LEFT JOIN orders o ON c.id = o.customer_id
+                GROUP BY c.id ORDER BY order_count DESC, total_spent DESC LIMIT 5
+            ''').fetchall(), repeat)
+            products_before = measure(lambda _: conn.execute('''
+                SELECT p.name, p.category, SUM(oi.quantity), SUM(oi.quantity * oi.unit_price_cents) as total_revenue
+                FROM order_items oi JOIN products p ON oi.product_id = p.id
+                GROUP BY p.id ORDER BY total_revenue DESC LIMIT 10
+            ''').fetchall(), repeat)
+        conn.close()
+
+        report("get_top_customers", customers_before, measure(lambda _: analyzer.get_top_customers(), repeat))
+        report("get_top_products", products_before, measure(lambda _: analyzer.get_top_products(), repeat))
+        analyzer.close()
+
+
+def bench_trend(orders: int = 500000, days: int = 5 * 365, repeat: int = 5):
+    """Недельная динамика продаж: resample всех заказов против дневных итогов"""
+    with temp_database() as db:
+        db.bulk_insert('customers', ['name'], ([f"Клиент {i}"] for i in range(1000)))
+        db.bulk_insert('orders', ['customer_id', 'order_date', 'status', 'total_amount'],
+                       ([i % 1000 + 1, f"{date.fromordinal(738000 + i % days)} 12:00:00", "completed", 9.99]
+                        for i in range(orders)))
+        analyzer = DataAnalyzer(db.db_path)
+
+        # Старое поведение: весь JOIN заказов с клиентами в pandas и разбор каждой даты
+        def resample_all(_):
+            df = analyzer.get_orders_dataframe()
+            df['order_date'] = pd.to_datetime(df['order_date'])
+            df.set_index('order_date', inplace=True)
+            df.resample('W')['total_amount'].sum().fillna(0)
+
+        report("get_sales_trend('W')", measure(resample_all, repeat),
+               measure(lambda _: analyzer.get_sales_trend('W'), repeat))
+        analyzer.close()
+
+
+def bench_cache(customers: int = 50000, repeat: int = 20):
+    """Повторное открытие графиков: без кэша результатов и с кэшем"""
+    with temp_database() as db:
+        db.bulk_insert('customers', ['name', 'address'],
+                       ([f"Клиент {i}", f"Город {i % 50}, ул. {i}"] for i in range(customers)))
+        uncached = DataAnalyzer(db.db_path, cache_size=0)
+        analyzer = DataAnalyzer(db.db_path)
+        for name in ('get_customer_geography', 'get_sales_trend', 'get_top_customers'):
+            getattr(analyzer, name)()
+            report(name, measure(lambda _: getattr(uncached, name)(), repeat),
+                   measure(lambda _: getattr(analyzer, name)(), repeat))
+        print(analyzer.cache_info())
+        uncached.close()
+        analyzer.close()
+
+
+def bench_loaders(orders: int = 500000):
+    """Загрузка заказов для аналитики: все колонки строками против нужных колонок с типами"""
+    with temp_database() as db:
+        db.bulk_insert('customers', ['name', 'email', 'address'],
+                       ([f"Клиент {i}", f"c{i}@test.com", f"Город {i % 50}, ул. {i}"] for i in range(10000)))
+        db.bulk_insert('orders', ['customer_id', 'order_date', 'status', 'total_amount'],
+                       ([i % 10000 + 1, f"{date.fromordinal(738000 + i % 1000)} 12:00:00",
+                         ('pending', 'completed', 'cancelled')[i % 3], 9.99] for i in range(orders)))
+        analyzer = DataAnalyzer(db.db_path)
+
+        def load(label, func):
+            start = time.perf_counter()
+            df = func()
+            elapsed = time.perf_counter() - start
+            print(f"{label:<34} {elapsed:6.2f} с  {df.memory_usage(deep=True).sum() / 2 ** 20:8.1f} МБ")
+
+        # Старое поведение: JOIN с клиентами, даты и статусы - строки Python
+        with sqlite3.connect(db.db_path) as conn:
+            load("все колонки, строки", lambda: pd.read_sql_query('''
+                SELECT o.id, o.order_date, o.status, o.total_cents / 100.0 as total_amount,
+                       c.name as customer_name, c.email, c.address
+                FROM orders o JOIN customers c ON o.customer_id = c.id
+            ''', conn))
+        conn.close()
+        load("все колонки, типы", analyzer.get_orders_dataframe)
+        load("order_date/status/total_amount", lambda: analyzer.get_orders_dataframe(
+            ['order_date', 'status', 'total_amount']))
+        analyzer.close()
+
+
+def bench_geography(customers: int = 1000000):
+    """География клиентов: apply по адресам в pandas против группировки по колонке city"""
+    cities = list(REGIONS) + ['Тверь', 'Псков']
+    with temp_database() as db:
+        db.bulk_insert('customers', ['name', 'address'],
+                       ([f"Клиент {i}", f"{cities[i % len(cities)]}, ул. {i}" if i % 10 else ""]
+                        for i in range(customers)))
+        analyzer = DataAnalyzer(db.db_path, cache_size=0)
+
+        # Старое поведение: все колонки клиентов и лямбда на каждую строку
+        start = time.perf_counter()
+        with sqlite3.connect(db.db_path) as conn:
+            df = pd.read_sql_query('SELECT * FROM customers', conn)
+        conn.close()
+        df['city'] = df['address'].apply(lambda x: x.split(',')[0].strip() if x and ',' in x else 'Не указан')
+        df['city'].value_counts().reset_index()
+        before = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analyzer.get_customer_geography()
+        by_city = time.perf_counter() - start
+        start = time.perf_counter()
+        analyzer.get_customer_geography('region')
+        by_region = time.perf_counter() - start
+        analyzer.close()
+
+        print(f"apply по адресам:       {before:6.2f} с ({customers} клиентов)")
+        print(f"GROUP BY city:          {by_city:6.2f} с")
+        print(f"по регионам:            {by_region:6.2f} с")
+
+
+def bench_reports(customers: int = 50000, products: int = 5000, items: int = 5):
+    """Обновление всех отчетов: последовательно против параллельного расчета"""
+    with temp_database() as db:
+        _fill_purchases(db, customers, products, items)
+        analyzer = DataAnalyzer(db.db_path, cache_size=0)
+        # Полный граф для такого числа клиентов не помещается в память
+        params = {'network': {'top_k': 20, 'min_weight': 2}}
+        analyzer.run_reports(params=params)  # прогрев пула потоков и соединений
+
+        start = time.perf_counter()
+        for name, (method, defaults) in REPORTS.items():
+            getattr(analyzer, method)(**dict(defaults, **params.get(name, {})))
+        sequential = time.perf_counter() - start
+
+        run = analyzer.run_reports(params=params)
+        analyzer.close()
+
+        print(f"последовательно:        {sequential:6.2f} с")
+        print(f"параллельно:            {run.elapsed:6.2f} с")
+        for name, elapsed in run.timings.items():
+            print(f"  {name:<20} {elapsed:6.2f} с")
+
+
+def bench_dashboard(stores: int = 4, customers: int = 500, products: int = 100, items: int = 3):
+    """Выгрузка всех графиков нескольких магазинов: последовательно против пула процессов"""
+    test_dir = tempfile.mkdtemp()
+    try:
+        db_paths = []
+        for store in range(stores):
+            with Database(os.path.join(test_dir, f"store{store}.db")) as db:
+                _fill_purchases(db, customers, products, items)
+                db_paths.append(db.db_path)
+        params = {'network': {'top_k': 5, 'min_weight': 2}}
+
+        start = time.perf_counter()
+        for db_path in db_paths:
+            analyzer = DataAnalyzer(db_path)
+            run = analyzer.run_reports(list(CHARTS), params)
+            analyzer.close()
+            for name in CHARTS:
+                save_chart(name, run.results[name], os.path.join(test_dir, 'serial', store_name(db_path), name))
+        serial = time.perf_counter() - start
+
+        result = export_dashboards(db_paths, os.path.join(test_dir, 'parallel'), params=params)
+
+        print(f"последовательно:        {serial:6.2f} с ({stores} магазинов, {len(CHARTS)} графиков)")
+        print(f"пул процессов:          {result.elapsed:6.2f} с")
+    finally:
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def bench_layout(customers: int = 100000, products: int = 20000, items: int = 5, small: int = 2000):
+    """Раскладка графа клиентов: полная раскладка против кэша, дорасчета и отсечения"""
+    import networkx as nx
+
+    with temp_database() as db:
+        _fill_purchases(db, customers, products, items)
+        analyzer = DataAnalyzer(db.db_path)
+        G = analyzer.create_customer_network(top_k=20)
+        analyzer.close()
+
+        # Старое поведение: полная раскладка на каждый показ (уже для small клиентов)
+        sample = G.subgraph(list(G)[:small])
+        start = time.perf_counter()
+        nx.spring_layout(sample, k=1, iterations=50)
+        print(f"полная раскладка, {small} клиентов:    {time.perf_counter() - start:6.2f} с")
+
+        path = os.path.join(os.path.dirname(db.db_path), "layout.json")
+        cache = LayoutCache(path)
+        for label, func in (("первый показ", lambda: cache.layout(G)),
+                            ("повторный показ", lambda: cache.layout(G)),
+                            ("после перезапуска", lambda: LayoutCache(path).layout(G))):
+            start = time.perf_counter()
+            func()
+            print(f"{label + ',':<19} {customers} клиентов: {time.perf_counter() - start:6.2f} с")
+
+        # Новый клиент связан с самыми активными: дорасчет только новых узлов
+        top = sorted(cache.layout(G))[:5]
+        G.add_weighted_edges_from((customers + 1, node, 100) for node in top)
+        start = time.perf_counter()
+        cache.layout(G)
+        print(f"дорасчет новых узлов:               {time.perf_counter() - start:6.2f} с")
+
+
+def bench_models(products: int = 1000000):
+    """Загрузка товаров: объекты с __dict__ против __slots__ и строк-кортежей"""
+
+    class DictProduct(Product):
+        """Товар с __dict__, как до перехода на __slots__"""
+
+    with temp_database() as db:
+        db.bulk_insert('products', ['name', 'description', 'price', 'category', 'stock'],
+                       ([f"Товар {i}", "Описание", 9.99, f"Категория {i % 50}", i % 100]
+                        for i in range(products)))
+        rows = db.get_all_products(raw=True)
+
+        # Память и время создания объектов из одних и тех же строк
+        for label, build in (("с __dict__", lambda: [DictProduct(*row) for row in rows]),
+                             ("__slots__", lambda: [Product(*row) for row in rows])):
+            tracemalloc.start()
+            start = time.perf_counter()
+            objects = build()
+            elapsed = time.perf_counter() - start
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del objects
+            print(f"{label:<11} {size / products:6.0f} байт/объект   "
+                  f"создание: {elapsed:6.2f} с ({products} товаров)")
+        del rows
+
+        for label, load in (("объекты", lambda: db.get_all_products()),
+                            ("кортежи", lambda: db.get_all_products(raw=True))):
+            start = time.perf_counter()
+            load()
+            print(f"get_all_products, {label}: {time.perf_counter() - start:6.2f} с")
+
+
+def bench_validation(rows: int = 1000000):
+    """Проверка клиентов: объект и re.match на строку против пакетной проверки списков и DataFrame"""
+    columns = ['name', 'email', 'phone']
+    data = [[f"Клиент {i}", f"c{i}@test.com" if i % 10 else "invalid", f"+7916{i:07d}"]
+            for i in range(rows)]
+
+    def legacy(name, email, phone):
+        # Старое поведение Person.validate: шаблоны - строки, разбираемые при каждом вызове
+        if not name.strip():
+            return False
+        if email and not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+            return False
+        return not phone or bool(re.match(r'^\+?[1-9]\d{1,14}$', phone.replace(" ", "")))
+
+    start = time.perf_counter()
+    for name, email, phone in data:
+        legacy(Customer(name=name, email=email, phone=phone).name, email, phone)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    validate_rows('customers', columns, data)
+    batch = time.perf_counter() - start
+
+    df = pd.DataFrame(data, columns=columns)
+    start = time.perf_counter()
+    validate_frame('customers', df)
+    frame = time.perf_counter() - start
+
+    for label, elapsed in (("объект на строку", before), ("validate_rows", batch),
+                           ("validate_frame", frame)):
+        print(f"{label:<17} {rows / elapsed:10.0f} строк/с")
+
+
+def bench_batch(customers: int = 100000, products: int = 20000, items: int = 5):
+    """Итоги по клиентам и сортировка: объекты Order против колоночного OrderBatch"""
+    with temp_database() as db:
+        _fill_purchases(db, customers, products, items)
+
+        start = time.perf_counter()
+        orders = db.get_all_orders()
+        load_objects = time.perf_counter() - start
+        start = time.perf_counter()
+        totals = {}
+        for order in orders:
+            for item in order.items:
+                totals[order.customer.id] = totals.get(order.customer.id, 0.0) + item.total_price
+        sort_orders_by_amount(orders)
+        objects = time.perf_counter() - start
+        del orders
+
+        start = time.perf_counter()
+        batch = db.get_order_batch()
+        load_batch = time.perf_counter() - start
+        start = time.perf_counter()
+        batch.totals_by('customer_id')
+        sort_orders_by_amount(batch)
+        columnar = time.perf_counter() - start
+
+        print(f"загрузка:  объекты {load_objects:6.2f} с   OrderBatch {load_batch:6.2f} с")
+        print(f"итоги и сортировка: объекты {objects:6.2f} с   OrderBatch {columnar:6.3f} с "
+              f"({len(batch)} позиций)")
+
+
+def bench_orders(orders: int = 4000, products: int = 50, items: int = 5):
+    """Оформление заказов со списанием остатков: пропускная способность и отсутствие перепродаж"""
+    for threads in (1, 8, 32):
+        with temp_database(profile='performance') as db:
+            customer = Customer(name="Клиент")
+            customer.id = db.add_customer(customer)
+            catalog = []
+            for i in range(products):
+                product = Product(name=f"Товар {i}", price=9.99, stock=orders * items // products)
+                product.id = db.add_product(product)
+                catalog.append(product)
+            placed, rejected = [0] * threads, [0] * threads
+
+            def worker(n):
+                for i in range(n, orders + orders // 10, threads):
+                    order = Order(customer=customer)
+                    for j in range(items):
+                        order.add_item(catalog[(i + j) % products], 1)
+                    try:
+                        db.place_order(order)
+                        placed[n] += 1
+                    except OutOfStockError:
+                        rejected[n] += 1
+
+            workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+            start = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            sold = db._get_connection().execute('SELECT SUM(quantity) FROM order_items').fetchone()[0]
+            left = db._get_connection().execute('SELECT MIN(stock) FROM products').fetchone()[0]
+            print(f"{threads:>2} потоков: {sum(placed) / elapsed:7.0f} заказов/с   "
+                  f"оформлено {sum(placed)}, отказов {sum(rejected)}, "
+                  f"продано {sold} из {orders * items}, мин. остаток {left}")
+
+
+BENCHMARKS = {
+    'connection': bench_connection,
+    'profiles': bench_profiles,
+    'import': bench_import,
+    'export': bench_export,
+    'pagination': bench_pagination,
+    'network': bench_network,
+    'rollups': bench_rollups,
+    'trend': bench_trend,
+    'cache': bench_cache,
+    'loaders': bench_loaders,
+    'geography': bench_geography,
+    'reports': bench_reports,
+    'dashboard': bench_dashboard,
+    'layout': bench_layout,
+    'models': bench_models,
+    'validation': bench_validation,
+    'batch': bench_batch,
+    'orders': bench_orders,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Неизвестный бенчмарк: {name}. Доступны: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
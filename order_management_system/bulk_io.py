@@ -0,0 +1,207 @@
+"""
+Потоковое чтение файлов импорта и статистика пакетной загрузки
+"""
+
+import csv
+import gzip
+import json
+import sqlite3
+import time
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Размер блока чтения JSON-файла
+JSON_BLOCK_SIZE = 1 << 16
+
+# Уровень сжатия gzip: компромисс между скоростью и размером файла
+GZIP_LEVEL = 6
+
+
+class BulkImportError(Exception):
+    """Ошибка пакетного импорта с номером проблемной строки"""
+
+    def __init__(self, row_number: int, message: str):
+        super().__init__(f"Row {row_number}: {message}")
+        self.row_number = row_number
+        self.message = message
+
+
+class ImportStats:
+    """Статистика пакетного импорта"""
+
+    def __init__(self):
+        self.rows_imported = 0
+        self.rows_skipped = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def update_elapsed(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_imported / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rows_imported': self.rows_imported,
+            'rows_skipped': self.rows_skipped,
+            'errors': list(self.errors),
+            'elapsed': self.elapsed,
+            'rows_per_second': self.rows_per_second
+        }
+
+    def __str__(self):
+        return (f"ImportStats({self.rows_imported} rows, {self.rows_skipped} skipped, "
+                f"{self.rows_per_second:.0f} rows/s)")
+
+
+def open_text(filename: str, mode: str = 'r', compress: Optional[bool] = None) -> IO[str]:
+    """Открытие текстового файла в UTF-8; gzip для *.gz или при compress=True"""
+    if compress is None:
+        compress = filename.endswith('.gz')
+    if compress:
+        return gzip.open(filename, mode + 't', compresslevel=GZIP_LEVEL, encoding='utf-8', newline='')
+    return open(filename, mode, encoding='utf-8', newline='')
+
+
+def iter_batches(cursor: sqlite3.Cursor, batch_size: int,
+                 progress: Optional[Callable[[int], None]] = None) -> Iterator[List[tuple]]:
+    """Потоковое чтение результата запроса пачками через fetchmany"""
+    count = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+        count += len(rows)
+        if progress:
+            progress(count)
+
+
+def write_csv_rows(csvfile: IO[str], columns: Sequence[str], batches: Iterable[List[tuple]]) -> int:
+    """Запись заголовка и пачек строк в CSV; возвращает число строк"""
+    writer = csv.writer(csvfile)
+    writer.writerow(columns)
+    count = 0
+    for rows in batches:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def write_json_rows(jsonfile: IO[str], columns: Sequence[str], batches: Iterable[List[tuple]],
+                    lines: bool = False) -> int:
+    """Потоковая запись строк как JSON-массива объектов или JSON Lines; возвращает число строк"""
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    count = 0
+    if not lines:
+        jsonfile.write('[')
+    for rows in batches:
+        parts = []
+        for row in rows:
+            record = encoder.encode(dict(zip(columns, row)))
+            if lines:
+                parts.append(record + '\n')
+            else:
+                parts.append(('\n  ' if count == 0 and not parts else ',\n  ') + record)
+        jsonfile.write(''.join(parts))
+        count += len(rows)
+    if not lines:
+        jsonfile.write('\n]\n' if count else ']\n')
+    return count
+
+
+def read_csv_rows(csvfile: IO[str]) -> Tuple[List[str], Iterator[Any]]:
+    """Заголовок и потоковый итератор строк CSV"""
+    reader = csv.reader(csvfile)
+    columns = next(reader, [])
+    return columns, reader
+
+
+def iter_json_records(jsonfile: IO[str], block_size: int = JSON_BLOCK_SIZE) -> Iterator[Any]:
+    """Потоковое чтение JSON-массива объектов или JSON Lines без загрузки файла в память"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    in_array = None
+
+    def fill() -> bool:
+        # Дочитываем следующий блок, отбрасывая уже разобранную часть буфера
+        nonlocal buffer, pos
+        chunk = jsonfile.read(block_size)
+        if not chunk:
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+            pos += 1
+        if pos >= len(buffer):
+            if fill():
+                continue
+            if in_array:
+                raise ValueError("Unexpected end of JSON array")
+            return
+
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+            continue
+        if in_array and buffer[pos] == ']':
+            return
+        if in_array and buffer[pos] == ',':
+            pos += 1
+            continue
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            # Запись не поместилась в буфер целиком
+            if fill():
+                continue
+            raise
+        yield record
+        pos = end
+
+
+def check_row(row: Any, columns: List[str]) -> Optional[str]:
+    """Описание ошибки структуры строки или None, если строка корректна
+
+    Строка - список или кортеж значений в порядке columns либо словарь,
+    содержащий все столбцы из columns.
+    """
+    if isinstance(row, Mapping):
+        missing = [col for col in columns if col not in row]
+        return f"Missing columns: {', '.join(missing)}" if missing else None
+    if not isinstance(row, (list, tuple)):
+        return f"Invalid row: {row!r}"
+    if len(row) != len(columns):
+        return f"Expected {len(columns)} values, got {len(row)}"
+    return None
+
+
+def read_json_rows(jsonfile: IO[str]) -> Tuple[List[str], Iterator[Any]]:
+    """Колонки (ключи первой записи) и потоковый итератор строк JSON"""
+    records = iter_json_records(jsonfile)
+    first = next(records, None)
+    if first is None:
+        return [], iter(())
+    if not isinstance(first, dict):
+        raise ValueError(f"JSON records must be objects, got {type(first).__name__}")
+    columns = list(first.keys())
+
+    def rows():
+        yield [first[col] for col in columns]
+        for record in records:
+            if isinstance(record, dict) and all(col in record for col in columns):
+                yield [record[col] for col in columns]
+            else:
+                # Неполная запись передается как есть и отклоняется check_row
+                yield record
+
+    return columns, rows()
@@ -0,0 +1,123 @@
+"""
+Кэш результатов аналитических запросов
+Записи сбрасываются при смене версии данных, вытесняются по размеру и TTL
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+
+class CacheInfo(NamedTuple):
+    """Статистика кэша"""
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    size: int
+    maxsize: int
+
+
+class _Pending:
+    """Вычисление, которое уже выполняется другим потоком"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ResultCache:
+    """
+    LRU-кэш результатов с TTL и версией данных.
+
+    get(key, version, compute) возвращает сохраненный результат, если версия
+    данных не менялась и запись не старше ttl секунд; иначе вызывает compute.
+    Смена версии сбрасывает все записи. Одновременные запросы одного ключа
+    вычисляются один раз: остальные потоки ждут готовый результат.
+    """
+
+    def __init__(self, maxsize: int = 32, ttl: Optional[float] = 600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._pending = {}
+        self._version: Any = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable, version: Any, compute: Callable[[], Any]) -> Any:
+        """Результат для key при версии данных version"""
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self._invalidations += 1
+                self._entries.clear()
+                self._version = version
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if self.ttl is None or self._clock() - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._evictions += 1
+
+            pending = self._pending.get((version, key))
+            owner = pending is None
+            if owner:
+                pending = self._pending[(version, key)] = _Pending()
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = compute()
+        except BaseException as e:
+            pending.error = e
+            raise
+        else:
+            self._store(key, version, pending.value)
+            return pending.value
+        finally:
+            with self._lock:
+                del self._pending[(version, key)]
+            pending.event.set()
+
+    def _store(self, key: Hashable, version: Any, value: Any):
+        """Сохранение результата, если версия данных не сменилась во время вычисления"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Удаление всех записей"""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> CacheInfo:
+        """Счетчики попаданий, промахов и вытеснений"""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self._invalidations,
+                             len(self._entries), self.maxsize)
@@ -0,0 +1,223 @@
+"""
+Построение графиков аналитики
+Функции рисуют в переданную Figure и не зависят от pyplot, поэтому
+используются и в интерфейсе, и при пакетной выгрузке без дисплея (Agg)
+Функции update_* обновляют уже нарисованный график новыми данными на месте
+"""
+
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import networkx as nx
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from layout import NETWORK_MAX_NODES, LayoutCache
+
+
+class ChartSpec(NamedTuple):
+    """
+    Функции отрисовки и обновления графика, размер фигуры в дюймах.
+
+    update(fig, old, new) обновляет артисты графика, нарисованного по
+    данным old, и возвращает False, если график нужно перерисовать целиком.
+    """
+    draw: Callable[..., None]
+    figsize: Tuple[float, float]
+    update: Optional[Callable[..., bool]] = None
+
+
+def _rescale(ax):
+    """Пересчет пределов осей по обновленным артистам"""
+    ax.relim()
+    ax.autoscale_view()
+
+
+def draw_top_customers(fig: Figure, top_customers):
+    """Топ клиентов по количеству заказов"""
+    ax = fig.add_subplot()
+    ax.barh(top_customers['name'], top_customers['order_count'])
+    ax.set_title('Топ клиентов по количеству заказов')
+    ax.set_xlabel('Количество заказов')
+    ax.set_ylabel('Клиенты')
+
+
+def update_top_customers(fig: Figure, old, top_customers) -> bool:
+    """Новые значения столбцов при том же списке клиентов"""
+    if list(old['name']) != list(top_customers['name']):
+        return False
+    ax = fig.axes[0]
+    for bar, value in zip(ax.containers[0], top_customers['order_count']):
+        bar.set_width(value)
+    _rescale(ax)
+    return True
+
+
+def draw_sales_trend(fig: Figure, sales_data, title: str = 'Динамика продаж'):
+    """Динамика продаж"""
+    ax = fig.add_subplot()
+    ax.plot(sales_data.index, sales_data.to_numpy(), marker='o')
+    ax.set_title(title)
+    ax.set_xlabel('Дата')
+    ax.set_ylabel('Сумма продаж')
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+
+
+def update_sales_trend(fig: Figure, old, sales_data, **options) -> bool:
+    """Новые точки линии продаж"""
+    ax = fig.axes[0]
+    ax.lines[0].set_data(sales_data.index, sales_data.to_numpy())
+    _rescale(ax)
+    return True
+
+
+def draw_top_products(fig: Figure, top_products):
+    """Топ товаров по выручке"""
+    ax = fig.add_subplot()
+    ax.bar(top_products['name'], top_products['total_revenue'])
+    ax.set_title('Топ товаров по выручке')
+    ax.set_xlabel('Товары')
+    ax.set_ylabel('Выручка')
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+
+
+def update_top_products(fig: Figure, old, top_products) -> bool:
+    """Новые значения столбцов при том же списке товаров"""
+    if list(old['name']) != list(top_products['name']):
+        return False
+    ax = fig.axes[0]
+    for bar, value in zip(ax.containers[0], top_products['total_revenue']):
+        bar.set_height(value)
+    _rescale(ax)
+    return True
+
+
+def network_layout(G: nx.Graph, cache: Optional[LayoutCache] = None,
+                   max_nodes: Optional[int] = NETWORK_MAX_NODES) -> Dict[Any, Any]:
+    """
+    Раскладка графа клиентов (самая долгая часть отрисовки графа).
+
+    Раскладываются только max_nodes самых связанных клиентов; cache
+    сохраняет позиции между показами.
+    """
+    return (cache or LayoutCache()).layout(G, max_nodes)
+
+
+def draw_customer_network(fig: Figure, G: nx.Graph, pos: Optional[Dict[Any, Any]] = None):
+    """
+    Граф связей клиентов; pos - готовая раскладка, иначе она считается здесь.
+
+    Рисуются только узлы, для которых есть позиции.
+    """
+    if pos is None:
+        pos = network_layout(G)
+    total = len(G)
+    G = G.subgraph(pos)
+    ax = fig.add_subplot()
+
+    nx.draw_networkx_nodes(G, pos, node_size=500, node_color='lightblue', alpha=0.9, ax=ax)
+
+    # Толщина ребра пропорциональна весу
+    weights = [data['weight'] for _, _, data in G.edges(data=True)]
+    nx.draw_networkx_edges(G, pos, width=[w / 2 for w in weights], alpha=0.6, ax=ax)
+
+    labels = {node: G.nodes[node]['name'] for node in G.nodes()}
+    nx.draw_networkx_labels(G, pos, labels, font_size=8, ax=ax)
+
+    title = 'Граф связей клиентов (по общим товарам)'
+    if len(G) < total:
+        title += f' - {len(G)} из {total} клиентов'
+    ax.set_title(title)
+    ax.axis('off')
+
+
+def draw_customer_geography(fig: Figure, geo_data):
+    """Распределение клиентов по городам или регионам"""
+    ax = fig.add_subplot()
+    ax.pie(geo_data['count'], labels=geo_data.iloc[:, 0], autopct='%1.1f%%')
+    ax.set_title('Географическое распределение клиентов')
+
+
+# Графики по именам отчетов DataAnalyzer (analysis.REPORTS)
+CHARTS = {
+    'top_customers': ChartSpec(draw_top_customers, (10, 6), update_top_customers),
+    'sales_trend': ChartSpec(draw_sales_trend, (12, 6), update_sales_trend),
+    'top_products': ChartSpec(draw_top_products, (12, 6), update_top_products),
+    'network': ChartSpec(draw_customer_network, (14, 10)),
+    'geography': ChartSpec(draw_customer_geography, (12, 8)),
+}
+
+
+def render_chart(name: str, data: Any, fig: Optional[Figure] = None, **options) -> Figure:
+    """Отрисовка графика name по данным отчета в fig (или в новую фигуру)"""
+    spec = CHARTS[name]
+    if fig is None:
+        fig = Figure(figsize=spec.figsize)
+    spec.draw(fig, data, **options)
+    fig.tight_layout()
+    return fig
+
+
+def _use_tight_layout(fig: Figure):
+    """Подбор полей при каждой отрисовке: set_layout_engine в matplotlib 3.6+, ранее set_tight_layout"""
+    if hasattr(fig, 'set_layout_engine'):
+        fig.set_layout_engine('tight')
+    else:
+        fig.set_tight_layout(True)
+
+
+class ChartView:
+    """
+    Постоянная фигура для показа сменяющих друг друга графиков.
+
+    Повторный показ того же графика обновляет его артисты на месте, если
+    это позволяет функция update; иначе фигура очищается и рисуется
+    заново. Новые Figure и холсты не создаются, поэтому память не растет
+    с каждым показом.
+    """
+
+    def __init__(self, fig: Figure):
+        self.fig = fig
+        # Поля подбираются при отрисовке холста, а не при каждом показе
+        _use_tight_layout(self.fig)
+        self.name: Optional[str] = None
+        self.data: Any = None
+
+    def show(self, name: str, data: Any, **options) -> bool:
+        """Показ графика name; True, если он обновлен без перерисовки"""
+        spec = CHARTS[name]
+        updated = (name == self.name and spec.update is not None
+                   and spec.update(self.fig, self.data, data, **options))
+        if not updated:
+            self.fig.clear()
+            spec.draw(self.fig, data, **options)
+            self.name = name
+        self.data = data
+        return bool(updated)
+
+    def clear(self):
+        """Очистка фигуры и освобождение данных графика"""
+        self.fig.clear()
+        self.name = None
+        self.data = None
+
+
+def save_chart(name: str, data: Any, path: str, formats: Sequence[str] = ('png',),
+               **options) -> List[str]:
+    """
+    Сохранение графика в файлы path.<формат> через Agg без дисплея.
+
+    Выполняется в рабочих процессах пакетной выгрузки.
+    """
+    fig = render_chart(name, data, **options)
+    FigureCanvasAgg(fig)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    files = []
+    for fmt in formats:
+        filename = f'{path}.{fmt}'
+        fig.savefig(filename, format=fmt)
+        files.append(filename)
+    return files
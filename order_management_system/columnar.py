@@ -0,0 +1,253 @@
+"""
+Колоночное хранение позиций заказов
+OrderBatch держит позиции заказов в непрерывных массивах NumPy, поэтому
+итоги и группировки по тысячам заказов считаются без циклов Python
+"""
+
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from models import Customer, Order, Product
+from money import money_column
+
+# Колонки OrderBatch и их типы
+BATCH_COLUMNS = {
+    'order_id': np.int64,
+    'product_id': np.int64,
+    'quantity': np.int64,
+    'unit_price_cents': np.int64,
+    'customer_id': np.int64,
+    'order_date': 'datetime64[s]',
+}
+
+# Позиции заказов в порядке BATCH_COLUMNS ({unit_price} - цена в копейках);
+# заказ без клиента получает customer_id = -1
+ORDER_BATCH_SQL = '''
+    SELECT oi.order_id, oi.product_id, COALESCE(oi.quantity, 0), COALESCE({unit_price}, 0),
+           COALESCE(o.customer_id, -1), o.order_date
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+'''
+
+# Размер пачки fetchmany при заполнении OrderBatch из курсора
+BATCH_FETCH_SIZE = 10000
+
+# Колонки группировки в OrderBatch.totals_by
+GROUP_KEYS = ('order_id', 'customer_id', 'product_id')
+
+
+def to_datetime64(values: Iterable[Any]) -> np.ndarray:
+    """
+    Даты в datetime64[s]; пустые и нераспознанные даты становятся NaT.
+
+    Единое представление дат для OrderBatch и загрузчиков DataFrame
+    DataAnalyzer: одни и те же строки базы дают одинаковые значения.
+    """
+    values = list(values)
+    try:
+        return np.array(values, dtype='datetime64[s]')
+    except ValueError:
+        result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[s]')
+        for i, value in enumerate(values):
+            try:
+                result[i] = np.datetime64(value, 's')
+            except (ValueError, TypeError):
+                pass
+        return result
+
+
+class OrderBatch:
+    """
+    Позиции заказов в колонках: order_id, product_id, quantity,
+    unit_price_cents, customer_id, order_date (одна строка массивов - одна
+    позиция заказа). Суммы - целые копейки в int64, поэтому итоги точные.
+
+    Массивы только для чтения, поэтому пакет можно безопасно отдавать из
+    кэша нескольким потребителям.
+    """
+
+    __slots__ = tuple(BATCH_COLUMNS)
+
+    def __init__(self, **columns: Any):
+        unknown = set(columns) - set(BATCH_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        size = None
+        for name, dtype in BATCH_COLUMNS.items():
+            values = columns.get(name, ())
+            array = to_datetime64(values) if name == 'order_date' and not isinstance(values, np.ndarray) \
+                else np.asarray(values, dtype=dtype)
+            if size is not None and len(array) != size:
+                raise ValueError(f"Column {name} has {len(array)} values, expected {size}")
+            size = len(array)
+            array.flags.writeable = False
+            object.__setattr__(self, name, array)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("OrderBatch is read-only")
+
+    def __len__(self) -> int:
+        return len(self.order_id)
+
+    def __repr__(self):
+        return f"OrderBatch({len(self)} items, {len(np.unique(self.order_id))} orders)"
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> 'OrderBatch':
+        """Пакет из строк-кортежей в порядке BATCH_COLUMNS"""
+        return cls._from_row_list(list(rows))
+
+    @classmethod
+    def from_cursor(cls, cursor: sqlite3.Cursor, batch_size: int = BATCH_FETCH_SIZE) -> 'OrderBatch':
+        """Заполнение из курсора пачками fetchmany: в памяти нет полного списка строк"""
+        parts = []
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            parts.append(cls._from_row_list(rows))
+        return cls.concat(parts)
+
+    @classmethod
+    def _from_row_list(cls, rows: List[tuple]) -> 'OrderBatch':
+        columns = list(zip(*rows)) if rows else [()] * len(BATCH_COLUMNS)
+        return cls(**dict(zip(BATCH_COLUMNS, columns)))
+
+    @classmethod
+    def concat(cls, batches: List['OrderBatch']) -> 'OrderBatch':
+        """Объединение пакетов в один"""
+        if len(batches) == 1:
+            return batches[0]
+        if not batches:
+            return cls()
+        return cls(**{name: np.concatenate([getattr(batch, name) for batch in batches])
+                      for name in BATCH_COLUMNS})
+
+    @classmethod
+    def from_orders(cls, orders: Iterable[Order]) -> 'OrderBatch':
+        """Пакет из объектов Order (несохраненные заказы и товары получают ID -1)"""
+        rows = []
+        for order in orders:
+            order_id = order.id if order.id is not None else -1
+            customer_id = order.customer.id if order.customer and order.customer.id is not None else -1
+            for item in order.items:
+                product_id = item.product.id if item.product.id is not None else -1
+                rows.append((order_id, product_id, item.quantity, item.product.price_cents,
+                             customer_id, order.order_date))
+        return cls.from_rows(rows)
+
+    def to_orders(self, customers: Optional[Dict[int, Customer]] = None,
+                  products: Optional[Dict[int, Product]] = None) -> List[Order]:
+        """
+        Объекты Order в порядке первого появления заказа в пакете.
+
+        customers и products - справочники по ID для имен и контактов;
+        без них создаются объекты только с ID. Цена товара в позиции - цена
+        на момент заказа. Статус в пакете не хранится (остается по умолчанию),
+        total_amount складывается из позиций.
+        """
+        customers = customers or {}
+        products = products or {}
+        orders: Dict[int, Order] = {}
+        item_products: Dict[Tuple[int, int], Product] = {}
+        dates = np.datetime_as_string(self.order_date, unit='s')
+        for order_id, product_id, quantity, unit_price_cents, customer_id, date in zip(
+                self.order_id.tolist(), self.product_id.tolist(), self.quantity.tolist(),
+                self.unit_price_cents.tolist(), self.customer_id.tolist(), dates.tolist()):
+            order = orders.get(order_id)
+            if order is None:
+                customer = None
+                if customer_id >= 0:
+                    customer = customers.get(customer_id) or Customer(id=customer_id)
+                order = Order(id=order_id, customer=customer, order_date=date.replace('T', ' '))
+                if date == 'NaT':
+                    # Без даты, а не с текущей датой по умолчанию
+                    order.order_date = None
+                orders[order_id] = order
+            product = item_products.get((product_id, unit_price_cents))
+            if product is None:
+                base = products.get(product_id)
+                if base is not None:
+                    product = Product(id=product_id, name=base.name, description=base.description,
+                                      price_cents=unit_price_cents, category=base.category)
+                else:
+                    product = Product(id=product_id, price_cents=unit_price_cents)
+                item_products[(product_id, unit_price_cents)] = product
+            order.add_item(product, quantity)
+        return list(orders.values())
+
+    def take(self, index: np.ndarray) -> 'OrderBatch':
+        """Пакет из строк index (массив индексов или булева маска)"""
+        return OrderBatch(**{name: getattr(self, name)[index] for name in BATCH_COLUMNS})
+
+    def line_totals(self) -> np.ndarray:
+        """Стоимость каждой позиции в копейках"""
+        return self.quantity * self.unit_price_cents
+
+    def totals_by(self, key: str = 'order_id', value: str = 'total') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Суммы value ('total' - стоимость позиций в копейках или 'quantity')
+        по колонке key из GROUP_KEYS; возвращает (ключи по возрастанию, суммы).
+        Суммы считаются в int64 без погрешности float.
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Unknown group key: {key}")
+        if value not in ('total', 'quantity'):
+            raise ValueError(f"Unknown value: {value}")
+        keys, inverse = np.unique(getattr(self, key), return_inverse=True)
+        values = self.line_totals() if value == 'total' else self.quantity
+        sums = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(sums, inverse.ravel(), values)
+        return keys, sums
+
+    def daily_totals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Стоимость позиций в копейках по дням заказа (позиции без даты не учитываются)"""
+        dated = ~np.isnat(self.order_date)
+        days, inverse = np.unique(self.order_date[dated].astype('datetime64[D]'), return_inverse=True)
+        sums = np.zeros(len(days), dtype=np.int64)
+        np.add.at(sums, inverse.ravel(), self.line_totals()[dated])
+        return days, sums
+
+    def sort_orders(self, by: str = 'date', descending: bool = True) -> 'OrderBatch':
+        """
+        Пакет с заказами, упорядоченными по дате ('date') или сумме ('amount').
+
+        Позиции одного заказа остаются рядом и в прежнем порядке, равные
+        заказы сохраняют порядок первого появления; заказы без даты - в конце.
+        """
+        if by not in ('date', 'amount'):
+            raise ValueError(f"Unknown sort key: {by}")
+        _, first, inverse = np.unique(self.order_id, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        if by == 'date':
+            key = np.where(np.isnat(self.order_date), -np.inf,
+                           self.order_date.astype(np.int64).astype(np.float64))
+        else:
+            key = np.bincount(inverse, weights=self.line_totals(), minlength=len(first))[inverse]
+        if descending:
+            key = -key
+        else:
+            key = np.where(np.isinf(key), np.inf, key)
+        return self.take(np.lexsort((np.arange(len(self)), first[inverse], key)))
+
+
+def read_order_batch(conn: sqlite3.Connection, start: Optional[Any] = None, end: Optional[Any] = None,
+                     batch_size: int = BATCH_FETCH_SIZE) -> OrderBatch:
+    """Позиции заказов за [start, end] (даты заказа, конец включается целиком)"""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append('o.order_date >= ?')
+        params.append(str(np.datetime64(start, 'D')))
+    if end is not None:
+        conditions.append('o.order_date < ?')
+        params.append(str(np.datetime64(end, 'D') + 1))
+    query = ORDER_BATCH_SQL.format(unit_price=money_column(conn, 'order_items', 'oi'))
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    cursor = conn.execute(query + ' ORDER BY oi.id', params)
+    try:
+        return OrderBatch.from_cursor(cursor, batch_size)
+    finally:
+        cursor.close()
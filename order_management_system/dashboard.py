@@ -0,0 +1,99 @@
+"""
+Пакетная выгрузка графиков аналитики в файлы без дисплея
+Отчеты считаются DataAnalyzer, графики рисуются параллельно в процессах
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import networkx as nx
+
+from analysis import DataAnalyzer
+from charts import CHARTS, network_layout, save_chart
+from layout import LayoutCache, layout_path
+
+# Форматы файлов по умолчанию
+DEFAULT_FORMATS = ('png',)
+
+
+class DashboardExport(NamedTuple):
+    """Результат выгрузки: файлы и ошибки по ключу 'магазин/график'"""
+    files: Dict[str, List[str]]
+    errors: Dict[str, BaseException]
+    elapsed: float
+
+
+def store_name(db_path: str) -> str:
+    """Имя магазина по файлу базы: каталог выгрузки его графиков"""
+    return os.path.splitext(os.path.basename(db_path))[0]
+
+
+def save_network_chart(G: nx.Graph, path: str, formats: Sequence[str], layout_file: str) -> List[str]:
+    """
+    Сохранение графа клиентов с раскладкой из файлового кэша магазина
+    (layout.LayoutCache, тот же файл, что и у DataAnalyzer): неизменившийся
+    граф не раскладывается заново, новая раскладка сохраняется для
+    следующих выгрузок и показов. Выполняется в рабочем процессе.
+    """
+    pos = network_layout(G, LayoutCache(layout_file))
+    return save_chart('network', G, path, formats, pos=pos)
+
+
+def export_dashboards(db_paths: Iterable[str], out_dir: str,
+                      charts: Optional[Sequence[str]] = None,
+                      formats: Sequence[str] = DEFAULT_FORMATS,
+                      params: Optional[Dict[str, Dict[str, Any]]] = None,
+                      max_workers: Optional[int] = None,
+                      profile: str = 'default') -> DashboardExport:
+    """
+    Выгрузка графиков нескольких магазинов в out_dir/<магазин>/<график>.<формат>.
+
+    Данные каждого магазина считаются параллельно через
+    DataAnalyzer.run_reports (params - аргументы отчетов), а отрисовка и
+    сохранение выполняются в пуле процессов с бэкендом Agg: пока рисуются
+    графики одного магазина, уже считаются отчеты следующего. Раскладка
+    графа клиентов берется из кэша раскладок магазина или считается в
+    рабочем процессе (save_network_chart). Ошибка одного графика не
+    прерывает выгрузку.
+    """
+    charts = list(charts or CHARTS)
+    unknown = [name for name in charts if name not in CHARTS]
+    if unknown:
+        raise ValueError(f"Unknown charts: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    futures, errors = {}, {}
+    # spawn: рабочие процессы не наследуют потоки и соединения SQLite родителя
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        for db_path in db_paths:
+            store = store_name(db_path)
+            analyzer = DataAnalyzer(db_path, profile=profile)
+            try:
+                run = analyzer.run_reports(charts, params)
+            finally:
+                analyzer.close()
+
+            for name in charts:
+                key = f'{store}/{name}'
+                if name in run.errors:
+                    errors[key] = run.errors[name]
+                    continue
+                path = os.path.join(out_dir, store, name)
+                if name == 'network':
+                    futures[key] = executor.submit(save_network_chart, run.results[name], path, formats,
+                                                   layout_path(db_path))
+                else:
+                    futures[key] = executor.submit(save_chart, name, run.results[name], path, formats)
+
+        files = {}
+        for key, future in futures.items():
+            try:
+                files[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+
+    return DashboardExport(files, errors, time.perf_counter() - start)
@@ -1,90 +1,236 @@
 import sqlite3
-import json
-import csv
 import os
-from typing import List, Dict, Any, Optional
+import threading
+from collections.abc import Mapping
+from urllib.request import pathname2url
+from typing import List, Dict, Any, Optional, Callable, Iterable, NamedTuple, Tuple, Union
 from datetime import datetime
 from models import Customer, Product, Order, OrderItem
+from columnar import BATCH_FETCH_SIZE, OrderBatch, read_order_batch
+from migrations import CITY_SQL, migrate
+from money import MONEY_COLUMNS, to_cents, units_sql
+from validation import ERROR_MESSAGES, RowValidator, compile_validator
+from rollups import (ROLLUP_SOURCES, apply_new_rows, apply_order, check_rollups, rebuild_rollups,
+                     refresh_product_dates)
+from bulk_io import (BulkImportError, ImportStats, check_row, iter_batches, open_text,
+                     read_csv_rows, read_json_rows, write_csv_rows, write_json_rows)
+
+# Максимальное число ID заказов в одном запросе IN (...)
+ORDER_ID_BATCH = 500
+
+# Размер пачки строк для executemany при пакетном импорте
+BULK_CHUNK_SIZE = 5000
+
+# Размер пачки строк fetchmany при потоковом экспорте
+EXPORT_BATCH_SIZE = 1000
+
+# Размер страницы по умолчанию для постраничных запросов
+PAGE_SIZE = 100
+
+# Запросы постраничной выборки: (SELECT, ключевые колонки, индексы ключа в строке, по убыванию).
+# Суммы хранятся в копейках и отдаются для показа в рублях
+PAGE_QUERIES = {
+    'customers': ('SELECT id, name, email, phone, address, registration_date FROM customers',
+                  ('name', 'id'), (1, 0), False),
+    'products': ('SELECT id, name, description, price_cents / 100.0, category, stock FROM products',
+                 ('name', 'id'), (1, 0), False),
+    'orders': ('''SELECT o.id, c.name, o.order_date, o.status, o.total_cents / 100.0
+                  FROM orders o LEFT JOIN customers c ON o.customer_id = c.id''',
+               ("COALESCE(o.order_date, '')", 'o.id'), (2, 0), True),
+}
+
+# PRAGMA, применяемые к каждому новому соединению
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'foreign_keys': 'OFF',
+}
+
+# Профили PRAGMA: 'performance' включает WAL для одновременного чтения и записи
+PRAGMA_PROFILES = {
+    'default': {},
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,       # 64 МБ (отрицательное значение - в КиБ)
+        'mmap_size': 268435456,     # 256 МБ
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def resolve_pragmas(profile: str = 'default',
+                    pragmas: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Итоговый набор PRAGMA: значения по умолчанию, профиль и явные переопределения"""
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown PRAGMA profile: {profile}")
+    result = dict(DEFAULT_PRAGMAS)
+    result.update(PRAGMA_PROFILES[profile])
+    if pragmas:
+        result.update(pragmas)
+    return result
+
+
+def _key_value(value: Any) -> Any:
+    """Значение ключа страницы: NULL - пустая строка, как в COALESCE ключевых колонок"""
+    return '' if value is None else value
+
+
+class Page(NamedTuple):
+    """Страница keyset-пагинации: строки и ключи для перехода к соседним страницам"""
+    rows: List[tuple]
+    first_key: Optional[tuple]
+    last_key: Optional[tuple]
+    has_more: bool
+
+
+class Change(NamedTuple):
+    """Уведомление об изменении данных: action - 'insert', 'update' или 'reload'"""
+    table: str
+    action: str
+    rows: List[tuple]
+
+
+class OutOfStockError(Exception):
+    """Недостаточно товара на складе: shortages - (ID товара, заказано, в наличии)"""
+
+    def __init__(self, shortages: List[Tuple[int, int, int]]):
+        details = ', '.join(f"product {product_id}: requested {requested}, available {available}"
+                            for product_id, requested, available in shortages)
+        super().__init__(f"Out of stock: {details}")
+        self.shortages = shortages
+
+
+def connect(db_path: str, pragmas: Optional[Dict[str, Any]] = None,
+            read_only: bool = False) -> sqlite3.Connection:
+    """
+    Соединение, которое можно передавать между потоками, с примененными PRAGMA.
+
+    Соединение только для чтения открывается в режиме mode=ro: база не
+    создается, запись невозможна, а journal_mode пропускается - режим
+    журнала задает пишущее соединение.
+    """
+    if read_only:
+        uri = f'file:{pathname2url(os.path.abspath(db_path))}?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+    for name, value in (pragmas or {}).items():
+        if read_only and name == 'journal_mode':
+            continue
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    """Пул постоянных соединений SQLite: одно соединение на поток"""
+
+    def __init__(self, db_path: str, pragmas: Dict[str, Any], read_only: bool = False):
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.read_only = read_only
+
+        # sqlite3 не разделяет соединение между потоками
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> sqlite3.Connection:
+        """Соединение текущего потока (создается при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = connect(self.db_path, self.pragmas, self.read_only)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Закрытие всех открытых соединений"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        # Потоки, чьи соединения закрыты, откроют новые при следующем обращении
+        self._local = threading.local()
 
 
 class Database:
-    def __init__(self, db_path: str = "data/database.db"):
+    def __init__(self, db_path: str = "data/database.db", profile: str = 'default',
+                 pragmas: Optional[Dict[str, Any]] = None):
         self.db_path = db_path
+        self.profile = profile
+        self.pragmas = resolve_pragmas(profile, pragmas)
+        self._pool = ConnectionPool(db_path, self.pragmas)
+        self._subscribers: List[Callable[[Change], None]] = []
+        # Оформление заказов в одном процессе ждет на блокировке, а не в busy_timeout
+        self._order_lock = threading.Lock()
+
         self.init_db()
 
-    def init_db(self):
-        """Инициализация базы данных"""
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+    def __enter__(self):
+        return self
 
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
-            # Таблица клиентов
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS customers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT,
-                    phone TEXT,
-                    address TEXT,
-                    registration_date TEXT
-                )
-            ''')
+    def _get_connection(self) -> sqlite3.Connection:
+        """Постоянное соединение текущего потока"""
+        return self._pool.get()
 
-            # Таблица товаров
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    price REAL NOT NULL,
-                    category TEXT,
-                    stock INTEGER DEFAULT 0
-                )
-            ''')
+    def close(self):
+        """Закрытие всех открытых соединений"""
+        self._pool.close()
 
-            # Таблица заказов
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_id INTEGER,
-                    order_date TEXT,
-                    status TEXT,
-                    total_amount REAL,
-                    FOREIGN KEY (customer_id) REFERENCES customers (id)
-                )
-            ''')
+    def subscribe(self, callback: Callable[[Change], None]):
+        """
+        Подписка на изменения данных.
 
-            # Таблица элементов заказа
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS order_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id INTEGER,
-                    product_id INTEGER,
-                    quantity INTEGER,
-                    unit_price REAL,
-                    FOREIGN KEY (order_id) REFERENCES orders (id),
-                    FOREIGN KEY (product_id) REFERENCES products (id)
-                )
-            ''')
+        callback получает Change после фиксации транзакции, в потоке, который
+        выполнил запись. Строки передаются в формате постраничных запросов
+        (PAGE_QUERIES); для массовых изменений передается action='reload'.
+        """
+        self._subscribers.append(callback)
 
-            conn.commit()
+    def unsubscribe(self, callback: Callable[[Change], None]):
+        """Отмена подписки на изменения данных"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _notify(self, table: str, action: str, rows: Iterable[tuple] = ()):
+        """Рассылка уведомления подписчикам"""
+        change = Change(table, action, list(rows))
+        for callback in list(self._subscribers):
+            callback(change)
+
+    def init_db(self):
+        """Инициализация базы данных"""
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        # Новая база создается сразу в последней версии схемы, существующая - мигрирует
+        migrate(self._get_connection())
 
     def add_customer(self, customer: Customer) -> int:
         """Добавление клиента в базу"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO customers (name, email, phone, address, registration_date)
                 VALUES (?, ?, ?, ?, ?)
             ''', (customer.name, customer.email, customer.phone,
                   customer.address, customer.registration_date))
+            customer_id = cursor.lastrowid
+            cursor.execute(f'UPDATE customers SET city = {CITY_SQL} WHERE id = ?', (customer_id,))
             conn.commit()
-            return cursor.lastrowid
+
+        self._notify('customers', 'insert', [(customer_id, customer.name, customer.email, customer.phone,
+                                              customer.address, customer.registration_date)])
+        return customer_id
 
     def get_customer(self, customer_id: int) -> Optional[Customer]:
         """Получение клиента по ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM customers WHERE id = ?', (customer_id,))
             row = cursor.fetchone()
@@ -93,9 +239,16 @@ class Database:
                                 phone=row[3], address=row[4], registration_date=row[5])
             return None
 
-    def get_all_customers(self) -> List[Customer]:
-        """Получение всех клиентов"""
-        with sqlite3.connect(self.db_path) as conn:
+    def get_all_customers(self, raw: bool = False) -> List[Union[Customer, tuple]]:
+        """
+        Получение всех клиентов.
+
+        raw=True возвращает кортежи (id, name, email, phone, address,
+        registration_date) без создания объектов Customer.
+        """
+        if raw:
+            return self._get_rows('customers', 'ORDER BY name')
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM customers ORDER BY name')
             return [Customer(id=row[0], name=row[1], email=row[2],
@@ -104,151 +257,552 @@ class Database:
 
     def add_product(self, product: Product) -> int:
         """Добавление товара в базу"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO products (name, description, price, category, stock)
+                INSERT INTO products (name, description, price_cents, category, stock)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (product.name, product.description, product.price,
+            ''', (product.name, product.description, product.price_cents,
                   product.category, product.stock))
             conn.commit()
-            return cursor.lastrowid
+            product_id = cursor.lastrowid
+
+        self._notify('products', 'insert', [(product_id, product.name, product.description,
+                                             product.price, product.category, product.stock)])
+        return product_id
 
     def get_product(self, product_id: int) -> Optional[Product]:
         """Получение товара по ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM products WHERE id = ?', (product_id,))
+            cursor.execute('''
+                SELECT id, name, description, price_cents, category, stock
+                FROM products WHERE id = ?
+            ''', (product_id,))
             row = cursor.fetchone()
             if row:
                 return Product(id=row[0], name=row[1], description=row[2],
-                               price=row[3], category=row[4], stock=row[5])
+                               price_cents=row[3], category=row[4], stock=row[5])
             return None
 
-    def get_all_products(self) -> List[Product]:
-        """Получение всех товаров"""
-        with sqlite3.connect(self.db_path) as conn:
+    def get_all_products(self, raw: bool = False) -> List[Union[Product, tuple]]:
+        """
+        Получение всех товаров.
+
+        raw=True возвращает кортежи (id, name, description, price, category,
+        stock) без создания объектов Product.
+        """
+        if raw:
+            return self._get_rows('products', 'ORDER BY name')
+        with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM products ORDER BY name')
+            cursor.execute('''
+                SELECT id, name, description, price_cents, category, stock
+                FROM products ORDER BY name
+            ''')
             return [Product(id=row[0], name=row[1], description=row[2],
-                            price=row[3], category=row[4], stock=row[5])
+                            price_cents=row[3], category=row[4], stock=row[5])
                     for row in cursor.fetchall()]
 
     def add_order(self, order: Order) -> int:
-        """Добавление заказа в базу"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Добавление заказа в базу (без списания остатков, см. place_order)"""
+        with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO orders (customer_id, order_date, status, total_amount)
-                VALUES (?, ?, ?, ?)
-            ''', (order.customer.id, order.order_date, order.status, order.total_amount))
-            order_id = cursor.lastrowid
-
-            # Добавление элементов заказа
-            for item in order.items:
-                cursor.execute('''
-                    INSERT INTO order_items (order_id, product_id, quantity, unit_price)
-                    VALUES (?, ?, ?, ?)
-                ''', (order_id, item.product.id, item.quantity, item.product.price))
-
+            order_id = self._insert_order(cursor, order)
             conn.commit()
-            return order_id
+
+        self._notify('orders', 'insert', [(order_id, order.customer.name, order.order_date,
+                                           order.status, order.total_amount)])
+        return order_id
+
+    def place_order(self, order: Order) -> int:
+        """
+        Оформление заказа со списанием остатков товаров.
+
+        Проверка остатков, их списание и вставка заказа выполняются в одной
+        транзакции BEGIN IMMEDIATE: блокировка записи берется до чтения
+        остатков, поэтому параллельные заказы не продают больше, чем есть
+        на складе. Если какого-то товара не хватает, ничего не записывается
+        и выбрасывается OutOfStockError со всеми нехватками заказа.
+        """
+        if not order.items:
+            raise ValueError("Order has no items")
+        quantities: Dict[int, int] = {}
+        for item in order.items:
+            if item.product.id is None:
+                raise ValueError(f"Product is not saved: {item.product.name}")
+            if item.quantity <= 0:
+                raise ValueError(f"Invalid quantity for product {item.product.id}: {item.quantity}")
+            quantities[item.product.id] = quantities.get(item.product.id, 0) + item.quantity
+
+        with self._order_lock:
+            conn = self._get_connection()
+            if conn.in_transaction:
+                conn.commit()
+            cursor = conn.cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                placeholders = ', '.join(['?'] * len(quantities))
+                cursor.execute(f'SELECT id, stock FROM products WHERE id IN ({placeholders})',
+                               list(quantities))
+                stock = dict(cursor.fetchall())
+                shortages = [(product_id, quantity, stock.get(product_id) or 0)
+                             for product_id, quantity in quantities.items()
+                             if (stock.get(product_id) or 0) < quantity]
+                if shortages:
+                    raise OutOfStockError(shortages)
+
+                cursor.executemany('UPDATE products SET stock = stock - ? WHERE id = ?',
+                                   [(quantity, product_id) for product_id, quantity in quantities.items()])
+                order_id = self._insert_order(cursor, order)
+                cursor.execute(f"{PAGE_QUERIES['products'][0]} WHERE id IN ({placeholders})",
+                               list(quantities))
+                products = cursor.fetchall()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        self._notify('orders', 'insert', [(order_id, order.customer.name, order.order_date,
+                                           order.status, order.total_amount)])
+        self._notify('products', 'update', products)
+        return order_id
+
+    @staticmethod
+    def _insert_order(cursor: sqlite3.Cursor, order: Order) -> int:
+        """Вставка заказа и его элементов (одним executemany) с обновлением агрегатов"""
+        cursor.execute('''
+            INSERT INTO orders (customer_id, order_date, status, total_cents)
+            VALUES (?, ?, ?, ?)
+        ''', (order.customer.id, order.order_date, order.status, order.total_cents))
+        order_id = cursor.lastrowid
+
+        cursor.executemany('''
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price_cents)
+            VALUES (?, ?, ?, ?)
+        ''', [(order_id, item.product.id, item.quantity, item.product.price_cents)
+              for item in order.items])
+
+        # Агрегаты обновляются в той же транзакции
+        apply_order(cursor, order_id)
+        return order_id
 
     def get_order(self, order_id: int) -> Optional[Order]:
         """Получение заказа по ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        orders = self._load_orders('WHERE o.id = ?', (order_id,))
+        return orders[0] if orders else None
+
+    def get_all_orders(self, raw: bool = False) -> List[Union[Order, tuple]]:
+        """
+        Получение всех заказов.
+
+        raw=True возвращает строки списка заказов (id, customer_name,
+        order_date, status, total_amount) без загрузки клиентов и товаров.
+        """
+        if raw:
+            return self._get_rows('orders', 'ORDER BY o.order_date DESC')
+        return self._load_orders(order_by='ORDER BY o.order_date DESC')
+
+    def _get_rows(self, name: str, order_by: str) -> List[tuple]:
+        """Все строки таблицы name кортежами в колонках PAGE_QUERIES - для показа без моделей"""
+        return self._get_connection().execute(f'{PAGE_QUERIES[name][0]} {order_by}').fetchall()
+
+    def get_order_batch(self, start: Optional[Any] = None, end: Optional[Any] = None,
+                        batch_size: int = BATCH_FETCH_SIZE) -> OrderBatch:
+        """
+        Позиции заказов за [start, end] в колоночном OrderBatch.
+
+        Массивы заполняются прямо из курсора пачками по batch_size строк,
+        объекты Order не создаются.
+        """
+        return read_order_batch(self._get_connection(), start, end, batch_size)
+
+    def _load_orders(self, where: str = '', params: tuple = (),
+                     order_by: str = '') -> List[Order]:
+        """Пакетная загрузка заказов с клиентами и товарами за фиксированное число запросов"""
+        with self._get_connection() as conn:
             cursor = conn.cursor()
 
-            # Получение основной информации о заказе
-            cursor.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
-            order_row = cursor.fetchone()
-            if not order_row:
-                return None
-
-            customer = self.get_customer(order_row[1])
-            order = Order(id=order_row[0], customer=customer,
-                          order_date=order_row[2], status=order_row[3])
-            order.total_amount = order_row[4]
-
-            # Получение элементов заказа
-            cursor.execute('''
-                SELECT oi.product_id, oi.quantity, oi.unit_price, 
+            # Заказы вместе с клиентами одним запросом
+            cursor.execute(f'''
+                SELECT o.id, o.order_date, o.status, o.total_cents,
+                       c.id, c.name, c.email, c.phone, c.address, c.registration_date
+                FROM orders o
+                LEFT JOIN customers c ON o.customer_id = c.id
+                {where}
+                {order_by}
+            ''', params)
+
+            # Карта идентичности: каждый клиент материализуется один раз
+            customers: Dict[int, Customer] = {}
+            orders: List[Order] = []
+            totals: Dict[int, int] = {}
+            for row in cursor.fetchall():
+                customer = None
+                if row[4] is not None:
+                    customer = customers.get(row[4])
+                    if customer is None:
+                        customer = Customer(id=row[4], name=row[5], email=row[6], phone=row[7],
+                                            address=row[8], registration_date=row[9])
+                        customers[row[4]] = customer
+                orders.append(Order(id=row[0], customer=customer,
+                                    order_date=row[1], status=row[2]))
+                totals[row[0]] = row[3]
+
+            if not orders:
+                return []
+
+            by_id = {order.id: order for order in orders}
+            items_query = '''
+                SELECT oi.order_id, oi.product_id, oi.quantity, oi.unit_price_cents,
                        p.name, p.description
                 FROM order_items oi
                 JOIN products p ON oi.product_id = p.id
-                WHERE oi.order_id = ?
-            ''', (order_id,))
-
-            for row in cursor.fetchall():
-                product = Product(id=row[0], name=row[3], description=row[4], price=row[2])
-                order.add_item(product, row[1])
-
-            return order
-
-    def get_all_orders(self) -> List[Order]:
-        """Получение всех заказов"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT id FROM orders ORDER BY order_date DESC')
-            order_ids = [row[0] for row in cursor.fetchall()]
-            return [self.get_order(order_id) for order_id in order_ids]
-
-    def export_to_csv(self, table_name: str, filename: str):
-        """Экспорт данных в CSV"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(f'SELECT * FROM {table_name}')
-            rows = cursor.fetchall()
+            '''
+            if where:
+                # Элементы только выбранных заказов, пачками по ORDER_ID_BATCH
+                ids = list(by_id)
+                item_rows = []
+                for start in range(0, len(ids), ORDER_ID_BATCH):
+                    batch = ids[start:start + ORDER_ID_BATCH]
+                    placeholders = ', '.join('?' for _ in batch)
+                    cursor.execute(f'{items_query} WHERE oi.order_id IN ({placeholders}) ORDER BY oi.id',
+                                   batch)
+                    item_rows.extend(cursor.fetchall())
+            else:
+                cursor.execute(f'{items_query} ORDER BY oi.id')
+                item_rows = cursor.fetchall()
+
+            # Товар хранит цену на момент заказа, поэтому ключ карты - (id, цена)
+            products: Dict[tuple, Product] = {}
+            for order_id, product_id, quantity, unit_price_cents, name, description in item_rows:
+                order = by_id.get(order_id)
+                if order is None:
+                    continue
+                product = products.get((product_id, unit_price_cents))
+                if product is None:
+                    product = Product(id=product_id, name=name, description=description,
+                                      price_cents=unit_price_cents)
+                    products[(product_id, unit_price_cents)] = product
+                order.add_item(product, quantity)
+
+            # Итоговая сумма берется из базы, а не пересчитывается по элементам
+            for order in orders:
+                order.total_cents = totals[order.id]
+
+            return orders
+
+    def get_customers_page(self, cursor: Optional[tuple] = None, limit: int = PAGE_SIZE,
+                           direction: str = 'next') -> Page:
+        """Страница клиентов, упорядоченных по (name, id)"""
+        return self._get_page('customers', cursor, limit, direction)
+
+    def get_products_page(self, cursor: Optional[tuple] = None, limit: int = PAGE_SIZE,
+                          direction: str = 'next') -> Page:
+        """Страница товаров, упорядоченных по (name, id)"""
+        return self._get_page('products', cursor, limit, direction)
+
+    def get_orders_page(self, cursor: Optional[tuple] = None, limit: int = PAGE_SIZE,
+                        direction: str = 'next') -> Page:
+        """Страница заказов, от новых к старым по (order_date, id)"""
+        return self._get_page('orders', cursor, limit, direction)
+
+    def _get_page(self, name: str, cursor: Optional[tuple], limit: int, direction: str) -> Page:
+        """
+        Keyset-пагинация: строки после (direction='next') или перед
+        (direction='prev') ключом cursor без OFFSET, поэтому стоимость
+        не зависит от номера страницы. Строки возвращаются кортежами
+        в естественном порядке списка.
+        """
+        if direction not in ('next', 'prev'):
+            raise ValueError(f"Unknown page direction: {direction}")
+        query, key_columns, key_index, descending = PAGE_QUERIES[name]
+
+        # Для 'prev' просматриваем список в обратном порядке и затем разворачиваем
+        scan_desc = descending if direction == 'next' else not descending
+        order = 'DESC' if scan_desc else 'ASC'
+        params: List[Any] = []
+        if cursor is not None:
+            cursor = tuple(_key_value(value) for value in cursor)
+            placeholders = ', '.join('?' for _ in key_columns)
+            comparison = '<' if scan_desc else '>'
+            # Условие на первую колонку позволяет искать по индексу, а не сканировать его
+            query += (f" WHERE {key_columns[0]} {comparison}= ?"
+                      f" AND ({', '.join(key_columns)}) {comparison} ({placeholders})")
+            params.append(cursor[0])
+            params.extend(cursor)
+        query += f" ORDER BY {', '.join(f'{col} {order}' for col in key_columns)} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._get_connection().execute(query, params).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == 'prev':
+            rows.reverse()
+        if not rows:
+            return Page([], None, None, False)
+        return Page(rows,
+                    tuple(_key_value(rows[0][i]) for i in key_index),
+                    tuple(_key_value(rows[-1][i]) for i in key_index),
+                    has_more)
+
+    def export_to_csv(self, table_name: str, filename: str, batch_size: int = EXPORT_BATCH_SIZE,
+                      compress: Optional[bool] = None,
+                      progress: Optional[Callable[[int], None]] = None) -> int:
+        """Экспорт данных в CSV (потоковый, gzip для *.gz или compress=True)"""
+        cursor = self._get_connection().cursor()
+        try:
+            cursor.execute(self._export_query(cursor, table_name))
             columns = [description[0] for description in cursor.description]
 
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(columns)
-                writer.writerows(rows)
-
-    def import_from_csv(self, table_name: str, filename: str):
-        """Импорт данных из CSV"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-
-            with open(filename, 'r', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                columns = next(reader)
-                placeholders = ', '.join(['?' for _ in columns])
-
-                for row in reader:
-                    cursor.execute(f'INSERT INTO {table_name} ({", ".join(columns)}) VALUES ({placeholders})', row)
-
-            conn.commit()
-
-    def export_to_json(self, table_name: str, filename: str):
-        """Экспорт данных в JSON"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(f'SELECT * FROM {table_name}')
-            rows = cursor.fetchall()
+            with open_text(filename, 'w', compress) as csvfile:
+                return write_csv_rows(csvfile, columns, iter_batches(cursor, batch_size, progress))
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _export_query(cursor: sqlite3.Cursor, table_name: str) -> str:
+        """
+        Запрос выгрузки всех строк таблицы. Суммы в копейках выгружаются
+        в рублях под прежними именами (price, total_amount, unit_price),
+        поэтому формат файлов не изменился и они импортируются обратно.
+        """
+        legacy, cents = MONEY_COLUMNS.get(table_name, (None, None))
+        columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table_name})').fetchall()]
+        if cents not in columns:
+            return f'SELECT * FROM {table_name}'
+        select = ', '.join(f'{units_sql(column)} AS {legacy}' if column == cents else column
+                           for column in columns)
+        return f'SELECT {select} FROM {table_name}'
+
+    def import_from_csv(self, table_name: str, filename: str, chunk_size: int = BULK_CHUNK_SIZE,
+                        on_error: str = 'rollback', defer_indexes: bool = False,
+                        progress: Optional[Callable[[ImportStats], None]] = None,
+                        validate: bool = False) -> ImportStats:
+        """Импорт данных из CSV (при validate=True клиенты и товары проверяются пачками, см. validation)"""
+        with open_text(filename, 'r') as csvfile:
+            columns, rows = read_csv_rows(csvfile)
+            return self.bulk_insert(table_name, columns, rows, chunk_size=chunk_size,
+                                    on_error=on_error, defer_indexes=defer_indexes, progress=progress,
+                                    validate=validate)
+
+    def export_to_json(self, table_name: str, filename: str, batch_size: int = EXPORT_BATCH_SIZE,
+                       lines: Optional[bool] = None, compress: Optional[bool] = None,
+                       progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Экспорт данных в JSON (потоковый).
+
+        По умолчанию пишется JSON-массив объектов; lines=True (или расширение
+        .jsonl) включает формат JSON Lines. Расширение .gz или compress=True
+        включает сжатие gzip. progress вызывается с числом выгруженных строк
+        после каждой пачки.
+        """
+        if lines is None:
+            lines = filename.endswith(('.jsonl', '.jsonl.gz'))
+
+        cursor = self._get_connection().cursor()
+        try:
+            cursor.execute(self._export_query(cursor, table_name))
             columns = [description[0] for description in cursor.description]
 
-            data = [dict(zip(columns, row)) for row in rows]
-
-            with open(filename, 'w', encoding='utf-8') as jsonfile:
-                json.dump(data, jsonfile, indent=2, ensure_ascii=False)
-
-    def import_from_json(self, table_name: str, filename: str):
-        """Импорт данных из JSON"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-
-            with open(filename, 'r', encoding='utf-8') as jsonfile:
-                data = json.load(jsonfile)
-
-                if data:
-                    columns = list(data[0].keys())
-                    placeholders = ', '.join(['?' for _ in columns])
-
-                    for item in data:
-                        values = [item[col] for col in columns]
-                        cursor.execute(f'INSERT INTO {table_name} ({", ".join(columns)}) VALUES ({placeholders})',
-                                       values)
+            with open_text(filename, 'w', compress) as jsonfile:
+                return write_json_rows(jsonfile, columns, iter_batches(cursor, batch_size, progress), lines)
+        finally:
+            cursor.close()
+
+    def import_from_json(self, table_name: str, filename: str, chunk_size: int = BULK_CHUNK_SIZE,
+                         on_error: str = 'rollback', defer_indexes: bool = False,
+                         progress: Optional[Callable[[ImportStats], None]] = None,
+                         validate: bool = False) -> ImportStats:
+        """Импорт данных из JSON (массив объектов или JSON Lines), проверка - как в import_from_csv"""
+        with open_text(filename, 'r') as jsonfile:
+            columns, rows = read_json_rows(jsonfile)
+            return self.bulk_insert(table_name, columns, rows, chunk_size=chunk_size,
+                                    on_error=on_error, defer_indexes=defer_indexes, progress=progress,
+                                    validate=validate)
+
+    def bulk_insert(self, table_name: str, columns: List[str], rows: Iterable[Any],
+                    chunk_size: int = BULK_CHUNK_SIZE, on_error: str = 'rollback',
+                    defer_indexes: bool = False,
+                    progress: Optional[Callable[[ImportStats], None]] = None,
+                    validate: bool = False) -> ImportStats:
+        """
+        Пакетная вставка строк через executemany в одной транзакции.
+
+        on_error='rollback' откатывает весь импорт при первой ошибочной строке
+        и выбрасывает BulkImportError; on_error='skip' пропускает ошибочные
+        строки, записывая их номера в ImportStats.errors, и продолжает импорт.
+        При defer_indexes=True индексы таблицы удаляются на время вставки и
+        строятся заново перед фиксацией транзакции. Агрегатные таблицы
+        обновляются в той же транзакции: по новому диапазону ID или, если
+        ID заданы в данных, полным пересчетом. Суммы в рублях (price,
+        total_amount, unit_price) переводятся в копейки через to_cents, как
+        в моделях; некорректная сумма - ошибка строки. Колонки *_cents
+        вставляются как есть. При validate=True строки
+        клиентов и товаров перед вставкой проверяются пачкой
+        (validation.compile_validator), ошибочные обрабатываются как on_error.
+        """
+        if on_error not in ('rollback', 'skip'):
+            raise ValueError(f"Unknown on_error mode: {on_error}")
+
+        stats = ImportStats()
+        if not columns:
+            return stats
+
+        legacy, cents = MONEY_COLUMNS.get(table_name, (None, None))
+        targets = [cents if col == legacy else col for col in columns]
+        money_index = columns.index(legacy) if legacy in columns else None
+        placeholders = ', '.join(['?'] * len(columns))
+        insert_sql = f'INSERT INTO {table_name} ({", ".join(targets)}) VALUES ({placeholders})'
+        validator = compile_validator(table_name, columns) if validate else None
+
+        conn = self._get_connection()
+        if conn.in_transaction:
+            conn.commit()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN')
+            rollups = [name for name, source in ROLLUP_SOURCES.items() if source == table_name]
+            if rollups:
+                cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table_name}')
+                last_id = cursor.fetchone()[0]
+            indexes = self._drop_indexes(cursor, table_name) if defer_indexes else []
+
+            width = len(columns)
+            chunk: List[Any] = []
+            numbers: List[int] = []
+            for row_number, row in enumerate(rows, start=1):
+                # Быстрая проверка для списков из csv; подробная - только для подозрительных строк
+                if type(row) is not list or len(row) != width:
+                    error = check_row(row, columns)
+                    if error:
+                        self._reject_row(stats, row_number, error, on_error)
+                        continue
+                    if isinstance(row, Mapping):
+                        row = [row[col] for col in columns]
+                chunk.append(row)
+                numbers.append(row_number)
+                if len(chunk) >= chunk_size:
+                    self._insert_chunk(cursor, insert_sql, chunk, numbers, stats, on_error, validator,
+                                       money_index)
+                    chunk, numbers = [], []
+                    if progress:
+                        stats.update_elapsed()
+                        progress(stats)
+            if chunk:
+                self._insert_chunk(cursor, insert_sql, chunk, numbers, stats, on_error, validator,
+                                   money_index)
+            # Последний отчет - до фиксации: отмена в нем еще откатывает импорт
+            if progress:
+                stats.update_elapsed()
+                progress(stats)
+
+            for index_sql in indexes:
+                cursor.execute(index_sql)
+            if table_name == 'customers' and stats.rows_imported:
+                # Город новых клиентов (поиск по индексу idx_customers_city)
+                cursor.execute(f'UPDATE customers SET city = {CITY_SQL} WHERE city IS NULL')
+            if rollups and stats.rows_imported:
+                if 'id' in columns:
+                    rebuild_rollups(cursor, rollups)
+                    if table_name == 'orders':
+                        # ID заказов заданы в данных: даты товаров - по всем заказам
+                        refresh_product_dates(cursor)
+                else:
+                    apply_new_rows(cursor, table_name, last_id)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+        stats.update_elapsed()
+        if stats.rows_imported:
+            self._notify(table_name, 'reload')
+        return stats
+
+    def rebuild_rollups(self):
+        """Полный пересчет агрегатных таблиц по заказам"""
+        with self._get_connection() as conn:
+            rebuild_rollups(conn.cursor())
+            conn.commit()
 
-            conn.commit()
\ No newline at end of file
+    def check_rollups(self) -> Dict[str, List[Any]]:
+        """Проверка агрегатных таблиц: ключи записей с расхождениями по каждой таблице"""
+        with self._get_connection() as conn:
+            return check_rollups(conn.cursor())
+
+    def _insert_chunk(self, cursor: sqlite3.Cursor, insert_sql: str, chunk: List[Any],
+                      numbers: List[int], stats: ImportStats, on_error: str,
+                      validator: Optional[RowValidator] = None, money_index: Optional[int] = None):
+        """
+        Вставка пачки строк; при ошибке пачка повторяется построчно для поиска плохих строк.
+
+        money_index - позиция суммы в рублях, которая переводится в копейки перед вставкой.
+        """
+        if validator is not None:
+            codes = validator(chunk)
+            if any(codes):
+                valid = []
+                for row_number, row, code in zip(numbers, chunk, codes):
+                    if code:
+                        self._reject_row(stats, row_number, ERROR_MESSAGES[code], on_error)
+                    else:
+                        valid.append((row_number, row))
+                if not valid:
+                    return
+                numbers, chunk = [list(values) for values in zip(*valid)]
+        if money_index is not None:
+            numbers, chunk = self._convert_money(chunk, numbers, money_index, stats, on_error)
+            if not chunk:
+                return
+        cursor.execute('SAVEPOINT bulk_chunk')
+        try:
+            cursor.executemany(insert_sql, chunk)
+            stats.rows_imported += len(chunk)
+        except sqlite3.Error:
+            cursor.execute('ROLLBACK TO bulk_chunk')
+            for row_number, row in zip(numbers, chunk):
+                try:
+                    cursor.execute(insert_sql, row)
+                    stats.rows_imported += 1
+                except sqlite3.Error as e:
+                    self._reject_row(stats, row_number, str(e), on_error)
+        finally:
+            cursor.execute('RELEASE bulk_chunk')
+
+    @classmethod
+    def _convert_money(cls, chunk: List[Any], numbers: List[int], index: int,
+                       stats: ImportStats, on_error: str) -> Tuple[List[int], List[Any]]:
+        """Перевод суммы в позиции index в копейки; строки с некорректной суммой отклоняются"""
+        valid_numbers, converted = [], []
+        for row_number, row in zip(numbers, chunk):
+            try:
+                cents = to_cents(row[index])
+            except ValueError as e:
+                cls._reject_row(stats, row_number, str(e), on_error)
+                continue
+            row = list(row)
+            row[index] = cents
+            valid_numbers.append(row_number)
+            converted.append(row)
+        return valid_numbers, converted
+
+    @staticmethod
+    def _reject_row(stats: ImportStats, row_number: int, message: str, on_error: str):
+        """Учет ошибочной строки согласно режиму on_error"""
+        if on_error == 'rollback':
+            raise BulkImportError(row_number, message)
+        stats.rows_skipped += 1
+        stats.errors.append((row_number, message))
+
+    @staticmethod
+    def _drop_indexes(cursor: sqlite3.Cursor, table_name: str) -> List[str]:
+        """Удаление индексов таблицы; возвращает SQL для их восстановления"""
+        cursor.execute('''
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+        ''', (table_name,))
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {name}')
+        return [sql for _, sql in indexes]
@@ -1,15 +1,24 @@
+import os
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 from tkinter import font as tkfont
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
 from PIL import Image, ImageTk
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from models import Customer, Product, Order, OrderItem, ModelFactory
 from db import Database
+from money import from_cents
 from analysis import DataAnalyzer
+from charts import ChartView, network_layout
+from widgets import VirtualTreeview, LazyChoices
+from tasks import TaskRunner, POLL_INTERVAL
+
+# Размер страницы при заполнении комбобоксов клиентов и товаров
+CHOICES_PAGE_SIZE = 1000
 
 
 class OrderManagementApp:
@@ -19,17 +28,30 @@ class OrderManagementApp:
         self.root.geometry("1200x800")
         self.root.configure(bg='#f0f0f0')
 
-        self.db = Database()
-        self.analyzer = DataAnalyzer()
+        # WAL: аналитические запросы не блокируют запись заказов
+        self.db = Database(profile='performance')
+        self.analyzer = DataAnalyzer(profile='performance')
 
         self.current_customer = None
         self.current_order = None
         self.cart_items = []
 
+        # Фоновые операции: интерфейс не блокируется на время запросов
+        self.tasks = TaskRunner(self.root, on_state_change=self.on_tasks_changed)
+        self.task_descriptions = {}
+        self.chart_request = None
+
         self.setup_styles()
         self.create_widgets()
         self.load_data()
 
+        # Изменения из базы применяются к спискам точечно, без полной перезагрузки
+        self.changes = queue.Queue()
+        self.db.subscribe(self.changes.put)
+        self.root.after(POLL_INTERVAL, self.process_changes)
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def setup_styles(self):
         """Настройка стилей приложения"""
         self.style = ttk.Style()
@@ -44,6 +66,9 @@ class OrderManagementApp:
 
     def create_widgets(self):
         """Создание виджетов интерфейса"""
+        # Строка состояния фоновых операций
+        self.setup_status_bar()
+
         # Главный фрейм с вкладками
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
@@ -73,6 +98,21 @@ class OrderManagementApp:
         self.notebook.add(self.import_export_frame, text='Импорт/Экспорт')
         self.setup_import_export_tab()
 
+    def setup_status_bar(self):
+        """Настройка строки состояния с прогрессом и отменой операций"""
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side='bottom', fill='x', padx=10, pady=(0, 10))
+
+        self.status_label = ttk.Label(status_frame, text="Готово")
+        self.status_label.pack(side='left')
+
+        self.cancel_button = ttk.Button(status_frame, text="Отмена", state='disabled',
+                                        command=self.tasks.cancel)
+        self.cancel_button.pack(side='right')
+
+        self.progress_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=200)
+        self.progress_bar.pack(side='right', padx=5)
+
     def setup_customers_tab(self):
         """Настройка вкладки клиентов"""
         # Фрейм для формы добавления клиента
@@ -109,8 +149,9 @@ class OrderManagementApp:
             self.customers_tree.heading(col, text=col.replace('_', ' ').title())
             self.customers_tree.column(col, width=100)
 
-        scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=self.customers_tree.yview)
-        self.customers_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(table_frame, orient='vertical')
+        self.customers_view = VirtualTreeview(self.customers_tree, scrollbar, self.db.get_customers_page,
+                                              key=lambda row: (row[1], row[0]))
 
         self.customers_tree.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
@@ -167,8 +208,9 @@ class OrderManagementApp:
             self.products_tree.heading(col, text=col.replace('_', ' ').title())
             self.products_tree.column(col, width=100)
 
-        scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=self.products_tree.yview)
-        self.products_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(table_frame, orient='vertical')
+        self.products_view = VirtualTreeview(self.products_tree, scrollbar, self.db.get_products_page,
+                                             key=lambda row: (row[1], row[0]))
 
         self.products_tree.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
@@ -195,13 +237,23 @@ class OrderManagementApp:
         self.customer_var = tk.StringVar()
         self.customer_combo = ttk.Combobox(order_frame, textvariable=self.customer_var, state='readonly')
         self.customer_combo.grid(row=0, column=1, padx=5, pady=5)
-        self.customer_combo.bind('<<ComboboxSelected>>', self.on_customer_select)
+        self.customer_choices = LazyChoices(self.customer_combo, self.db.get_customers_page,
+                                            key=lambda row: (row[1], row[0]),
+                                            format_row=lambda row: f"{row[0]}: {row[1]}",
+                                            page_size=CHOICES_PAGE_SIZE, runner=self.tasks,
+                                            task_key='choices_customers')
+        self.customer_combo.bind('<<ComboboxSelected>>', self.on_customer_select, add='+')
 
         # Выбор товара
         ttk.Label(order_frame, text="Товар:").grid(row=1, column=0, padx=5, pady=5, sticky='e')
         self.product_var = tk.StringVar()
         self.product_combo = ttk.Combobox(order_frame, textvariable=self.product_var, state='readonly')
         self.product_combo.grid(row=1, column=1, padx=5, pady=5)
+        self.product_choices = LazyChoices(self.product_combo, self.db.get_products_page,
+                                           key=lambda row: (row[1], row[0]),
+                                           format_row=lambda row: f"{row[0]}: {row[1]} (${row[3]})",
+                                           page_size=CHOICES_PAGE_SIZE, runner=self.tasks,
+                                           task_key='choices_products')
 
         ttk.Label(order_frame, text="Количество:").grid(row=2, column=0, padx=5, pady=5, sticky='e')
         self.quantity_var = tk.StringVar(value="1")
@@ -249,8 +301,10 @@ class OrderManagementApp:
             self.orders_tree.heading(col, text=col.title())
             self.orders_tree.column(col, width=100)
 
-        scrollbar = ttk.Scrollbar(orders_table_frame, orient='vertical', command=self.orders_tree.yview)
-        self.orders_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(orders_table_frame, orient='vertical')
+        self.orders_view = VirtualTreeview(self.orders_tree, scrollbar, self.db.get_orders_page,
+                                           key=lambda row: (row[2] or '', row[0]), descending=True,
+                                           format_row=self.format_order_row)
 
         self.orders_tree.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
@@ -284,10 +338,15 @@ class OrderManagementApp:
                    command=self.show_customer_network).pack(side='left', padx=5)
         ttk.Button(button_frame, text="География",
                    command=self.show_customer_geography).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Обновить все",
+                   command=self.refresh_reports).pack(side='left', padx=5)
 
-        # Область для отображения графиков
+        # Область для отображения графиков: одна фигура и холст на все графики
         self.chart_frame = ttk.Frame(analysis_frame)
         self.chart_frame.pack(fill='both', expand=True)
+        self.chart_view = ChartView(Figure(figsize=(12, 6)))
+        self.chart_canvas = FigureCanvasTkAgg(self.chart_view.fig, self.chart_frame)
+        self.chart_canvas.get_tk_widget().pack(fill='both', expand=True)
 
     def setup_import_export_tab(self):
         """Настройка вкладки импорта/экспорта"""
@@ -303,7 +362,7 @@ class OrderManagementApp:
         self.export_table.grid(row=0, column=1, padx=5, pady=5)
 
         ttk.Label(export_frame, text="Формат:").grid(row=0, column=2, padx=5, pady=5)
-        self.export_format = ttk.Combobox(export_frame, values=['CSV', 'JSON'], state='readonly')
+        self.export_format = ttk.Combobox(export_frame, values=['CSV', 'JSON', 'JSONL'], state='readonly')
         self.export_format.grid(row=0, column=3, padx=5, pady=5)
 
         ttk.Button(export_frame, text="Экспорт",
@@ -344,51 +403,120 @@ class OrderManagementApp:
         self.load_orders()
 
     def load_customers(self):
-        """Загрузка списка клиентов"""
-        for item in self.customers_tree.get_children():
-            self.customers_tree.delete(item)
-
-        customers = self.db.get_all_customers()
-        for customer in customers:
-            self.customers_tree.insert('', 'end', values=(
-                customer.id, customer.name, customer.email,
-                customer.phone, customer.address, customer.registration_date
-            ))
-
-        # Обновление комбобокса для заказов
-        customer_names = [f"{c.id}: {c.name}" for c in customers]
-        self.customer_combo['values'] = customer_names
+        """Загрузка списка клиентов (первая страница виртуализированного списка)"""
+        self.run_task('load_customers', "Загрузка клиентов",
+                      lambda task: self.customers_view.fetch_first(),
+                      on_success=self.customers_view.reset)
 
     def load_products(self):
-        """Загрузка списка товаров"""
-        for item in self.products_tree.get_children():
-            self.products_tree.delete(item)
-
-        products = self.db.get_all_products()
-        for product in products:
-            self.products_tree.insert('', 'end', values=(
-                product.id, product.name, product.description,
-                product.price, product.category, product.stock
-            ))
-
-        # Обновление комбобокса для заказов
-        product_names = [f"{p.id}: {p.name} (${p.price})" for p in products]
-        self.product_combo['values'] = product_names
+        """Загрузка списка товаров (первая страница виртуализированного списка)"""
+        self.run_task('load_products', "Загрузка товаров",
+                      lambda task: self.products_view.fetch_first(),
+                      on_success=self.products_view.reset)
 
     def load_orders(self):
-        """Загрузка списка заказов"""
-        for item in self.orders_tree.get_children():
-            self.orders_tree.delete(item)
-
-        orders = self.db.get_all_orders()
-        for order in orders:
-            self.orders_tree.insert('', 'end', values=(
-                order.id,
-                order.customer.name if order.customer else "Unknown",
-                order.order_date,
-                order.status,
-                f"${order.total_amount:.2f}"
-            ))
+        """Загрузка списка заказов (первая страница виртуализированного списка)"""
+        self.run_task('load_orders', "Загрузка заказов",
+                      lambda task: self.orders_view.fetch_first(),
+                      on_success=self.orders_view.reset)
+
+    def process_changes(self):
+        """Применение изменений из базы к спискам и комбобоксам (в потоке интерфейса)"""
+        views = {
+            'customers': (self.customers_view, self.customer_choices, self.load_customers),
+            'products': (self.products_view, self.product_choices, self.load_products),
+            'orders': (self.orders_view, None, self.load_orders),
+        }
+        try:
+            while True:
+                try:
+                    change = self.changes.get_nowait()
+                except queue.Empty:
+                    break
+                if change.table not in views:
+                    continue
+                view, choices, reload = views[change.table]
+                if change.action == 'reload':
+                    if choices:
+                        choices.invalidate()
+                    reload()
+                    continue
+                for row in change.rows:
+                    if change.action == 'insert':
+                        view.apply_insert(row)
+                        if choices:
+                            choices.apply_insert(row)
+                    else:
+                        view.apply_update(row)
+                        if choices:
+                            choices.apply_update(row)
+        finally:
+            self.root.after(POLL_INTERVAL, self.process_changes)
+
+    def run_task(self, key, description, func, *args, on_success=None, on_cancel=None,
+                 error_message="Ошибка"):
+        """Запуск операции в фоновом потоке; повторный запуск той же операции игнорируется"""
+        submitted = self.tasks.submit(
+            key, func, *args,
+            on_success=on_success,
+            on_error=lambda e: messagebox.showerror("Ошибка", f"{error_message}: {str(e)}"),
+            on_progress=self.show_progress,
+            on_cancel=on_cancel
+        )
+        if submitted:
+            self.task_descriptions[key] = description
+            self.on_tasks_changed(self.tasks.active)
+        else:
+            self.status_label.config(text=f"Операция уже выполняется: {description}")
+        return submitted
+
+    def on_tasks_changed(self, active):
+        """Обновление строки состояния при запуске и завершении операций"""
+        if active:
+            names = [self.task_descriptions.get(key, key) for key in active]
+            self.status_label.config(text="Выполняется: " + ", ".join(names))
+            self.cancel_button.config(state='normal')
+            if str(self.progress_bar['mode']) == 'indeterminate':
+                self.progress_bar.start(10)
+        else:
+            self.status_label.config(text="Готово")
+            self.cancel_button.config(state='disabled')
+            self.progress_bar.stop()
+            self.progress_bar.config(mode='indeterminate', value=0)
+
+    def show_progress(self, fraction, message):
+        """Отображение прогресса фоновой операции"""
+        if fraction is None:
+            if str(self.progress_bar['mode']) != 'indeterminate':
+                self.progress_bar.config(mode='indeterminate')
+                self.progress_bar.start(10)
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode='determinate', value=fraction * 100)
+        if message:
+            self.status_label.config(text=message)
+
+    def on_close(self):
+        """Отмена фоновых операций и закрытие соединений при выходе"""
+        # Окно скрывается сразу; соединения закрываются, когда рабочие
+        # потоки закончат работу, без блокировки цикла Tk
+        self.root.withdraw()
+        self.db.unsubscribe(self.changes.put)
+        self.chart_view.clear()
+        self.tasks.shutdown(on_done=self._close_connections)
+
+    def _close_connections(self):
+        """Закрытие соединений и окна после завершения фоновых задач"""
+        self.db.close()
+        self.analyzer.close()
+        self.root.destroy()
+
+    @staticmethod
+    def format_order_row(row):
+        """Форматирование строки заказа для таблицы"""
+        order_id, customer_name, order_date, status, total_amount = row
+        return (order_id, customer_name or "Unknown", order_date, status,
+                f"${total_amount or 0:.2f}")
 
     def add_customer(self):
         """Добавление нового клиента"""
@@ -403,7 +531,6 @@ class OrderManagementApp:
             if customer.validate():
                 customer_id = self.db.add_customer(customer)
                 self.log_operation(f"Добавлен клиент: {customer.name} (ID: {customer_id})")
-                self.load_customers()
                 self.clear_customer_form()
                 messagebox.showinfo("Успех", "Клиент успешно добавлен")
             else:
@@ -425,7 +552,6 @@ class OrderManagementApp:
             if product.validate():
                 product_id = self.db.add_product(product)
                 self.log_operation(f"Добавлен товар: {product.name} (ID: {product_id})")
-                self.load_products()
                 self.clear_product_form()
                 messagebox.showinfo("Успех", "Товар успешно добавлен")
             else:
@@ -437,10 +563,10 @@ class OrderManagementApp:
 
     def on_customer_select(self, event):
         """Обработка выбора клиента"""
-        selection = self.customer_var.get()
-        if selection:
-            customer_id = int(selection.split(':')[0])
-            self.current_customer = self.db.get_customer(customer_id)
+        # Служебная строка "Загрузить еще..." не выбирает клиента
+        row = self.customer_choices.selected_row()
+        if row is not None:
+            self.current_customer = self.db.get_customer(row[0])
 
     def add_to_cart(self):
         """Добавление товара в корзину"""
@@ -449,19 +575,27 @@ class OrderManagementApp:
                 messagebox.showerror("Ошибка", "Сначала выберите клиента")
                 return
 
-            selection = self.product_var.get()
-            if not selection:
+            # Товар берется из строки списка: запрос к базе на каждое добавление не нужен
+            row = self.product_choices.selected_row()
+            if row is None:
                 messagebox.showerror("Ошибка", "Выберите товар")
                 return
 
-            product_id = int(selection.split(':')[0])
-            product = self.db.get_product(product_id)
+            product = Product(id=row[0], name=row[1], description=row[2], price=row[3],
+                              category=row[4], stock=row[5] or 0)
             quantity = int(self.quantity_var.get())
 
             if quantity <= 0:
                 messagebox.showerror("Ошибка", "Количество должно быть положительным")
                 return
 
+            # Предварительная проверка по списку; окончательная - при оформлении заказа
+            in_cart = sum(q for p, q in self.cart_items if p.id == product.id)
+            if in_cart + quantity > product.stock:
+                messagebox.showerror("Ошибка", f"Недостаточно товара на складе: "
+                                               f"в наличии {product.stock}, в корзине {in_cart}")
+                return
+
             # Добавляем в корзину
             self.cart_items.append((product, quantity))
 
@@ -478,15 +612,16 @@ class OrderManagementApp:
         for item in self.cart_tree.get_children():
             self.cart_tree.delete(item)
 
-        total = 0
+        # Суммы складываются в копейках, в рубли переводятся только для показа
+        total_cents = 0
         for product, quantity in self.cart_items:
-            item_total = product.price * quantity
-            total += item_total
+            item_cents = product.price_cents * quantity
+            total_cents += item_cents
             self.cart_tree.insert('', 'end', values=(
-                product.name, quantity, f"${product.price:.2f}", f"${item_total:.2f}"
+                product.name, quantity, f"${product.price:.2f}", f"${from_cents(item_cents):.2f}"
             ))
 
-        self.total_label.config(text=f"${total:.2f}")
+        self.total_label.config(text=f"${from_cents(total_cents):.2f}")
 
     def remove_from_cart(self):
         """Удаление товара из корзины"""
@@ -512,15 +647,18 @@ class OrderManagementApp:
                 order.add_item(product, quantity)
 
             if order.validate():
-                order_id = self.db.add_order(order)
-                self.log_operation(f"Создан заказ: #{order_id} для {self.current_customer.name}")
+                def on_created(order_id):
+                    self.log_operation(f"Создан заказ: #{order_id} для {order.customer.name}")
+
+                    # Очищаем корзину
+                    self.cart_items = []
+                    self.update_cart_display()
 
-                # Очищаем корзину
-                self.cart_items = []
-                self.update_cart_display()
-                self.load_orders()
+                    messagebox.showinfo("Успех", f"Заказ #{order_id} успешно создан")
 
-                messagebox.showinfo("Успех", f"Заказ #{order_id} успешно создан")
+                self.run_task('create_order', "Создание заказа",
+                              lambda task: self.db.place_order(order),
+                              on_success=on_created, error_message="Ошибка при создании заказа")
             else:
                 messagebox.showerror("Ошибка", "Неверные данные заказа")
 
@@ -540,13 +678,27 @@ class OrderManagementApp:
             )
 
             if filename:
-                if format == 'csv':
-                    self.db.export_to_csv(table, filename)
-                elif format == 'json':
-                    self.db.export_to_json(table, filename)
+                def export(task):
+                    def progress(rows):
+                        task.progress(None, f"Экспорт {table}: {rows} строк")
+
+                    if format == 'csv':
+                        return self.db.export_to_csv(table, filename, progress=progress)
+                    return self.db.export_to_json(table, filename, lines=(format == 'jsonl'),
+                                                  progress=progress)
+
+                def on_exported(count):
+                    self.log_operation(f"Экспортирована таблица {table} в {format.upper()} ({count} строк)")
+                    messagebox.showinfo("Успех", f"Данные экспортированы в {filename}")
 
-                self.log_operation(f"Экспортирована таблица {table} в {format.upper()}")
-                messagebox.showinfo("Успех", f"Данные экспортированы в {filename}")
+                def on_cancelled():
+                    # Недописанный файл удаляется
+                    if os.path.exists(filename):
+                        os.remove(filename)
+                    self.log_operation(f"Экспорт таблицы {table} отменен")
+
+                self.run_task('export', f"Экспорт {table}", export, on_success=on_exported,
+                              on_cancel=on_cancelled, error_message="Ошибка при экспорте")
 
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка при экспорте: {str(e)}")
@@ -554,7 +706,7 @@ class OrderManagementApp:
     def select_import_file(self):
         """Выбор файла для импорта"""
         filename = filedialog.askopenfilename(
-            filetypes=[("CSV files", "*.csv"), ("JSON files", "*.json")]
+            filetypes=[("CSV files", "*.csv"), ("JSON files", "*.json"), ("JSON Lines files", "*.jsonl")]
         )
         if filename:
             self.import_file.config(text=filename)
@@ -568,71 +720,73 @@ class OrderManagementApp:
                 return
 
             table = self.import_table.get()
-            format = self.import_format.get().lower()
 
             if filename.endswith('.csv'):
-                self.db.import_from_csv(table, filename)
-            elif filename.endswith('.json'):
-                self.db.import_from_json(table, filename)
+                importer = self.db.import_from_csv
+            elif filename.endswith('.json') or filename.endswith('.jsonl'):
+                importer = self.db.import_from_json
+            else:
+                messagebox.showerror("Ошибка", "Неподдерживаемый формат файла")
+                return
 
-            self.log_operation(f"Импортирована таблица {table} из {filename}")
-            messagebox.showinfo("Успех", "Данные успешно импортированы")
+            def run_import(task):
+                def progress(stats):
+                    task.progress(None, f"Импорт {table}: {stats.rows_imported} строк "
+                                        f"({stats.rows_per_second:.0f} строк/с)")
 
-            # Обновляем данные
-            if table == 'customers':
-                self.load_customers()
-            elif table == 'products':
-                self.load_products()
-            elif table == 'orders':
-                self.load_orders()
+                return importer(table, filename, progress=progress)
+
+            def on_imported(stats):
+                self.log_operation(f"Импортирована таблица {table} из {filename}: "
+                                   f"{stats.rows_imported} строк ({stats.rows_per_second:.0f} строк/с)")
+                messagebox.showinfo("Успех", "Данные успешно импортированы")
+
+            # Транзакция импорта откатывается при отмене
+            self.run_task('import', f"Импорт {table}", run_import, on_success=on_imported,
+                          on_cancel=lambda: self.log_operation(f"Импорт таблицы {table} отменен"),
+                          error_message="Ошибка при импорте")
 
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка при импорте: {str(e)}")
 
-    def show_top_customers(self):
-        """Показать топ клиентов"""
-        try:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            top_customers = self.analyzer.get_top_customers()
+    def show_chart(self, key, description, compute, draw):
+        """Расчет данных графика в фоне и отрисовка в потоке интерфейса"""
+        # Отображается только последний запрошенный график
+        self.chart_request = key
 
-            ax.barh(top_customers['name'], top_customers['order_count'])
-            ax.set_title('Топ клиентов по количеству заказов')
-            ax.set_xlabel('Количество заказов')
-            ax.set_ylabel('Клиенты')
+        def on_ready(data):
+            if self.chart_request != key:
+                return
+            try:
+                draw(data)
+                self.display_chart()
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при построении графика: {str(e)}")
 
-            self.display_chart(fig)
+        self.run_task(f'chart_{key}', description, lambda task: compute(), on_success=on_ready,
+                      error_message="Ошибка при построении графика")
 
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при построении графика: {str(e)}")
+    def show_top_customers(self):
+        """Показать топ клиентов"""
+        self.show_chart('top_customers', "Топ клиенты", self.analyzer.get_top_customers,
+                        self.draw_top_customers)
+
+    def draw_top_customers(self, top_customers):
+        """Построение графика топ клиентов"""
+        self.chart_view.show('top_customers', top_customers)
 
     def show_sales_trend(self):
         """Показать динамику продаж"""
-        try:
-            fig, ax = plt.subplots(figsize=(12, 6))
-            sales_data = self.analyzer.get_sales_trend('W')
+        self.show_chart('sales_trend', "Динамика продаж", lambda: self.analyzer.get_sales_trend('W'),
+                        self.draw_sales_trend)
 
-            sales_data.plot(kind='line', marker='o', ax=ax)
-            ax.set_title('Динамика продаж (по неделям)')
-            ax.set_xlabel('Дата')
-            ax.set_ylabel('Сумма продаж')
-            ax.grid(True)
-            plt.xticks(rotation=45)
-
-            self.display_chart(fig)
-
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при построении графика: {str(e)}")
+    def draw_sales_trend(self, sales_data):
+        """Построение графика динамики продаж"""
+        self.chart_view.show('sales_trend', sales_data, title='Динамика продаж (по неделям)')
 
-    def display_chart(self, fig):
-        """Отображение графика в интерфейсе"""
-        # Очищаем предыдущий график
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
-
-        # Создаем canvas для matplotlib
-        canvas = FigureCanvasTkAgg(fig, self.chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
+    def display_chart(self):
+        """Отображение обновленной фигуры (перерисовка откладывается до простоя Tk)"""
+        self.chart_canvas.draw_idle()
 
     def log_operation(self, message):
         """Логирование операций"""
@@ -690,7 +844,7 @@ class OrderManagementApp:
             details += f"Клиент: {order.customer.name}\n"
             details += f"Дата: {order.order_date}\n"
             details += f"Статус: {order.status}\n"
-            details += f"Общая сумма: ${order.total_amount:.2f}\n\n"
+            details += f"Общая сумма: ${order.total_amount or 0:.2f}\n\n"
             details += "Товары:\n"
 
             for item in order.items:
@@ -712,58 +866,46 @@ class OrderManagementApp:
 
     def show_top_products(self):
         """Показать топ товаров"""
-        try:
-            fig, ax = plt.subplots(figsize=(12, 6))
-            top_products = self.analyzer.get_top_products()
+        self.show_chart('top_products', "Топ товары", self.analyzer.get_top_products,
+                        self.draw_top_products)
 
-            ax.bar(top_products['name'], top_products['total_revenue'])
-            ax.set_title('Топ товаров по выручке')
-            ax.set_xlabel('Товары')
-            ax.set_ylabel('Выручка')
-            plt.xticks(rotation=45, ha='right')
-
-            self.display_chart(fig)
-
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при построении графика: {str(e)}")
+    def draw_top_products(self, top_products):
+        """Построение графика топ товаров"""
+        self.chart_view.show('top_products', top_products)
 
     def show_customer_network(self):
         """Показать граф клиентов"""
-        try:
-            fig, ax = plt.subplots(figsize=(14, 10))
+        def compute():
+            # Построение графа и раскладка - самая долгая часть, выполняется в фоне
             G = self.analyzer.create_customer_network()
-            pos = nx.spring_layout(G, k=1, iterations=50)
-
-            nx.draw_networkx_nodes(G, pos, node_size=500, node_color='lightblue', alpha=0.9, ax=ax)
+            return G, network_layout(G, self.analyzer.layout_cache)
 
-            edges = G.edges(data=True)
-            weights = [data['weight'] for _, _, data in edges]
-            nx.draw_networkx_edges(G, pos, width=[w / 2 for w in weights], alpha=0.6, ax=ax)
+        self.show_chart('customer_network', "Граф клиентов", compute, self.draw_customer_network)
 
-            labels = {node: G.nodes[node]['name'] for node in G.nodes()}
-            nx.draw_networkx_labels(G, pos, labels, font_size=8, ax=ax)
+    def draw_customer_network(self, data):
+        """Построение графа клиентов"""
+        G, pos = data
+        self.chart_view.show('network', G, pos=pos)
 
-            ax.set_title('Граф связей клиентов (по общим товарам)')
-            ax.axis('off')
+    def refresh_reports(self):
+        """Параллельный расчет всех отчетов; после него графики открываются из кэша"""
+        def on_done(run):
+            timings = ", ".join(f"{name} {elapsed:.2f} с" for name, elapsed in run.timings.items())
+            self.log_operation(f"Отчеты обновлены за {run.elapsed:.2f} с ({timings})")
+            for name, error in run.errors.items():
+                self.log_operation(f"Ошибка отчета {name}: {error}")
 
-            self.display_chart(fig)
-
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при построении графика: {str(e)}")
+        self.run_task('reports', "Обновление отчетов", lambda task: self.analyzer.run_reports(),
+                      on_success=on_done)
 
     def show_customer_geography(self):
         """Показать географическое распределение"""
-        try:
-            fig, ax = plt.subplots(figsize=(12, 8))
-            geo_data = self.analyzer.get_customer_geography()
+        self.show_chart('customer_geography', "География", self.analyzer.get_customer_geography,
+                        self.draw_customer_geography)
 
-            ax.pie(geo_data['count'], labels=geo_data['city'], autopct='%1.1f%%')
-            ax.set_title('Географическое распределение клиентов')
-
-            self.display_chart(fig)
-
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при построении графика: {str(e)}")
+    def draw_customer_geography(self, geo_data):
+        """Построение диаграммы географического распределения"""
+        self.chart_view.show('geography', geo_data)
 
 
 def main():
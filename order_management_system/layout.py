@@ -0,0 +1,175 @@
+"""
+Раскладка графа клиентов
+Позиции узлов кэшируются по версии графа и сохраняются в файл рядом с
+базой; при изменении графа пересчитываются только новые узлы
+"""
+
+import hashlib
+import json
+import os
+import threading
+import weakref
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+# Число показываемых узлов: клиенты с наибольшим суммарным весом связей
+NETWORK_MAX_NODES = 300
+
+# Итерации полной раскладки и дорасчета новых узлов
+LAYOUT_ITERATIONS = 50
+INCREMENTAL_ITERATIONS = 20
+
+# Фиксированное зерно: одинаковый граф раскладывается одинаково
+LAYOUT_SEED = 42
+
+Positions = Dict[Hashable, Tuple[float, float]]
+
+
+def layout_path(db_path: str) -> str:
+    """Файл кэша раскладки для базы данных"""
+    return os.path.splitext(db_path)[0] + '_layout.json'
+
+
+def top_subgraph(G: nx.Graph, max_nodes: Optional[int] = NETWORK_MAX_NODES) -> nx.Graph:
+    """Подграф из max_nodes узлов с наибольшим суммарным весом ребер"""
+    if max_nodes is None or len(G) <= max_nodes:
+        return G
+    strength = dict(G.degree(weight='weight'))
+    nodes = sorted(strength, key=lambda node: (-strength[node], node))[:max_nodes]
+    return G.subgraph(nodes)
+
+
+def graph_version(G: nx.Graph) -> str:
+    """Отпечаток узлов и взвешенных ребер графа"""
+    digest = hashlib.sha1()
+    digest.update(repr(sorted(G.nodes())).encode())
+    digest.update(repr(sorted((min(u, v), max(u, v), data.get('weight', 1))
+                              for u, v, data in G.edges(data=True))).encode())
+    return digest.hexdigest()
+
+
+def spring_positions(G: nx.Graph, known: Optional[Positions] = None) -> Positions:
+    """
+    Силовая раскладка графа.
+
+    Узлы из known остаются на своих местах, новые ставятся в центр своих
+    уже размещенных соседей и сдвигаются за INCREMENTAL_ITERATIONS итераций.
+    Без known граф раскладывается полностью.
+    """
+    known = {node: pos for node, pos in (known or {}).items() if node in G}
+    if not known:
+        pos = nx.spring_layout(G, k=1, iterations=LAYOUT_ITERATIONS, seed=LAYOUT_SEED)
+    elif len(known) == len(G):
+        return dict(known)
+    else:
+        rng = np.random.default_rng(LAYOUT_SEED)
+        coords = np.array(list(known.values()))
+        low, high = coords.min(axis=0), coords.max(axis=0)
+        initial = {node: np.asarray(pos) for node, pos in known.items()}
+        for node in G:
+            if node in initial:
+                continue
+            neighbors = [initial[other] for other in G[node] if other in known]
+            if neighbors:
+                initial[node] = np.mean(neighbors, axis=0) + rng.normal(scale=0.05, size=2)
+            else:
+                initial[node] = rng.uniform(low, high)
+        pos = nx.spring_layout(G, k=1, pos=initial, fixed=list(known),
+                               iterations=INCREMENTAL_ITERATIONS, seed=LAYOUT_SEED)
+    return {node: (float(x), float(y)) for node, (x, y) in pos.items()}
+
+
+class LayoutCache:
+    """
+    Кэш раскладки графа клиентов.
+
+    Хранит позиции последнего показанного графа и его версию (отпечаток
+    узлов и ребер); path - JSON-файл, в котором кэш переживает
+    перезапуск. Повторный показ того же графа не пересчитывает раскладку,
+    измененный граф раскладывается с сохранением позиций известных узлов.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._positions: Positions = {}
+        self._loaded = False
+        # Последний граф и его отобранный подграф с версией: отбор узлов
+        # большого графа дороже самой раскладки подграфа из кэша
+        self._source: Optional[tuple] = None
+        self._selected: Optional[Tuple[nx.Graph, str]] = None
+
+    def _select(self, G: nx.Graph, max_nodes: Optional[int]) -> Tuple[nx.Graph, str]:
+        """Подграф для показа и его версия (повторно для того же графа не считаются)"""
+        size = (G.number_of_nodes(), G.number_of_edges(), max_nodes)
+        with self._lock:
+            if self._source is not None and self._source[0]() is G and self._source[1] == size:
+                return self._selected
+        H = top_subgraph(G, max_nodes)
+        selected = (H, graph_version(H))
+        with self._lock:
+            self._source = (weakref.ref(G), size)
+            self._selected = selected
+        return selected
+
+    def layout(self, G: nx.Graph, max_nodes: Optional[int] = NETWORK_MAX_NODES) -> Positions:
+        """
+        Позиции узлов показываемого подграфа G (не больше max_nodes узлов).
+
+        Граф, полученный из кэша DataAnalyzer, не изменяется, поэтому для
+        того же объекта с тем же числом узлов и ребер подграф не отбирается заново.
+        """
+        H, version = self._select(G, max_nodes)
+        with self._lock:
+            self._load()
+            if version == self._version:
+                return dict(self._positions)
+            known = self._positions
+
+        positions = spring_positions(H, known)
+        with self._lock:
+            self._version = version
+            self._positions = positions
+            self._save()
+        return dict(positions)
+
+    def clear(self):
+        """Сброс кэша и удаление файла"""
+        with self._lock:
+            self._version = None
+            self._positions = {}
+            self._loaded = True
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _load(self):
+        """Чтение сохраненной раскладки при первом обращении"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._positions = {node: (x, y) for node, x, y in data['positions']}
+            self._version = data['version']
+        except (OSError, ValueError, KeyError, TypeError):
+            # Поврежденный файл кэша не мешает показу: раскладка считается заново
+            self._version, self._positions = None, {}
+
+    def _save(self):
+        """Запись раскладки через временный файл"""
+        if not self.path:
+            return
+        data: Dict[str, Any] = {
+            'version': self._version,
+            'positions': [[node, x, y] for node, (x, y) in self._positions.items()],
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
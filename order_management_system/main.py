@@ -6,12 +6,62 @@
 
 import sys
 import os
+from typing import Sequence
 from gui import OrderManagementApp
+from db import Database
+from dashboard import export_dashboards
 import tkinter as tk
 
 
+COMMANDS = ('rebuild-rollups', 'check-rollups', 'export-charts')
+
+# Каталог выгрузки графиков по умолчанию
+CHARTS_DIR = 'data/export/charts'
+
+
+def run_command(command: str, args: Sequence[str] = ()) -> int:
+    """Служебные команды обслуживания базы данных без запуска интерфейса"""
+    if command not in COMMANDS:
+        print(f"Неизвестная команда: {command}. Доступны: {', '.join(COMMANDS)}")
+        return 2
+
+    if command == 'export-charts':
+        return export_charts(args)
+
+    with Database() as db:
+        if command == 'rebuild-rollups':
+            db.rebuild_rollups()
+            print("Агрегатные таблицы пересчитаны")
+            return 0
+
+        mismatches = db.check_rollups()
+        for table, ids in mismatches.items():
+            print(f"{table}: {len(ids)} расхождений" + (f": {ids[:20]}" if ids else ""))
+        return 1 if any(mismatches.values()) else 0
+
+
+def export_charts(args: Sequence[str]) -> int:
+    """
+    Выгрузка графиков без дисплея: export-charts [каталог] [база ...].
+
+    По умолчанию выгружается основная база в data/export/charts.
+    """
+    out_dir = args[0] if args else CHARTS_DIR
+    db_paths = list(args[1:]) or ['data/database.db']
+    result = export_dashboards(db_paths, out_dir)
+    for key, files in result.files.items():
+        print(f"{key}: {', '.join(files)}")
+    for key, error in result.errors.items():
+        print(f"{key}: ошибка: {error}")
+    print(f"Графики выгружены за {result.elapsed:.2f} с")
+    return 1 if result.errors else 0
+
+
 def main():
     """Основная функция приложения"""
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1], sys.argv[2:]))
+
     try:
         # Создаем необходимые директории
         os.makedirs('data/export', exist_ok=True)
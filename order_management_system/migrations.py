@@ -0,0 +1,445 @@
+"""
+Версионированные миграции схемы базы данных
+Текущая версия схемы хранится в PRAGMA user_version
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+from money import to_cents
+
+# Город клиента - часть адреса до первой запятой (колонка customers.city)
+CITY_SQL = '''CASE WHEN instr(address, ',') > 0
+    THEN trim(substr(address, 1, instr(address, ',') - 1), char(32, 9, 10, 13))
+    ELSE 'Не указан' END'''
+
+# Схема последней версии: новая база создается сразу по ней (create_schema),
+# существующие доводятся до нее миграциями. Таблицы - с {name} вместо имени.
+# Миграции эти определения не используют: у каждой своя копия нужного SQL,
+# чтобы правка схемы не меняла уже выпущенные миграции.
+SCHEMA_TABLES = {
+    'customers': '''
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            address TEXT,
+            registration_date TEXT,
+            city TEXT
+        )
+    ''',
+    'products': '''
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price_cents INTEGER NOT NULL,
+            category TEXT,
+            stock INTEGER DEFAULT 0
+        )
+    ''',
+    'orders': '''
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER,
+            order_date TEXT,
+            status TEXT,
+            total_cents INTEGER,
+            FOREIGN KEY (customer_id) REFERENCES customers (id)
+        )
+    ''',
+    'order_items': '''
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER,
+            unit_price_cents INTEGER,
+            FOREIGN KEY (order_id) REFERENCES orders (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''',
+    'customer_stats': '''
+        CREATE TABLE {name} (
+            customer_id INTEGER PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_spent_cents INTEGER NOT NULL DEFAULT 0,
+            last_order_date TEXT
+        )
+    ''',
+    'product_stats': '''
+        CREATE TABLE {name} (
+            product_id INTEGER PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            total_revenue_cents INTEGER NOT NULL DEFAULT 0,
+            last_order_date TEXT
+        )
+    ''',
+    'sales_daily': '''
+        CREATE TABLE {name} (
+            day TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_cents INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''',
+}
+
+# Индексы схемы последней версии (назначение - в миграциях, которые их добавили)
+SCHEMA_INDEXES = {
+    'idx_orders_customer': 'CREATE INDEX idx_orders_customer ON orders (customer_id, total_cents)',
+    'idx_orders_date': 'CREATE INDEX idx_orders_date ON orders (order_date, total_cents)',
+    'idx_order_items_order': 'CREATE INDEX idx_order_items_order ON order_items (order_id)',
+    'idx_order_items_product':
+        'CREATE INDEX idx_order_items_product ON order_items (product_id, quantity, unit_price_cents)',
+    'idx_customers_name': 'CREATE INDEX idx_customers_name ON customers (name)',
+    'idx_products_name': 'CREATE INDEX idx_products_name ON products (name)',
+    'idx_orders_date_key': "CREATE INDEX idx_orders_date_key ON orders (COALESCE(order_date, ''))",
+    'idx_customer_stats_top': 'CREATE INDEX idx_customer_stats_top ON customer_stats (order_count, total_spent_cents)',
+    'idx_product_stats_revenue': 'CREATE INDEX idx_product_stats_revenue ON product_stats (total_revenue_cents)',
+    'idx_customers_city': 'CREATE INDEX idx_customers_city ON customers (city)',
+}
+
+
+def create_schema(cursor: sqlite3.Cursor):
+    """Создание всех таблиц и индексов новой базы в последней версии схемы"""
+    for table_name, create_sql in SCHEMA_TABLES.items():
+        cursor.execute(create_sql.format(name=table_name))
+    for index_sql in SCHEMA_INDEXES.values():
+        cursor.execute(index_sql)
+
+
+def _v1_order_indexes(cursor: sqlite3.Cursor):
+    """Индексы для горячих запросов по заказам и элементам заказов"""
+    # Соединение клиентов с заказами и агрегаты по клиенту (покрывающий индекс)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_customer
+        ON orders (customer_id, total_amount)
+    ''')
+    # Сортировка и фильтрация по дате, динамика продаж (покрывающий индекс)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_date
+        ON orders (order_date, total_amount)
+    ''')
+    # Элементы заказа по ID заказа
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_order_items_order
+        ON order_items (order_id)
+    ''')
+    # Агрегаты по товарам и связи клиентов через товары (покрывающий индекс)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_order_items_product
+        ON order_items (product_id, quantity, unit_price)
+    ''')
+
+
+def _v2_keyset_indexes(cursor: sqlite3.Cursor):
+    """Индексы для keyset-пагинации списков по имени и по дате заказа"""
+    # В индекс неявно входит rowid, поэтому он покрывает ключ (name, id)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_customers_name
+        ON customers (name)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_products_name
+        ON products (name)
+    ''')
+    # Ключ (order_date, id) без сортировки во временном B-дереве
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_date_id
+        ON orders (order_date)
+    ''')
+
+
+def _v3_rollup_tables(cursor: sqlite3.Cursor):
+    """Агрегатные таблицы по клиентам и товарам для топ-N запросов"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_stats (
+            customer_id INTEGER PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_spent REAL NOT NULL DEFAULT 0,
+            last_order_date TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_stats (
+            product_id INTEGER PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            total_revenue REAL NOT NULL DEFAULT 0,
+            last_order_date TEXT
+        )
+    ''')
+    # Топ-N читается с конца индекса без сортировки
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_customer_stats_top
+        ON customer_stats (order_count, total_spent)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_product_stats_revenue
+        ON product_stats (total_revenue)
+    ''')
+
+    # Заполнение по уже накопленной истории
+    cursor.execute('''
+        INSERT INTO customer_stats (customer_id, order_count, total_spent, last_order_date)
+        SELECT customer_id, COUNT(*), TOTAL(total_amount), MAX(order_date)
+        FROM orders WHERE customer_id IS NOT NULL
+        GROUP BY customer_id
+    ''')
+    cursor.execute('''
+        INSERT INTO product_stats (product_id, order_count, total_quantity, total_revenue, last_order_date)
+        SELECT oi.product_id, COUNT(DISTINCT oi.order_id), COALESCE(SUM(oi.quantity), 0),
+               TOTAL(oi.quantity * oi.unit_price), MAX(o.order_date)
+        FROM order_items oi
+        LEFT JOIN orders o ON oi.order_id = o.id
+        WHERE oi.product_id IS NOT NULL
+        GROUP BY oi.product_id
+    ''')
+
+
+def _v4_sales_daily(cursor: sqlite3.Cursor):
+    """Дневные итоги продаж; недели и месяцы собираются из них"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        INSERT INTO sales_daily (day, order_count, total_amount)
+        SELECT date(order_date), COUNT(*), TOTAL(total_amount)
+        FROM orders WHERE date(order_date) IS NOT NULL
+        GROUP BY date(order_date)
+    ''')
+
+
+def _v5_customer_city(cursor: sqlite3.Cursor):
+    """Город клиента, выделенный из адреса, для географического анализа"""
+    cursor.execute('ALTER TABLE customers ADD COLUMN city TEXT')
+    cursor.execute(f'UPDATE customers SET city = {CITY_SQL}')
+    # Группировка по городу читает только индекс
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_customers_city
+        ON customers (city)
+    ''')
+
+
+def _rebuild_table(cursor: sqlite3.Cursor, table_name: str, create_sql: str, select_sql: str):
+    """
+    Пересоздание таблицы по create_sql ({name} - имя таблицы) с копированием
+    строк запросом select_sql. Индексы и счетчик AUTOINCREMENT сохраняются.
+    """
+    cursor.execute('''
+        SELECT sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+    ''', (table_name,))
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table_name,))
+    sequence = cursor.fetchone()
+
+    cursor.execute(create_sql.format(name=f'{table_name}_new'))
+    cursor.execute(f'INSERT INTO {table_name}_new {select_sql}')
+    cursor.execute(f'DROP TABLE {table_name}')
+    cursor.execute(f'ALTER TABLE {table_name}_new RENAME TO {table_name}')
+    if sequence:
+        # ID строк, удаленных в конце таблицы, не выдаются повторно
+        cursor.execute('DELETE FROM sqlite_sequence WHERE name = ?', (table_name,))
+        cursor.execute(f'''
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT ?, MAX(?, COALESCE((SELECT MAX(id) FROM {table_name}), 0))
+        ''', (table_name, sequence[0]))
+    for index_sql in indexes:
+        cursor.execute(index_sql)
+
+
+def _legacy_cents(value):
+    """
+    Сумма старой базы в копейках (функция SQL для миграции 6).
+
+    Округление то же, что в моделях (to_cents); нечисловой текст дает 0,
+    как раньше давала арифметика SQLite.
+    """
+    try:
+        return to_cents(value)
+    except ValueError:
+        return 0
+
+
+def _v6_money_cents(cursor: sqlite3.Cursor):
+    """
+    Денежные колонки в целых копейках: price_cents, total_cents,
+    unit_price_cents и копеечные колонки агрегатных таблиц.
+
+    Колонки сначала переименовываются (индексы переименовываются вместе
+    с ними), затем таблицы пересоздаются с типом INTEGER и значениями,
+    округленными до копейки так же, как в моделях. Определения таблиц -
+    схема версии 6, они не меняются вместе с SCHEMA_TABLES. Требует
+    foreign_keys = OFF (по умолчанию).
+    """
+    # Таблица -> (колонка в рублях, колонка в копейках, определение таблицы)
+    tables = {
+        'products': ('price', 'price_cents', '''
+            CREATE TABLE {name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT,
+                price_cents INTEGER NOT NULL,
+                category TEXT,
+                stock INTEGER DEFAULT 0
+            )
+        '''),
+        'orders': ('total_amount', 'total_cents', '''
+            CREATE TABLE {name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_id INTEGER,
+                order_date TEXT,
+                status TEXT,
+                total_cents INTEGER,
+                FOREIGN KEY (customer_id) REFERENCES customers (id)
+            )
+        '''),
+        'order_items': ('unit_price', 'unit_price_cents', '''
+            CREATE TABLE {name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER,
+                product_id INTEGER,
+                quantity INTEGER,
+                unit_price_cents INTEGER,
+                FOREIGN KEY (order_id) REFERENCES orders (id),
+                FOREIGN KEY (product_id) REFERENCES products (id)
+            )
+        '''),
+    }
+    cursor.connection.create_function('legacy_cents', 1, _legacy_cents)
+    for table_name, (legacy, cents, create_sql) in tables.items():
+        cursor.execute(f'ALTER TABLE {table_name} RENAME COLUMN {legacy} TO {cents}')
+        columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table_name})').fetchall()]
+        select = ', '.join(f'legacy_cents({column})' if column == cents else column for column in columns)
+        _rebuild_table(cursor, table_name, create_sql, f'SELECT {select} FROM {table_name}')
+
+    # Агрегаты пересчитываются по уже переведенным в копейки суммам
+    for name in ('customer_stats', 'product_stats', 'sales_daily'):
+        cursor.execute(f'DROP TABLE IF EXISTS {name}')
+    cursor.execute('''
+        CREATE TABLE customer_stats (
+            customer_id INTEGER PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_spent_cents INTEGER NOT NULL DEFAULT 0,
+            last_order_date TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE product_stats (
+            product_id INTEGER PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            total_revenue_cents INTEGER NOT NULL DEFAULT 0,
+            last_order_date TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE sales_daily (
+            day TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_cents INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_customer_stats_top
+        ON customer_stats (order_count, total_spent_cents)
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_product_stats_revenue
+        ON product_stats (total_revenue_cents)
+    ''')
+
+    cursor.execute('''
+        INSERT INTO customer_stats (customer_id, order_count, total_spent_cents, last_order_date)
+        SELECT customer_id, COUNT(*), COALESCE(SUM(total_cents), 0), MAX(order_date)
+        FROM orders WHERE customer_id IS NOT NULL
+        GROUP BY customer_id
+    ''')
+    cursor.execute('''
+        INSERT INTO product_stats (product_id, order_count, total_quantity, total_revenue_cents,
+                                   last_order_date)
+        SELECT oi.product_id, COUNT(DISTINCT oi.order_id), COALESCE(SUM(oi.quantity), 0),
+               COALESCE(SUM(oi.quantity * oi.unit_price_cents), 0), MAX(o.order_date)
+        FROM order_items oi
+        LEFT JOIN orders o ON oi.order_id = o.id
+        WHERE oi.product_id IS NOT NULL
+        GROUP BY oi.product_id
+    ''')
+    cursor.execute('''
+        INSERT INTO sales_daily (day, order_count, total_cents)
+        SELECT date(order_date), COUNT(*), COALESCE(SUM(total_cents), 0)
+        FROM orders WHERE date(order_date) IS NOT NULL
+        GROUP BY date(order_date)
+    ''')
+
+
+def _v7_orders_date_key(cursor: sqlite3.Cursor):
+    """
+    Ключ keyset-пагинации заказов (COALESCE(order_date, ''), id): заказы
+    без даты тоже попадают на страницы (в конец списка от новых к старым).
+    """
+    cursor.execute('DROP INDEX IF EXISTS idx_orders_date_id')
+    cursor.execute('''
+        CREATE INDEX idx_orders_date_key
+        ON orders (COALESCE(order_date, ''))
+    ''')
+
+
+# Список миграций (версия, функция); версии строго возрастают
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Cursor], None]]] = [
+    (1, _v1_order_indexes),
+    (2, _v2_keyset_indexes),
+    (3, _v3_rollup_tables),
+    (4, _v4_sales_daily),
+    (5, _v5_customer_city),
+    (6, _v6_money_cents),
+    (7, _v7_orders_date_key),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы базы данных"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Применение всех недостающих миграций, каждая в отдельной транзакции.
+
+    В пустой базе схема последней версии создается сразу (create_schema).
+    Каждый шаг выполняется под BEGIN IMMEDIATE, а версия перечитывается уже
+    под блокировкой записи: если базу одновременно открывают несколько
+    процессов, каждый шаг применяет только один из них.
+    """
+    current = get_schema_version(conn)
+    while current < SCHEMA_VERSION:
+        if conn.in_transaction:
+            conn.commit()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            current = get_schema_version(conn)
+            if current == 0 and not cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'orders'").fetchone():
+                create_schema(cursor)
+                current = SCHEMA_VERSION
+            else:
+                pending = [(version, step) for version, step in MIGRATIONS if version > current]
+                if pending:
+                    current, step = pending[0]
+                    step(cursor)
+            cursor.execute(f'PRAGMA user_version = {current}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return current
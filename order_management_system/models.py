@@ -1,11 +1,19 @@
-import re
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from abc import ABC, abstractmethod
+from money import from_cents, to_cents
+from validation import person_error, product_error
 
 
 class BaseModel(ABC):
-    """Абстрактный базовый класс для всех моделей"""
+    """
+    Абстрактный базовый класс для всех моделей.
+
+    Модели объявляют __slots__: у экземпляров нет __dict__, поэтому
+    миллионы загруженных строк занимают заметно меньше памяти.
+    """
+
+    __slots__ = ('id',)
 
     def __init__(self, id: int = None):
         self.id = id
@@ -22,6 +30,8 @@ class BaseModel(ABC):
 class Person(BaseModel):
     """Базовый класс для персон с контактными данными"""
 
+    __slots__ = ('name', 'email', 'phone', 'address')
+
     def __init__(self, id: int = None, name: str = "", email: str = "",
                  phone: str = "", address: str = ""):
         super().__init__(id)
@@ -31,26 +41,15 @@ class Person(BaseModel):
         self.address = address
 
     def validate(self) -> bool:
-        """Проверка валидности данных с использованием регулярных выражений"""
-        if not self.name.strip():
-            return False
-
-        # Проверка email с регулярным выражением
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if self.email and not re.match(email_pattern, self.email):
-            return False
-
-        # Проверка телефона с регулярным выражением
-        phone_pattern = r'^\+?[1-9]\d{1,14}$'
-        if self.phone and not re.match(phone_pattern, self.phone.replace(" ", "")):
-            return False
-
-        return True
+        """Проверка валидности данных предкомпилированными регулярными выражениями"""
+        return person_error(self.name, self.email, self.phone) is None
 
 
 class Customer(Person):
     """Класс клиента"""
 
+    __slots__ = ('registration_date',)
+
     def __init__(self, id: int = None, name: str = "", email: str = "",
                  phone: str = "", address: str = "", registration_date: str = None):
         super().__init__(id, name, email, phone, address)
@@ -71,17 +70,34 @@ class Customer(Person):
 
 
 class Product(BaseModel):
-    """Класс товара"""
+    """
+    Класс товара.
+
+    Цена хранится в целых копейках (price_cents); price - та же цена в
+    рублях. price_cents, если задан, имеет приоритет над price; цена
+    None означает, что она не указана.
+    """
+
+    __slots__ = ('name', 'description', 'price_cents', 'category', 'stock')
 
     def __init__(self, id: int = None, name: str = "", description: str = "",
-                 price: float = 0.0, category: str = "", stock: int = 0):
+                 price: float = 0.0, category: str = "", stock: int = 0,
+                 price_cents: Optional[int] = None):
         super().__init__(id)
         self.name = name
         self.description = description
-        self.price = price
+        self.price_cents = price_cents if price_cents is not None else to_cents(price)
         self.category = category
         self.stock = stock
 
+    @property
+    def price(self) -> float:
+        return from_cents(self.price_cents)
+
+    @price.setter
+    def price(self, value: float):
+        self.price_cents = to_cents(value)
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             'id': self.id,
@@ -93,21 +109,29 @@ class Product(BaseModel):
         }
 
     def validate(self) -> bool:
-        if not self.name.strip() or self.price < 0 or self.stock < 0:
-            return False
-        return True
+        return product_error(self.name, self.price, self.stock) is None
 
     def __str__(self):
         return f"Product({self.id}: {self.name}, ${self.price})"
 
 
 class OrderItem:
-    """Класс элемента заказа"""
+    """
+    Класс элемента заказа (стоимость - целое число копеек, total_cents).
+
+    Товар без цены (price_cents = None) считается по нулевой цене.
+    """
+
+    __slots__ = ('product', 'quantity', 'total_cents')
 
     def __init__(self, product: Product, quantity: int = 1):
         self.product = product
         self.quantity = quantity
-        self.total_price = product.price * quantity
+        self.total_cents = (product.price_cents or 0) * quantity
+
+    @property
+    def total_price(self) -> float:
+        return from_cents(self.total_cents)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -120,7 +144,14 @@ class OrderItem:
 
 
 class Order(BaseModel):
-    """Класс заказа"""
+    """
+    Класс заказа (итог складывается точно в целых копейках, total_cents).
+
+    У заказа, загруженного из базы без итога (NULL), total_cents и
+    total_amount равны None.
+    """
+
+    __slots__ = ('customer', 'order_date', 'status', 'items', 'total_cents')
 
     def __init__(self, id: int = None, customer: Customer = None,
                  order_date: str = None, status: str = "pending"):
@@ -129,13 +160,21 @@ class Order(BaseModel):
         self.order_date = order_date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.status = status
         self.items: List[OrderItem] = []
-        self.total_amount = 0.0
+        self.total_cents = 0
+
+    @property
+    def total_amount(self) -> float:
+        return from_cents(self.total_cents)
+
+    @total_amount.setter
+    def total_amount(self, value: float):
+        self.total_cents = to_cents(value)
 
     def add_item(self, product: Product, quantity: int = 1):
         """Добавление товара в заказ"""
         item = OrderItem(product, quantity)
         self.items.append(item)
-        self.total_amount += item.total_price
+        self.total_cents = (self.total_cents or 0) + item.total_cents
 
     def to_dict(self) -> Dict[str, Any]:
         return {
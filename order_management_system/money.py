@@ -0,0 +1,80 @@
+"""
+Денежные суммы в целых копейках (минимальных единицах валюты)
+Цены и итоги хранятся и складываются как целые числа, поэтому суммы
+не накапливают погрешность float; в рубли они переводятся только при показе
+"""
+
+import sqlite3
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Optional
+
+CENTS_PER_UNIT = 100
+
+# Денежная колонка таблицы: (колонка в рублях в старых базах, колонка в копейках)
+MONEY_COLUMNS = {
+    'products': ('price', 'price_cents'),
+    'orders': ('total_amount', 'total_cents'),
+    'order_items': ('unit_price', 'unit_price_cents'),
+}
+
+
+def to_cents(value: Any) -> Optional[int]:
+    """
+    Сумма в рублях (число или строка) в целых копейках.
+
+    Значение переводится через Decimal по десятичной записи, поэтому
+    9.99 дает ровно 999; половина копейки округляется от нуля.
+    None (сумма не указана, NULL в базе) возвращается как есть.
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value * CENTS_PER_UNIT
+    try:
+        amount = Decimal(str(value).strip()) * CENTS_PER_UNIT
+        return int(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid amount: {value!r}") from None
+
+
+def from_cents(cents: Optional[int]) -> Optional[float]:
+    """Копейки в рублях (ближайшее float к точной сумме); None - как есть"""
+    if cents is None:
+        return None
+    return cents / CENTS_PER_UNIT
+
+
+def cents_sql(expression: str) -> str:
+    """
+    SQL-выражение в рублях, переведенное в целые копейки.
+
+    Округляется float-арифметикой SQLite, поэтому половина копейки может
+    округлиться иначе, чем в to_cents (1.005 дает 100, а не 101). Годится
+    только для чтения сумм старых баз; записываемые суммы переводятся to_cents.
+    """
+    return f'CAST(ROUND({expression} * {CENTS_PER_UNIT}) AS INTEGER)'
+
+
+def units_sql(expression: str) -> str:
+    """SQL-выражение в копейках, переведенное в рубли (для показа и выгрузки)"""
+    return f'{expression} / {CENTS_PER_UNIT}.0'
+
+
+def uses_cents(conn: sqlite3.Connection) -> bool:
+    """Хранятся ли суммы в копейках (база после миграции 6)"""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(orders)')]
+    return MONEY_COLUMNS['orders'][1] in columns
+
+
+def money_column(conn: sqlite3.Connection, table_name: str, alias: str = '') -> str:
+    """
+    SQL-выражение денежной колонки table_name в копейках.
+
+    В старых базах колонка в рублях переводится в копейки до сложения,
+    так что суммы по ней тоже точные.
+    """
+    prefix = f'{alias}.' if alias else ''
+    legacy, cents = MONEY_COLUMNS[table_name]
+    if uses_cents(conn):
+        return prefix + cents
+    return cents_sql(prefix + legacy)
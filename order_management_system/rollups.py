@@ -0,0 +1,186 @@
+"""
+Агрегатные таблицы (rollup) по клиентам, товарам и дням продаж
+Поддерживаются инкрементально при добавлении заказов и импорте
+"""
+
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from money import uses_cents
+
+# Таблицы агрегатов и таблицы-источники, изменения которых их затрагивают
+ROLLUP_SOURCES = {
+    'customer_stats': 'orders',
+    'product_stats': 'order_items',
+    'sales_daily': 'orders',
+}
+
+# Условия отбора строк источника по ID заказа и по диапазону ID строк
+_ORDER_FILTERS = {'orders': 'id = ?', 'order_items': 'oi.order_id = ?'}
+_RANGE_FILTERS = {'orders': 'id > ?', 'order_items': 'oi.id > ?'}
+
+# Пересчет агрегатов по подмножеству заказов ({where}) с добавлением к уже накопленным.
+# Суммы в целых копейках; COALESCE дает 0, а не NULL, если все суммы пустые
+_CUSTOMER_UPSERT = '''
+    INSERT INTO customer_stats (customer_id, order_count, total_spent_cents, last_order_date)
+    SELECT customer_id, COUNT(*), COALESCE(SUM(total_cents), 0), MAX(order_date)
+    FROM orders
+    WHERE customer_id IS NOT NULL AND {where}
+    GROUP BY customer_id
+    ON CONFLICT (customer_id) DO UPDATE SET
+        order_count = order_count + excluded.order_count,
+        total_spent_cents = total_spent_cents + excluded.total_spent_cents,
+        last_order_date = CASE
+            WHEN last_order_date IS NULL OR excluded.last_order_date > last_order_date
+            THEN excluded.last_order_date ELSE last_order_date END
+'''
+
+_PRODUCT_UPSERT = '''
+    INSERT INTO product_stats (product_id, order_count, total_quantity, total_revenue_cents, last_order_date)
+    SELECT oi.product_id, COUNT(DISTINCT oi.order_id), COALESCE(SUM(oi.quantity), 0),
+           COALESCE(SUM(oi.quantity * oi.unit_price_cents), 0), MAX(o.order_date)
+    FROM order_items oi
+    LEFT JOIN orders o ON oi.order_id = o.id
+    WHERE oi.product_id IS NOT NULL AND {where}
+    GROUP BY oi.product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        order_count = order_count + excluded.order_count,
+        total_quantity = total_quantity + excluded.total_quantity,
+        total_revenue_cents = total_revenue_cents + excluded.total_revenue_cents,
+        last_order_date = CASE
+            WHEN last_order_date IS NULL OR excluded.last_order_date > last_order_date
+            THEN excluded.last_order_date ELSE last_order_date END
+'''
+
+# Затрагиваются только дни, в которые попали новые заказы
+_SALES_DAILY_UPSERT = '''
+    INSERT INTO sales_daily (day, order_count, total_cents)
+    SELECT date(order_date), COUNT(*), COALESCE(SUM(total_cents), 0)
+    FROM orders
+    WHERE date(order_date) IS NOT NULL AND {where}
+    GROUP BY date(order_date)
+    ON CONFLICT (day) DO UPDATE SET
+        order_count = order_count + excluded.order_count,
+        total_cents = total_cents + excluded.total_cents
+'''
+
+# Дата последнего заказа товара берется из orders: если элементы импортированы
+# раньше своих заказов, она пересчитывается для товаров заказов из {where}
+_PRODUCT_DATES_UPDATE = '''
+    UPDATE product_stats SET last_order_date = (
+        SELECT MAX(o.order_date) FROM order_items oi
+        JOIN orders o ON oi.order_id = o.id
+        WHERE oi.product_id = product_stats.product_id)
+    WHERE product_id IN (
+        SELECT oi.product_id FROM order_items oi
+        JOIN orders o ON oi.order_id = o.id
+        WHERE {where})
+'''
+
+_UPSERTS = {
+    'customer_stats': _CUSTOMER_UPSERT,
+    'product_stats': _PRODUCT_UPSERT,
+    'sales_daily': _SALES_DAILY_UPSERT,
+}
+
+# Агрегаты, посчитанные заново по исходным таблицам (для проверки согласованности)
+_CUSTOMER_EXPECTED = '''
+    SELECT customer_id, COUNT(*) AS order_count, COALESCE(SUM(total_cents), 0) AS total_spent_cents,
+           MAX(order_date) AS last_order_date
+    FROM orders WHERE customer_id IS NOT NULL
+    GROUP BY customer_id
+'''
+
+_PRODUCT_EXPECTED = '''
+    SELECT oi.product_id, COUNT(DISTINCT oi.order_id) AS order_count,
+           COALESCE(SUM(oi.quantity), 0) AS total_quantity,
+           COALESCE(SUM(oi.quantity * oi.unit_price_cents), 0) AS total_revenue_cents,
+           MAX(o.order_date) AS last_order_date
+    FROM order_items oi
+    LEFT JOIN orders o ON oi.order_id = o.id
+    WHERE oi.product_id IS NOT NULL
+    GROUP BY oi.product_id
+'''
+
+_SALES_DAILY_EXPECTED = '''
+    SELECT date(order_date) AS day, COUNT(*) AS order_count, COALESCE(SUM(total_cents), 0) AS total_cents
+    FROM orders WHERE date(order_date) IS NOT NULL
+    GROUP BY date(order_date)
+'''
+
+# Проверяемые таблицы: (запрос, ключ, колонки); суммы в копейках сравниваются точно
+_CHECKS = {
+    'customer_stats': (_CUSTOMER_EXPECTED, 'customer_id',
+                       ['order_count', 'total_spent_cents', 'last_order_date']),
+    'product_stats': (_PRODUCT_EXPECTED, 'product_id',
+                      ['order_count', 'total_quantity', 'total_revenue_cents', 'last_order_date']),
+    'sales_daily': (_SALES_DAILY_EXPECTED, 'day', ['order_count', 'total_cents']),
+}
+
+
+def has_rollups(conn: sqlite3.Connection, *names: str) -> bool:
+    """
+    Есть ли в базе агрегатные таблицы (все или перечисленные) с суммами в
+    копейках; в базах без миграций их нет, агрегаты старых баз в рублях
+    не используются.
+    """
+    names = names or tuple(ROLLUP_SOURCES)
+    count = conn.execute(f'''
+        SELECT COUNT(*) FROM sqlite_master
+        WHERE type = 'table' AND name IN ({', '.join('?' for _ in names)})
+    ''', names).fetchone()[0]
+    return count == len(names) and uses_cents(conn)
+
+
+def apply_order(cursor: sqlite3.Cursor, order_id: int):
+    """Добавление только что вставленного заказа и его элементов к агрегатам"""
+    for name, source in ROLLUP_SOURCES.items():
+        cursor.execute(_UPSERTS[name].format(where=_ORDER_FILTERS[source]), (order_id,))
+
+
+def apply_new_rows(cursor: sqlite3.Cursor, table_name: str, after_id: int):
+    """
+    Добавление к агрегатам строк table_name с ID больше after_id.
+
+    Используется после пакетного импорта, когда новые строки получили
+    ID по возрастанию. Для новых заказов также обновляется дата
+    последнего заказа их товаров (элементы могли прийти раньше заказов).
+    Если элементы одного заказа пришли в разных импортах, число заказов
+    товара может быть завышено - такое расхождение находит check_rollups
+    и исправляет rebuild_rollups.
+    """
+    for name, source in ROLLUP_SOURCES.items():
+        if source == table_name:
+            cursor.execute(_UPSERTS[name].format(where=_RANGE_FILTERS[source]), (after_id,))
+    if table_name == 'orders':
+        refresh_product_dates(cursor, after_id)
+
+
+def refresh_product_dates(cursor: sqlite3.Cursor, after_order_id: int = 0):
+    """Пересчет даты последнего заказа товаров из заказов с ID больше after_order_id"""
+    cursor.execute(_PRODUCT_DATES_UPDATE.format(where='o.id > ?'), (after_order_id,))
+
+
+def rebuild_rollups(cursor: sqlite3.Cursor, table_names: Optional[List[str]] = None):
+    """Полный пересчет агрегатов (всех или перечисленных таблиц)"""
+    for name in table_names or list(ROLLUP_SOURCES):
+        cursor.execute(f'DELETE FROM {name}')
+        cursor.execute(_UPSERTS[name].format(where='1'))
+
+
+def check_rollups(cursor: sqlite3.Cursor) -> Dict[str, List[Any]]:
+    """Ключи записей, агрегаты которых расходятся с исходными таблицами"""
+    mismatches = {}
+    for name, (expected, key, columns) in _CHECKS.items():
+        differs = ' OR '.join(f's.{col} IS NOT e.{col}' for col in columns)
+        cursor.execute(f'''
+            SELECT e.{key} FROM ({expected}) e
+            LEFT JOIN {name} s ON s.{key} = e.{key}
+            WHERE s.{key} IS NULL OR {differs}
+            UNION
+            SELECT s.{key} FROM {name} s
+            WHERE s.{key} NOT IN (SELECT {key} FROM ({expected}))
+            ORDER BY 1
+        ''')
+        mismatches[name] = [row[0] for row in cursor.fetchall()]
+    return mismatches
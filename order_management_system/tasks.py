@@ -0,0 +1,189 @@
+"""
+Выполнение долгих операций в фоновых потоках
+Результаты передаются в поток интерфейса Tk через root.after
+"""
+
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Интервал опроса очереди результатов, мс
+POLL_INTERVAL = 50
+
+
+class TaskCancelled(Exception):
+    """Задача отменена пользователем"""
+
+
+class TaskContext:
+    """Контекст фоновой задачи: отмена и отчет о прогрессе"""
+
+    def __init__(self, key: str, runner: 'TaskRunner'):
+        self.key = key
+        self._runner = runner
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check_cancelled(self):
+        """Прерывание задачи, если пользователь ее отменил"""
+        if self._cancelled.is_set():
+            raise TaskCancelled(self.key)
+
+    def progress(self, fraction: Optional[float] = None, message: str = ""):
+        """Отчет о прогрессе (fraction от 0 до 1 или None, если объем неизвестен)"""
+        self.check_cancelled()
+        self._runner._post(self.key, 'progress', (fraction, message))
+
+
+class TaskRunner:
+    """
+    Пул фоновых потоков для операций с базой данных и аналитики.
+
+    Функция задачи выполняется в рабочем потоке и получает TaskContext
+    первым аргументом; обработчики on_success, on_error, on_progress и
+    on_cancel вызываются в потоке интерфейса. Пока задача с ключом выполняется,
+    повторная задача с тем же ключом не запускается.
+    """
+
+    def __init__(self, root, max_workers: int = 4, poll_interval: int = POLL_INTERVAL,
+                 on_state_change: Optional[Callable[[Dict[str, TaskContext]], None]] = None):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_state_change = on_state_change
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task')
+        self._queue: queue.Queue = queue.Queue()
+        self._active: Dict[str, TaskContext] = {}
+        self._handlers: Dict[str, Dict[str, Optional[Callable]]] = {}
+        self._futures: Dict[str, Future] = {}
+        self._polling = False
+        self._closed = False
+
+    @property
+    def active(self) -> Dict[str, TaskContext]:
+        return dict(self._active)
+
+    def is_running(self, key: str) -> bool:
+        return key in self._active
+
+    def submit(self, key: str, func: Callable[..., Any], *args,
+               on_success: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               on_progress: Optional[Callable[[Optional[float], str], None]] = None,
+               on_cancel: Optional[Callable[[], None]] = None) -> bool:
+        """Запуск задачи; False, если задача с таким ключом уже выполняется"""
+        if self._closed or key in self._active:
+            return False
+
+        task = TaskContext(key, self)
+        self._active[key] = task
+        self._handlers[key] = {'success': on_success, 'error': on_error,
+                               'progress': on_progress, 'cancel': on_cancel}
+        self._futures[key] = self._executor.submit(self._run, task, func, args)
+        self._notify_state()
+        self._start_polling()
+        return True
+
+    def cancel(self, key: Optional[str] = None):
+        """Отмена задачи по ключу или всех задач"""
+        if key is None:
+            tasks = list(self._active.values())
+        else:
+            tasks = [self._active[key]] if key in self._active else []
+        for task in tasks:
+            task.cancel()
+
+    def shutdown(self, on_done: Optional[Callable[[], None]] = None):
+        """
+        Отмена всех задач и остановка пула без блокировки потока интерфейса.
+
+        Задачи из очереди пула отменяются, не начав работу; выполняющиеся
+        получают запрос отмены. on_done вызывается в потоке интерфейса, когда
+        все рабочие потоки завершились: после этого они не используют
+        соединения с базой, и их можно закрывать.
+        """
+        self._closed = True
+        self.cancel()
+        for future in self._futures.values():
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        if on_done is not None:
+            self._call_when_idle(on_done)
+
+    def _call_when_idle(self, callback: Callable[[], None]):
+        """Вызов callback в потоке интерфейса после завершения всех задач"""
+        if all(future.done() for future in self._futures.values()):
+            callback()
+        else:
+            self.root.after(self.poll_interval, lambda: self._call_when_idle(callback))
+
+    def _run(self, task: TaskContext, func: Callable[..., Any], args: tuple):
+        """
+        Выполнение задачи в рабочем потоке.
+
+        Отмена учитывается только до запуска и во время работы func: если
+        func вернула результат, работа уже выполнена (например, заказ
+        записан), и результат передается в on_success даже после отмены.
+        """
+        try:
+            task.check_cancelled()
+            result = func(task, *args)
+        except BaseException as e:
+            self._post(task.key, 'error', e)
+        else:
+            self._post(task.key, 'success', result)
+
+    def _post(self, key: str, kind: str, payload: Any):
+        self._queue.put((key, kind, payload))
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """Обработка результатов в потоке интерфейса"""
+        try:
+            while True:
+                try:
+                    key, kind, payload = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._dispatch(key, kind, payload)
+        finally:
+            # Ошибка в обработчике не должна останавливать опрос очереди
+            if self._active and not self._closed:
+                self.root.after(self.poll_interval, self._poll)
+            else:
+                self._polling = False
+
+    def _dispatch(self, key: str, kind: str, payload: Any):
+        """Вызов обработчика результата задачи"""
+        handlers = self._handlers.get(key, {})
+        if kind == 'progress':
+            if handlers.get('progress') and key in self._active:
+                handlers['progress'](*payload)
+            return
+
+        self._active.pop(key, None)
+        self._handlers.pop(key, None)
+        self._futures.pop(key, None)
+        self._notify_state()
+        if kind == 'success':
+            if handlers.get('success'):
+                handlers['success'](payload)
+        elif isinstance(payload, TaskCancelled):
+            if handlers.get('cancel'):
+                handlers['cancel']()
+        elif handlers.get('error'):
+            handlers['error'](payload)
+
+    def _notify_state(self):
+        if self.on_state_change:
+            self.on_state_change(self.active)
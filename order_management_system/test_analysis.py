@@ -2,7 +2,10 @@ import unittest
 import pandas as pd
 import sqlite3
 import os
-from analysis import DataAnalyzer, sort_orders_by_date, sort_orders_by_amount, analyze_nested_data
+import shutil
+import tempfile
+from analysis import (DataAnalyzer, NETWORK_TOP_K, sort_orders_by_date, sort_orders_by_amount,
+                      analyze_nested_data)
 
 
 class TestAnalysis(unittest.TestCase):
@@ -100,6 +103,7 @@ class TestAnalysis(unittest.TestCase):
 
     def tearDown(self):
         """Очистка тестовой базы данных"""
+        self.analyzer.close()
         if os.path.exists(self.test_db):
             os.remove(self.test_db)
 
@@ -110,6 +114,26 @@ class TestAnalysis(unittest.TestCase):
         self.assertEqual(len(df), 3)
         self.assertIn('customer_name', df.columns)
 
+    def test_typed_loaders(self):
+        """Тест загрузки выбранных колонок с типами, диапазоном дат и по частям"""
+        df = self.analyzer.get_orders_dataframe(['order_date', 'status', 'total_amount'],
+                                                start='2024-01-02')
+        self.assertEqual(list(df.columns), ['order_date', 'status', 'total_amount'])
+        self.assertEqual(len(df), 2)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['order_date']))
+        self.assertIsInstance(df['status'].dtype, pd.CategoricalDtype)
+
+        chunks = list(self.analyzer.get_orders_dataframe(['id'], end='2024-01-02', chunksize=1))
+        self.assertEqual([len(chunk) for chunk in chunks], [1, 1])
+
+        customers = self.analyzer.get_customers_dataframe(['name', 'city'])
+        self.assertIsInstance(customers['city'].dtype, pd.CategoricalDtype)
+        products = self.analyzer.get_products_dataframe(['name', 'category'])
+        self.assertEqual(sorted(products['category'].cat.categories), ['Категория 1', 'Категория 2'])
+
+        with self.assertRaises(ValueError):
+            self.analyzer.get_orders_dataframe(['password'])
+
     def test_get_top_customers(self):
         """Тест получения топ клиентов"""
         top_customers = self.analyzer.get_top_customers()
@@ -122,6 +146,15 @@ class TestAnalysis(unittest.TestCase):
         sales_trend = self.analyzer.get_sales_trend('D')
         self.assertIsInstance(sales_trend, pd.Series)
 
+    def test_sales_trend_periods(self):
+        """Тест динамики продаж по месяцам и за диапазон дат"""
+        monthly = self.analyzer.get_sales_trend('M')
+        self.assertEqual(list(monthly), [1400.0])
+        self.assertEqual(monthly.index[0], pd.Timestamp('2024-01-31'))
+
+        daily = self.analyzer.get_sales_trend('D', start='2024-01-02', end='2024-01-03')
+        self.assertEqual(list(daily), [300.0, 600.0])
+
     def test_get_top_products(self):
         """Тест получения топ товаров"""
         top_products = self.analyzer.get_top_products()
@@ -145,6 +178,20 @@ class TestAnalysis(unittest.TestCase):
         sorted_by_amount = sort_orders_by_amount(orders)
         self.assertEqual(sorted_by_amount[0].total_amount, 300)
 
+    def test_order_batch(self):
+        """Тест колоночного пакета позиций и сортировки через NumPy"""
+        batch = self.analyzer.get_order_batch()
+        self.assertEqual(len(batch), 5)
+        self.assertIs(self.analyzer.get_order_batch(), batch)
+
+        order_ids, totals = batch.totals_by('order_id')
+        self.assertEqual(dict(zip(order_ids.tolist(), totals.tolist())), {1: 40000, 2: 30000, 3: 70000})
+        self.assertEqual(sort_orders_by_date(batch).order_id.tolist(), [3, 3, 2, 1, 1])
+        self.assertEqual(sort_orders_by_amount(batch).order_id.tolist(), [3, 3, 1, 1, 2])
+
+        # Диапазон дат включает последний день целиком
+        self.assertEqual(self.analyzer.get_order_batch(start='2024-01-02', end='2024-01-02').order_id.tolist(), [2])
+
     def test_analyze_nested_data(self):
         """Тест рекурсивного анализа данных"""
         test_data = {
@@ -160,6 +207,109 @@ class TestAnalysis(unittest.TestCase):
         self.assertEqual(result['total_items'], 8)  # 1 + 3 + 1 + 2 + 1
         self.assertEqual(result['max_depth'], 3)
 
+    def test_new_database(self):
+        """Тест: анализатор для еще не созданной базы работает с пустой схемой"""
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir, ignore_errors=True)
+        analyzer = DataAnalyzer(os.path.join(test_dir, "data", "new.db"))
+        try:
+            self.assertIsInstance(analyzer.data_version(), int)
+            self.assertTrue(analyzer.get_top_customers().empty)
+            self.assertEqual(analyzer.create_customer_network().number_of_nodes(), 0)
+        finally:
+            analyzer.close()
+
+    def test_customer_network(self):
+        """Тест графа связей клиентов по общим товарам"""
+        G = self.analyzer.create_customer_network()
+        self.assertEqual(sorted(G.nodes()), [1, 2, 3])
+        self.assertEqual(G.nodes[3]['name'], 'Мария Сидорова')
+        # Клиенты 1 и 2 купили товары 1 и 2
+        self.assertEqual(list(G.edges(data='weight')), [(1, 2, 2)])
+
+        self.assertEqual(self.analyzer.create_customer_network(min_weight=3).number_of_edges(), 0)
+
+    def test_customer_network_pruning(self):
+        """Тест отсечения связей по top_k"""
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("INSERT INTO customers (id, name) VALUES (4, 'Ольга Орлова')")
+        conn.execute("INSERT INTO orders (id, customer_id, order_date, status, total_amount) "
+                     "VALUES (4, 4, '2024-01-04', 'completed', 100.0)")
+        conn.execute("INSERT INTO order_items (order_id, product_id, quantity, unit_price) "
+                     "VALUES (4, 1, 1, 100.0)")
+        conn.commit()
+        conn.close()
+
+        G = self.analyzer.create_customer_network()
+        self.assertEqual(G.number_of_edges(), 3)
+
+        # У клиента 4 остается одна связь из двух равных по весу
+        G = self.analyzer.create_customer_network(top_k=1)
+        self.assertEqual(sorted(G.edges(data='weight')), [(1, 2, 2), (1, 4, 1)])
+
+    def test_customer_network_bestseller(self):
+        """Тест: товар, купленный всеми клиентами, не делает граф по умолчанию квадратичным"""
+        customers = 500
+        conn = sqlite3.connect(self.test_db)
+        conn.executemany("INSERT INTO customers (id, name) VALUES (?, ?)",
+                         [(i, f"Клиент {i}") for i in range(10, 10 + customers)])
+        conn.executemany("INSERT INTO orders (id, customer_id, order_date, status, total_amount) "
+                         "VALUES (?, ?, '2024-02-01', 'completed', 1.0)",
+                         [(i, i) for i in range(10, 10 + customers)])
+        conn.executemany("INSERT INTO order_items (order_id, product_id, quantity, unit_price) "
+                         "VALUES (?, 1, 1, 1.0)", [(i,) for i in range(10, 10 + customers)])
+        conn.commit()
+        conn.close()
+
+        G = self.analyzer.create_customer_network()
+        self.assertLessEqual(G.number_of_edges(), NETWORK_TOP_K * G.number_of_nodes())
+        self.assertLess(G.number_of_edges(), customers * (customers - 1) // 2 // 10)
+
+        # Без отсечения связаны все пары покупателей товара
+        G = self.analyzer.create_customer_network(top_k=None, max_product_customers=None)
+        self.assertGreaterEqual(G.number_of_edges(), customers * (customers - 1) // 2)
+
+        # Бестселлер с числом покупателей выше порога не учитывается
+        G = self.analyzer.create_customer_network(max_product_customers=customers // 2)
+        self.assertEqual(G.degree(10), 0)
+
+    def test_result_cache(self):
+        """Тест кэша результатов и его сброса после записи в базу"""
+        first = self.analyzer.get_top_customers()
+        first.loc[0, 'order_count'] = 100
+        second = self.analyzer.get_top_customers()
+        self.assertEqual(second.loc[0, 'order_count'], 2)
+        self.assertEqual(self.analyzer.cache_info().hits, 1)
+
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("INSERT INTO orders (id, customer_id, order_date, status, total_amount) "
+                     "VALUES (4, 2, '2024-01-04', 'completed', 100.0)")
+        conn.execute("INSERT INTO orders (id, customer_id, order_date, status, total_amount) "
+                     "VALUES (5, 2, '2024-01-05', 'completed', 100.0)")
+        conn.commit()
+        conn.close()
+
+        top = self.analyzer.get_top_customers()
+        self.assertEqual(top.loc[0, 'name'], 'Петр Петров')
+        self.assertEqual(self.analyzer.cache_info().misses, 2)
+
+    def test_run_reports(self):
+        """Тест параллельного расчета набора отчетов"""
+        run = self.analyzer.run_reports(['top_customers', 'geography', 'regions', 'network'],
+                                        {'top_customers': {'limit': 1}})
+        self.assertEqual(run.errors, {})
+        self.assertEqual(set(run.results), set(run.timings))
+        self.assertEqual(len(run.results['top_customers']), 1)
+        self.assertEqual(run.results['regions']['count'].sum(), run.results['geography']['count'].sum())
+        self.assertGreaterEqual(run.elapsed, max(run.timings.values()))
+
+        with self.assertRaises(ValueError):
+            self.analyzer.run_reports(['unknown'])
+
+        # Соединения аналитики открыты только для чтения
+        with self.assertRaises(sqlite3.OperationalError):
+            self.analyzer._get_connection().execute("DELETE FROM orders")
+
     def test_customer_geography(self):
         """Тест географического анализа"""
         geo_data = self.analyzer.get_customer_geography()
@@ -0,0 +1,90 @@
+import unittest
+import threading
+from cache import ResultCache
+
+
+class FakeClock:
+    """Управляемые часы для проверки TTL"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        """Настройка кэша с ручными часами"""
+        self.clock = FakeClock()
+        self.cache = ResultCache(maxsize=2, ttl=10.0, clock=self.clock)
+        self.calls = []
+
+    def compute(self, value):
+        def func():
+            self.calls.append(value)
+            return value
+        return func
+
+    def test_hits_and_version(self):
+        """Тест попаданий и сброса при смене версии данных"""
+        self.assertEqual(self.cache.get('a', 1, self.compute(1)), 1)
+        self.assertEqual(self.cache.get('a', 1, self.compute(2)), 1)
+        self.assertEqual(self.cache.get('a', 2, self.compute(3)), 3)
+
+        info = self.cache.info()
+        self.assertEqual((info.hits, info.misses, info.invalidations), (1, 2, 1))
+        self.assertEqual(self.calls, [1, 3])
+
+    def test_lru_and_ttl(self):
+        """Тест вытеснения по размеру и по времени жизни"""
+        self.cache.get('a', 1, self.compute('a'))
+        self.cache.get('b', 1, self.compute('b'))
+        self.cache.get('a', 1, self.compute('a2'))
+        self.cache.get('c', 1, self.compute('c'))
+        # 'b' вытеснен как давно не использовавшийся
+        self.assertEqual(self.cache.get('b', 1, self.compute('b2')), 'b2')
+        self.assertEqual(self.cache.info().evictions, 2)
+
+        self.clock.now = 11.0
+        self.assertEqual(self.cache.get('b', 1, self.compute('b3')), 'b3')
+        self.assertEqual(self.calls, ['a', 'b', 'c', 'b2', 'b3'])
+
+    def test_single_flight(self):
+        """Тест однократного вычисления при одновременных запросах"""
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def slow():
+            started.set()
+            release.wait(5)
+            self.calls.append('slow')
+            return 42
+
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get('k', 1, slow)))
+                   for _ in range(4)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, [42] * 4)
+        self.assertEqual(self.calls, ['slow'])
+
+    def test_error_not_cached(self):
+        """Тест: ошибка вычисления не сохраняется в кэше"""
+        def failing():
+            raise ValueError("ошибка")
+
+        with self.assertRaises(ValueError):
+            self.cache.get('k', 1, failing)
+        self.assertEqual(self.cache.get('k', 1, self.compute(5)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
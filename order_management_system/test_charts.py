@@ -0,0 +1,152 @@
+import unittest
+import gc
+import os
+import shutil
+import tempfile
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from charts import CHARTS, ChartView, render_chart
+from dashboard import export_dashboards
+from layout import LayoutCache, layout_path
+from analysis import DataAnalyzer
+from db import Database
+from models import Customer, Product, Order
+
+
+class TestCharts(unittest.TestCase):
+
+    def setUp(self):
+        """Настройка двух временных баз (магазинов)"""
+        self.test_dir = tempfile.mkdtemp()
+        self.db_paths = []
+        for store in ('store_a', 'store_b'):
+            db_path = os.path.join(self.test_dir, f"{store}.db")
+            with Database(db_path) as db:
+                product = Product(name="Товар", price=10.0, stock=100)
+                product.id = db.add_product(product)
+                for i in range(3):
+                    customer = Customer(name=f"Клиент {i}", address=f"Москва, ул. {i}")
+                    customer.id = db.add_customer(customer)
+                    order = Order(customer=customer, order_date=f"2024-01-0{i + 1} 10:00:00")
+                    order.add_item(product, i + 1)
+                    db.add_order(order)
+            self.db_paths.append(db_path)
+
+    def tearDown(self):
+        """Очистка временных файлов"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_render_chart(self):
+        """Тест отрисовки всех графиков без pyplot"""
+        analyzer = DataAnalyzer(self.db_paths[0])
+        run = analyzer.run_reports(list(CHARTS))
+        analyzer.close()
+
+        for name in CHARTS:
+            fig = render_chart(name, run.results[name])
+            self.assertTrue(fig.axes, name)
+
+    def test_chart_view_update(self):
+        """Тест обновления графика на месте при тех же категориях"""
+        analyzer = DataAnalyzer(self.db_paths[0])
+        top = analyzer.get_top_customers()
+        trend = analyzer.get_sales_trend()
+        analyzer.close()
+
+        view = ChartView(Figure())
+        self.assertTrue(view.fig.get_tight_layout())
+        self.assertFalse(view.show('top_customers', top))
+        ax = view.fig.axes[0]
+        changed = top.assign(order_count=top['order_count'] * 10)
+        self.assertTrue(view.show('top_customers', changed))
+        self.assertIs(view.fig.axes[0], ax)
+        self.assertEqual(ax.containers[0][0].get_width(), changed['order_count'].iloc[0])
+        self.assertGreaterEqual(ax.get_xlim()[1], changed['order_count'].max())
+
+        # Другие клиенты или другой график - полная перерисовка
+        self.assertFalse(view.show('top_customers', top.iloc[::-1]))
+        self.assertFalse(view.show('sales_trend', trend))
+        self.assertTrue(view.show('sales_trend', trend * 2))
+        self.assertEqual(len(view.fig.axes), 1)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/statm'), "нужен /proc для измерения RSS")
+    def test_chart_view_old_matplotlib(self):
+        """Тест: без set_layout_engine (matplotlib до 3.6) поля включаются через set_tight_layout"""
+        class OldFigure:
+            tight = None
+
+            def set_tight_layout(self, tight):
+                self.tight = tight
+
+        self.assertTrue(ChartView(OldFigure()).fig.tight)
+
+    def test_chart_switch_memory(self):
+        """Тест отсутствия роста памяти при 500 переключениях графиков"""
+        analyzer = DataAnalyzer(self.db_paths[0])
+        data = {name: analyzer.run_reports([name]).results[name]
+                for name in ('top_customers', 'sales_trend', 'top_products', 'geography')}
+        analyzer.close()
+
+        view = ChartView(Figure(figsize=(4, 3), dpi=50))
+        canvas = FigureCanvasAgg(view.fig)
+
+        def rss():
+            gc.collect()
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+        names = list(data)
+        for i in range(50):
+            view.show(names[i % len(names)], data[names[i % len(names)]])
+            canvas.draw()
+        before = rss()
+        for i in range(500):
+            view.show(names[i % len(names)], data[names[i % len(names)]])
+            canvas.draw()
+
+        self.assertLess(rss() - before, 20 * 2 ** 20)
+        self.assertEqual(plt.get_fignums(), [])
+
+    def test_export_dashboards(self):
+        """Тест пакетной выгрузки графиков нескольких магазинов"""
+        out_dir = os.path.join(self.test_dir, "charts")
+        result = export_dashboards(self.db_paths, out_dir, charts=['top_customers', 'geography'],
+                                   formats=('png', 'svg'), max_workers=2)
+
+        self.assertEqual(result.errors, {})
+        self.assertEqual(sorted(result.files), ['store_a/geography', 'store_a/top_customers',
+                                                'store_b/geography', 'store_b/top_customers'])
+        png = os.path.join(out_dir, 'store_b', 'geography.png')
+        self.assertIn(png, result.files['store_b/geography'])
+        with open(png, 'rb') as f:
+            self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+        self.assertTrue(os.path.exists(os.path.join(out_dir, 'store_a', 'top_customers.svg')))
+
+        with self.assertRaises(ValueError):
+            export_dashboards(self.db_paths, out_dir, charts=['unknown'])
+
+    def test_export_network_layout_cache(self):
+        """Тест: выгрузка графа клиентов сохраняет раскладку и повторно ее не пересчитывает"""
+        out_dir = os.path.join(self.test_dir, "charts")
+        result = export_dashboards(self.db_paths[:1], out_dir, charts=['network'], max_workers=1)
+        self.assertEqual(result.errors, {})
+
+        cache_file = layout_path(self.db_paths[0])
+        self.assertTrue(os.path.exists(cache_file))
+        saved = os.stat(cache_file).st_mtime_ns
+        export_dashboards(self.db_paths[:1], out_dir, charts=['network'], max_workers=1)
+        self.assertEqual(os.stat(cache_file).st_mtime_ns, saved)
+
+        # Та же раскладка используется при показе в интерфейсе
+        analyzer = DataAnalyzer(self.db_paths[0])
+        try:
+            G = analyzer.create_customer_network()
+            self.assertEqual(analyzer.layout_cache.layout(G), LayoutCache(cache_file).layout(G))
+        finally:
+            analyzer.close()
+        self.assertEqual(os.stat(cache_file).st_mtime_ns, saved)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from analysis import DataAnalyzer
+from columnar import OrderBatch
+from db import Database
+from models import Customer, Product, Order
+
+
+class TestOrderBatch(unittest.TestCase):
+
+    def setUp(self):
+        """Заказы с клиентом, без клиента и без распознаваемой даты"""
+        self.customer = Customer(id=1, name="Иван Иванов")
+        self.products = {5: Product(id=5, name="Товар 5", price=2.5),
+                         6: Product(id=6, name="Товар 6", price=10.0)}
+
+        first = Order(id=1, customer=self.customer, order_date="2024-01-02 10:00:00")
+        first.add_item(self.products[5], 2)
+        first.add_item(self.products[6], 1)
+        second = Order(id=2, order_date="2024-01-03 11:00:00")
+        second.add_item(self.products[6], 3)
+        third = Order(id=3, customer=self.customer, order_date="неизвестно")
+        third.add_item(self.products[5], 1)
+        self.orders = [first, second, third]
+        self.batch = OrderBatch.from_orders(self.orders)
+
+    def test_columns(self):
+        """Тест колонок и защиты от изменения"""
+        self.assertEqual(len(self.batch), 4)
+        self.assertEqual(self.batch.order_id.tolist(), [1, 1, 2, 3])
+        self.assertEqual(self.batch.customer_id.tolist(), [1, 1, -1, 1])
+        self.assertTrue(np.isnat(self.batch.order_date[3]))
+        with self.assertRaises(ValueError):
+            self.batch.quantity[0] = 10
+        with self.assertRaises(AttributeError):
+            self.batch.quantity = np.zeros(4)
+        with self.assertRaises(ValueError):
+            OrderBatch(order_id=[1, 2], quantity=[1])
+
+    def test_aggregations(self):
+        """Тест итогов по заказам, клиентам, товарам и дням"""
+        order_ids, totals = self.batch.totals_by()
+        self.assertEqual(dict(zip(order_ids.tolist(), totals.tolist())), {1: 1500, 2: 3000, 3: 250})
+        customer_ids, totals = self.batch.totals_by('customer_id')
+        self.assertEqual(dict(zip(customer_ids.tolist(), totals.tolist())), {-1: 3000, 1: 1750})
+        product_ids, quantities = self.batch.totals_by('product_id', 'quantity')
+        self.assertEqual(dict(zip(product_ids.tolist(), quantities.tolist())), {5: 3, 6: 4})
+
+        days, totals = self.batch.daily_totals()
+        self.assertEqual([str(day) for day in days], ['2024-01-02', '2024-01-03'])
+        self.assertEqual(totals.tolist(), [1500, 3000])
+
+        with self.assertRaises(ValueError):
+            self.batch.totals_by('status')
+
+    def test_sort_orders(self):
+        """Тест сортировки заказов с сохранением позиций вместе"""
+        self.assertEqual(self.batch.sort_orders('date').order_id.tolist(), [2, 1, 1, 3])
+        self.assertEqual(self.batch.sort_orders('date', descending=False).order_id.tolist(), [1, 1, 2, 3])
+        self.assertEqual(self.batch.sort_orders('amount').order_id.tolist(), [2, 1, 1, 3])
+        self.assertEqual(self.batch.sort_orders('amount').product_id.tolist(), [6, 5, 6, 5])
+        self.assertEqual(len(OrderBatch().sort_orders()), 0)
+
+    def test_roundtrip(self):
+        """Тест преобразования в объекты Order и обратно"""
+        orders = self.batch.to_orders({1: self.customer}, self.products)
+        self.assertEqual([order.to_dict() for order in orders[:2]],
+                         [order.to_dict() for order in self.orders[:2]])
+        self.assertIs(orders[0].customer, self.customer)
+        self.assertIsNone(orders[2].order_date)
+
+        again = OrderBatch.from_orders(orders)
+        for name in ('order_id', 'product_id', 'quantity', 'unit_price_cents', 'customer_id'):
+            self.assertEqual(getattr(again, name).tolist(), getattr(self.batch, name).tolist())
+
+        # Без справочников создаются объекты только с ID
+        bare = self.batch.to_orders()
+        self.assertEqual(bare[0].customer.id, 1)
+        self.assertEqual(bare[0].items[1].product.price, 10.0)
+
+    def test_matches_dataframe(self):
+        """Тест: OrderBatch и get_orders_dataframe дают одинаковые даты для тех же заказов"""
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir, ignore_errors=True)
+        db_path = os.path.join(test_dir, "orders.db")
+        dates = ["2024-01-02 10:00:00", "2024-01-02", "2024-01-03 23:59:59", None, "неизвестно"]
+        with Database(db_path) as db:
+            db.bulk_insert('orders', ['customer_id', 'order_date', 'status', 'total_amount'],
+                           [[1, date, 'completed', 1.0] for date in dates])
+            db.bulk_insert('order_items', ['order_id', 'product_id', 'quantity', 'unit_price'],
+                           [[i + 1, 5, 1, 1.0] for i in range(len(dates))])
+
+        analyzer = DataAnalyzer(db_path)
+        try:
+            df = analyzer.get_orders_dataframe(['id', 'order_date']).sort_values('id')
+            batch = analyzer.get_order_batch()
+        finally:
+            analyzer.close()
+
+        self.assertEqual(df['id'].tolist(), batch.order_id.tolist())
+        frame_dates = df['order_date'].to_numpy()
+        self.assertEqual(frame_dates.dtype, batch.order_date.dtype)
+        self.assertEqual(np.isnat(frame_dates).tolist(), [False, False, False, True, True])
+        self.assertEqual(frame_dates.tolist(), batch.order_date.tolist())
+
+        # Группировка по дням совпадает
+        days, _ = batch.daily_totals()
+        by_day = df.groupby(df['order_date'].dt.floor('D'))['id'].count()
+        self.assertEqual(by_day.index.to_numpy().astype('datetime64[D]').tolist(),
+                         days.astype('datetime64[D]').tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
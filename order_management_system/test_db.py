@@ -0,0 +1,687 @@
+import unittest
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from analysis import DataAnalyzer, sort_orders_by_amount
+from db import Database, OutOfStockError
+from bulk_io import BulkImportError
+from migrations import MIGRATIONS, SCHEMA_VERSION, get_schema_version, migrate
+from models import Customer, Product, Order
+
+
+class TestDatabase(unittest.TestCase):
+
+    def setUp(self):
+        """Настройка временной базы данных"""
+        self.test_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.test_dir, "test_database.db"))
+
+        self.customer = Customer(name="Иван Иванов", email="ivan@test.com",
+                                 address="Москва, ул. Примерная, 1")
+        self.customer.id = self.db.add_customer(self.customer)
+
+        self.product = Product(name="Товар 1", description="Описание", price=100.0,
+                               category="Категория 1", stock=10)
+        self.product.id = self.db.add_product(self.product)
+
+    def tearDown(self):
+        """Очистка временной базы данных"""
+        self.db.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _create_order(self, quantity=2, order_date=None):
+        order = Order(customer=self.customer, order_date=order_date)
+        order.add_item(self.product, quantity)
+        return self.db.add_order(order)
+
+    def test_get_order(self):
+        """Тест получения заказа с клиентом и товарами"""
+        order_id = self._create_order(3)
+
+        order = self.db.get_order(order_id)
+        self.assertEqual(order.id, order_id)
+        self.assertEqual(order.customer.name, "Иван Иванов")
+        self.assertEqual(len(order.items), 1)
+        self.assertEqual(order.items[0].quantity, 3)
+        self.assertEqual(order.total_amount, 300.0)
+
+        self.assertIsNone(self.db.get_order(order_id + 100))
+
+    def test_place_order(self):
+        """Тест оформления заказа со списанием остатков"""
+        other = Product(name="Товар 2", price=5.0, stock=1)
+        other.id = self.db.add_product(other)
+        changes = []
+        self.db.subscribe(changes.append)
+
+        order = Order(customer=self.customer)
+        order.add_item(self.product, 3)
+        order.add_item(self.product, 2)
+        order.add_item(other, 1)
+        order_id = self.db.place_order(order)
+
+        self.assertEqual(self.db.get_product(self.product.id).stock, 5)
+        self.assertEqual(self.db.get_product(other.id).stock, 0)
+        self.assertEqual(len(self.db.get_order(order_id).items), 3)
+        self.assertEqual([(c.table, c.action) for c in changes], [('orders', 'insert'), ('products', 'update')])
+        self.assertEqual(sorted(row[5] for row in changes[1].rows), [0, 5])
+
+        # Нехватка любого товара отменяет весь заказ
+        order = Order(customer=self.customer)
+        order.add_item(self.product, 2)
+        order.add_item(other, 1)
+        with self.assertRaises(OutOfStockError) as context:
+            self.db.place_order(order)
+        self.assertEqual(context.exception.shortages, [(other.id, 1, 0)])
+        self.assertIn(f"product {other.id}: requested 1, available 0", str(context.exception))
+        self.assertEqual(self.db.get_product(self.product.id).stock, 5)
+        self.assertEqual(len(self.db.get_all_orders()), 1)
+        self.assertEqual(len(changes), 2)
+
+        with self.assertRaises(ValueError):
+            self.db.place_order(Order(customer=self.customer))
+
+    def test_place_order_concurrent(self):
+        """Стресс-тест: параллельные заказы из многих потоков не продают больше остатка"""
+        path = self.db.db_path
+        self.db.close()
+        databases = [Database(path, profile='performance') for _ in range(2)]
+        stock, threads, attempts = 150, 16, 20
+        product = Product(name="Дефицитный товар", price=0.1, stock=stock)
+        product.id = databases[0].add_product(product)
+        results = []
+
+        def worker(n):
+            db = databases[n % len(databases)]
+            for _ in range(attempts):
+                order = Order(customer=self.customer)
+                order.add_item(product, 1)
+                try:
+                    db.place_order(order)
+                    results.append(True)
+                except OutOfStockError:
+                    results.append(False)
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        db = databases[0]
+        conn = db._get_connection()
+        self.assertEqual(len(results), threads * attempts)
+        self.assertEqual(results.count(True), stock)
+        self.assertEqual(db.get_product(product.id).stock, 0)
+        self.assertEqual(conn.execute('SELECT SUM(quantity) FROM order_items WHERE product_id = ?',
+                                      (product.id,)).fetchone(), (stock,))
+        self.assertEqual(conn.execute('SELECT total_revenue_cents FROM product_stats WHERE product_id = ?',
+                                      (product.id,)).fetchone(), (stock * 10,))
+        self.assertFalse(any(db.check_rollups().values()))
+        for database in databases:
+            database.close()
+
+    def test_get_all_orders_bulk(self):
+        """Тест пакетной загрузки всех заказов"""
+        first_id = self._create_order(1, "2024-01-01 10:00:00")
+        second_id = self._create_order(2, "2024-01-02 10:00:00")
+
+        orders = self.db.get_all_orders()
+        self.assertEqual([o.id for o in orders], [second_id, first_id])
+        self.assertEqual([o.total_amount for o in orders], [200.0, 100.0])
+
+        # Повторяющийся клиент материализуется один раз
+        self.assertIs(orders[0].customer, orders[1].customer)
+
+    def test_get_order_batch(self):
+        """Тест заполнения колоночного пакета позиций из базы"""
+        first_id = self._create_order(2, "2024-01-01 10:00:00")
+        second_id = self._create_order(3, "2024-01-05 10:00:00")
+
+        batch = self.db.get_order_batch(batch_size=1)
+        self.assertEqual(batch.order_id.tolist(), [first_id, second_id])
+        self.assertEqual(batch.customer_id.tolist(), [self.customer.id] * 2)
+        self.assertEqual(batch.line_totals().tolist(), [20000, 30000])
+        self.assertEqual(self.db.get_order_batch(start="2024-01-02").order_id.tolist(), [second_id])
+
+        orders = batch.to_orders({self.customer.id: self.customer}, {self.product.id: self.product})
+        self.assertEqual([o.total_amount for o in orders], [o.total_amount for o in self.db.get_all_orders()][::-1])
+
+    def test_get_all_raw(self):
+        """Тест выборки строк-кортежей без создания моделей"""
+        order_id = self._create_order(2, "2024-01-01 10:00:00")
+
+        customers = self.db.get_all_customers(raw=True)
+        self.assertEqual(customers, [(self.customer.id, "Иван Иванов", "ivan@test.com", "",
+                                      "Москва, ул. Примерная, 1", self.customer.registration_date)])
+        products = self.db.get_all_products(raw=True)
+        self.assertEqual(products, [tuple(self.product.to_dict().values())])
+        orders = self.db.get_all_orders(raw=True)
+        self.assertEqual(orders, [(order_id, "Иван Иванов", "2024-01-01 10:00:00", "pending", 200.0)])
+
+    def test_connection_reuse(self):
+        """Тест повторного использования соединения в потоке"""
+        conn = self.db._get_connection()
+        self.db.get_customer(self.customer.id)
+        self.assertIs(self.db._get_connection(), conn)
+
+        # Другой поток получает собственное соединение
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.db._get_connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+
+    def test_close_and_context_manager(self):
+        """Тест закрытия соединений и контекстного менеджера"""
+        with Database(self.db.db_path) as db:
+            self.assertEqual(db.get_customer(self.customer.id).name, "Иван Иванов")
+            conn = db._get_connection()
+        self.assertEqual(db._pool._connections, [])
+
+        # После закрытия база снова доступна через новое соединение
+        self.assertIsNotNone(db.get_product(self.product.id))
+        self.assertIsNot(db._get_connection(), conn)
+        db.close()
+
+    def _query_plan(self, query, params=()):
+        conn = self.db._get_connection()
+        rows = conn.execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()
+        return ' | '.join(row[-1] for row in rows)
+
+    def test_schema_version(self):
+        """Тест применения миграций к базе данных"""
+        conn = self.db._get_connection()
+        self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+
+        # Повторная инициализация не меняет версию
+        self.db.init_db()
+        self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+
+    @staticmethod
+    def _schema(conn):
+        """Колонки таблиц и индексов базы (без текста CREATE)"""
+        names = conn.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' "
+                             "ORDER BY type, name").fetchall()
+        return [(kind, name, conn.execute(f'PRAGMA {"table" if kind == "table" else "index"}_info({name})')
+                 .fetchall()) for kind, name in names]
+
+    def test_new_database_schema(self):
+        """Тест: новая база создается сразу с суммами в копейках"""
+        conn = self.db._get_connection()
+        types = {(table, row[1]): row[2] for table in ('products', 'orders', 'order_items')
+                 for row in conn.execute(f'PRAGMA table_info({table})')}
+        self.assertNotIn('REAL', types.values())
+        self.assertEqual(types[('orders', 'total_cents')], 'INTEGER')
+        self.assertNotIn(('products', 'price'), types)
+
+    @staticmethod
+    def _legacy_database(path, version):
+        """База в старой схеме (до миграций, суммы в REAL), доведенная до версии version"""
+        conn = sqlite3.connect(path)
+        conn.executescript('''
+            CREATE TABLE customers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+                email TEXT, phone TEXT, address TEXT, registration_date TEXT);
+            CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+                description TEXT, price REAL NOT NULL, category TEXT, stock INTEGER DEFAULT 0);
+            CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, customer_id INTEGER,
+                order_date TEXT, status TEXT, total_amount REAL);
+            CREATE TABLE order_items (id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER,
+                product_id INTEGER, quantity INTEGER, unit_price REAL);
+        ''')
+        for _, step in MIGRATIONS[:version]:
+            step(conn.cursor())
+        conn.execute(f'PRAGMA user_version = {version}')
+        conn.commit()
+        return conn
+
+    def test_concurrent_migration(self):
+        """Тест: несколько процессов, открывших старую базу одновременно, применяют миграции один раз"""
+        path = os.path.join(self.test_dir, "legacy.db")
+        self._legacy_database(path, 0).close()
+        start = threading.Barrier(4)
+        results, errors = [], []
+
+        def open_database():
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            try:
+                start.wait()
+                results.append(migrate(conn))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                conn.close()
+
+        workers = [threading.Thread(target=open_database) for _ in range(4)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [SCHEMA_VERSION] * 4)
+        with Database(path) as db:
+            conn = db._get_connection()
+            self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+            self.assertEqual(self._schema(conn), self._schema(self.db._get_connection()))
+
+    def test_money_cents_migration(self):
+        """Тест перевода сумм в рублях (REAL) старой базы в целые копейки"""
+        path = os.path.join(self.test_dir, "legacy.db")
+        conn = self._legacy_database(path, 5)
+        conn.execute("INSERT INTO customers (name) VALUES ('Клиент')")
+        conn.execute("INSERT INTO products (name, price, stock) VALUES ('Товар', 0.1, 5)")
+        # Половина копейки округляется так же, как в моделях (to_cents)
+        conn.execute("INSERT INTO products (name, price) VALUES ('Полкопейки', 1.005)")
+        conn.execute("INSERT INTO orders (customer_id, order_date, status, total_amount) "
+                     "VALUES (1, '2024-01-01 10:00:00', 'pending', 0.30000000000000004)")
+        conn.execute("INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES (1, 1, 3, 0.1)")
+        conn.commit()
+        conn.close()
+
+        with Database(path) as db:
+            conn = db._get_connection()
+            self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+            self.assertEqual(conn.execute('SELECT price_cents, typeof(price_cents) FROM products')
+                             .fetchall(), [(10, 'integer'), (Product(price=1.005).price_cents, 'integer')])
+            self.assertEqual(conn.execute('SELECT total_cents FROM orders').fetchall(), [(30,)])
+            self.assertEqual(conn.execute('SELECT total_spent_cents FROM customer_stats').fetchall(), [(30,)])
+            self.assertEqual(conn.execute('SELECT total_revenue_cents FROM product_stats').fetchall(), [(30,)])
+            self.assertEqual(conn.execute('SELECT total_cents FROM sales_daily').fetchall(), [(30,)])
+            plan = ' '.join(row[3] for row in conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM order_items WHERE order_id = 1'))
+            self.assertIn('idx_order_items_order', plan)
+
+            # Мигрированная база совпадает со схемой, создаваемой для новой базы
+            self.assertEqual(self._schema(conn), self._schema(self.db._get_connection()))
+
+            order = db.get_order(1)
+            self.assertEqual(order.total_cents, 30)
+            self.assertEqual(order.total_amount, 0.3)
+            self.assertEqual(db.add_product(Product(name="Новый", price=1.0)), 3)
+
+    def test_hot_queries_use_indexes(self):
+        """Тест использования индексов горячими запросами (EXPLAIN QUERY PLAN)"""
+        plan = self._query_plan('SELECT * FROM order_items WHERE order_id = ?', (1,))
+        self.assertIn('idx_order_items_order', plan)
+
+        plan = self._query_plan('SELECT id FROM orders ORDER BY order_date DESC')
+        self.assertIn('idx_orders_date', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+        plan = self._query_plan('''
+            SELECT c.name, COUNT(o.id), SUM(o.total_cents)
+            FROM customers c
+            LEFT JOIN orders o ON c.id = o.customer_id
+            GROUP BY c.id
+        ''')
+        self.assertIn('COVERING INDEX idx_orders_customer', plan)
+
+        plan = self._query_plan('''
+            SELECT p.name, SUM(oi.quantity), SUM(oi.quantity * oi.unit_price_cents)
+            FROM order_items oi
+            JOIN products p ON oi.product_id = p.id
+            GROUP BY p.id
+        ''')
+        self.assertIn('COVERING INDEX idx_order_items_product', plan)
+
+    def test_performance_profile(self):
+        """Тест профиля PRAGMA с WAL"""
+        db = Database(self.db.db_path, profile='performance')
+        conn = db._get_connection()
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute('PRAGMA temp_store').fetchone()[0], 2)   # MEMORY
+        db.close()
+
+        with self.assertRaises(ValueError):
+            Database(self.db.db_path, profile='unknown')
+
+    def _write_file(self, name, content):
+        path = os.path.join(self.test_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def _product_count(self):
+        conn = self.db._get_connection()
+        return conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+
+    def test_import_from_csv_chunks(self):
+        """Тест пакетного импорта CSV с прогрессом"""
+        lines = ['name,price,stock'] + [f'Товар {i},{i}.5,{i}' for i in range(25)]
+        path = self._write_file('products.csv', '\n'.join(lines))
+
+        progress = []
+        stats = self.db.import_from_csv('products', path, chunk_size=10, defer_indexes=True,
+                                        progress=lambda s: progress.append(s.rows_imported))
+        self.assertEqual(stats.rows_imported, 25)
+        self.assertEqual(progress, [10, 20, 25])
+        self.assertEqual(self._product_count(), 26)
+
+        # Прерывание в последнем отчете откатывает импорт: после фиксации отчетов нет
+        changes = []
+        self.db.subscribe(changes.append)
+
+        def cancel_at_end(stats):
+            if stats.rows_imported == 25:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.db.import_from_csv('products', path, chunk_size=10, progress=cancel_at_end)
+        self.assertEqual(self._product_count(), 26)
+        self.assertEqual(changes, [])
+
+    def test_import_orders_without_total(self):
+        """Тест заказов без итоговой суммы (NULL в total_cents)"""
+        path = self._write_file('orders.csv', 'customer_id,order_date,status\n'
+                                              f'{self.customer.id},2024-01-01 10:00:00,pending\n')
+        self.db.import_from_csv('orders', path)
+        paid_id = self._create_order(1, "2024-01-02 10:00:00")
+
+        orders = self.db.get_all_orders()
+        unpaid = next(order for order in orders if order.id != paid_id)
+        self.assertIsNone(unpaid.total_cents)
+        self.assertIsNone(unpaid.to_dict()['total_amount'])
+        self.assertEqual([order.id for order in sort_orders_by_amount(orders)], [paid_id, unpaid.id])
+
+    def test_import_from_json_formats(self):
+        """Тест потокового импорта JSON-массива и JSON Lines"""
+        array_path = self._write_file('products.json',
+                                      '[{"name": "A", "price": 1.0}, {"name": "B", "price": 2.0}]')
+        lines_path = self._write_file('products.jsonl',
+                                      '{"name": "C", "price": 3.0}\n{"name": "D", "price": 4.0}\n')
+
+        self.assertEqual(self.db.import_from_json('products', array_path).rows_imported, 2)
+        self.assertEqual(self.db.import_from_json('products', lines_path).rows_imported, 2)
+        self.assertEqual(self._product_count(), 5)
+
+    def test_import_bad_row(self):
+        """Тест отката и пропуска ошибочных строк"""
+        # Строка 3 содержит лишнее значение, в строке 4 не хватает цены
+        path = self._write_file('products.csv',
+                                'name,price\nA,1\nB,2\nC,3,x\nD\nE,5\n')
+
+        with self.assertRaises(BulkImportError) as ctx:
+            self.db.import_from_csv('products', path, chunk_size=2)
+        self.assertEqual(ctx.exception.row_number, 3)
+        self.assertEqual(self._product_count(), 1)
+
+        stats = self.db.import_from_csv('products', path, chunk_size=2, on_error='skip')
+        self.assertEqual(stats.rows_imported, 3)
+        self.assertEqual([row for row, _ in stats.errors], [3, 4])
+        self.assertEqual(self._product_count(), 4)
+
+        # Нарушение NOT NULL обнаруживается при вставке пачки
+        path = self._write_file('products.json',
+                                '[{"name": "F", "price": 1}, {"name": null, "price": 2}]')
+        with self.assertRaises(BulkImportError) as ctx:
+            self.db.import_from_json('products', path)
+        self.assertEqual(ctx.exception.row_number, 2)
+        self.assertEqual(self._product_count(), 4)
+
+        # Записи JSON должны быть объектами
+        path = self._write_file('products.json', '[[1, 2], [3, 4]]')
+        with self.assertRaises(ValueError):
+            self.db.import_from_json('products', path)
+
+    def test_import_half_cents(self):
+        """Тест: импорт переводит суммы в копейки так же, как модели"""
+        prices = ['1.005', '0.285', '2.675', '19.995', '0.1']
+        path = self._write_file('products.csv',
+                                'name,price\n' + ''.join(f'П{price},{price}\n' for price in prices))
+        self.db.import_from_csv('products', path)
+
+        imported = {p.name: p.price_cents for p in self.db.get_all_products()}
+        self.assertEqual([imported[f'П{price}'] for price in prices],
+                         [Product(price=price).price_cents for price in prices])
+        self.assertEqual(imported['П1.005'], 101)
+
+        # Некорректная сумма - ошибка строки, а не 0
+        path = self._write_file('products.csv', 'name,price\nA,abc\nB,1\n')
+        stats = self.db.import_from_csv('products', path, on_error='skip')
+        self.assertEqual(stats.errors, [(1, "Invalid amount: 'abc'")])
+        self.assertEqual(stats.rows_imported, 1)
+
+    def test_import_mapping_rows(self):
+        """Тест пакетной вставки строк-словарей"""
+        rows = [{'price': 1.5, 'name': 'A'}, ('B', 2), {'name': 'C'}, {'name': 'D', 'price': 4, 'extra': 1}]
+        stats = self.db.bulk_insert('products', ['name', 'price'], rows, on_error='skip')
+        self.assertEqual(stats.rows_imported, 3)
+        self.assertEqual(stats.errors, [(3, "Missing columns: price")])
+        products = {p.name: p.price for p in self.db.get_all_products()}
+        self.assertEqual([products.get(name) for name in 'ABCD'], [1.5, 2.0, None, 4.0])
+
+    def test_import_validation(self):
+        """Тест пакетной проверки клиентов и товаров при импорте"""
+        path = self._write_file('products.csv', 'name,price,stock\nA,1,2\nB,-1,0\nC,x,1\nD,2,3\n')
+        with self.assertRaises(BulkImportError) as ctx:
+            self.db.import_from_csv('products', path, validate=True)
+        self.assertEqual((ctx.exception.row_number, ctx.exception.message), (2, "Price is negative"))
+
+        stats = self.db.import_from_csv('products', path, chunk_size=2, on_error='skip', validate=True)
+        self.assertEqual(stats.rows_imported, 2)
+        self.assertEqual(stats.errors, [(2, "Price is negative"), (3, "Price is not a number")])
+
+        # По умолчанию проверки нет, как и раньше; некорректная цена все равно не вставляется как 0
+        stats = self.db.import_from_csv('products', path, on_error='skip')
+        self.assertEqual(stats.rows_imported, 3)
+        self.assertEqual(stats.errors, [(3, "Invalid amount: 'x'")])
+
+        path = self._write_file('customers.jsonl', '{"name": "Анна", "email": "anna@test.com"}\n'
+                                                   '{"name": "Борис", "email": "boris"}\n')
+        stats = self.db.import_from_json('customers', path, on_error='skip', validate=True)
+        self.assertEqual((stats.rows_imported, stats.errors), (1, [(2, "Invalid email")]))
+
+    def test_streaming_export_roundtrip(self):
+        """Тест потокового экспорта в CSV, JSON и JSON Lines (в том числе gzip)"""
+        for i in range(5):
+            self.db.add_product(Product(name=f"Товар {i + 2}", price=float(i), stock=i))
+
+        for name in ('products.csv', 'products.csv.gz', 'products.json',
+                     'products.json.gz', 'products.jsonl'):
+            path = os.path.join(self.test_dir, name)
+            if name.startswith('products.csv'):
+                count = self.db.export_to_csv('products', path, batch_size=2)
+            else:
+                count = self.db.export_to_json('products', path, batch_size=2)
+            self.assertEqual(count, 6)
+
+            # Экспортированный файл импортируется во вторую базу без потерь
+            other = Database(os.path.join(self.test_dir, f"{name}.db"))
+            if name.startswith('products.csv'):
+                other.import_from_csv('products', path)
+            else:
+                other.import_from_json('products', path)
+            self.assertEqual([p.to_dict() for p in other.get_all_products()],
+                             [p.to_dict() for p in self.db.get_all_products()])
+            other.close()
+
+        with open(os.path.join(self.test_dir, 'products.json'), encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)), 6)
+        # Цены выгружаются в рублях под прежним именем колонки
+        with open(os.path.join(self.test_dir, 'products.csv'), encoding='utf-8') as f:
+            self.assertEqual(f.readline().strip(), 'id,name,description,price,category,stock')
+            self.assertEqual(f.readline().strip(), '1,Товар 1,Описание,100.0,Категория 1,10')
+
+    def test_keyset_pagination(self):
+        """Тест keyset-пагинации с одинаковыми именами и обоими направлениями"""
+        for i in range(9):
+            self.db.add_customer(Customer(name=f"Клиент {i % 3}"))
+
+        pages = []
+        page = self.db.get_customers_page(limit=4)
+        pages.append(page.rows)
+        while page.has_more:
+            page = self.db.get_customers_page(page.last_key, limit=4)
+            pages.append(page.rows)
+
+        expected = [(c.id, c.name) for c in self.db.get_all_customers()]
+        self.assertEqual([(row[0], row[1]) for rows in pages for row in rows],
+                         sorted(expected, key=lambda x: (x[1], x[0])))
+        self.assertEqual([len(rows) for rows in pages], [4, 4, 2])
+
+        # Возврат на предыдущую страницу от первой строки последней страницы
+        previous = self.db.get_customers_page(page.first_key, limit=4, direction='prev')
+        self.assertEqual(previous.rows, pages[1])
+        self.assertTrue(previous.has_more)
+
+    def test_orders_page(self):
+        """Тест страницы заказов от новых к старым"""
+        first_id = self._create_order(1, "2024-01-01 10:00:00")
+        second_id = self._create_order(2, "2024-01-02 10:00:00")
+        third_id = self._create_order(3, "2024-01-02 10:00:00")
+
+        page = self.db.get_orders_page(limit=2)
+        self.assertEqual([row[0] for row in page.rows], [third_id, second_id])
+        self.assertEqual(page.rows[0][1], "Иван Иванов")
+        page = self.db.get_orders_page(page.last_key, limit=2)
+        self.assertEqual([row[0] for row in page.rows], [first_id])
+        self.assertFalse(page.has_more)
+
+        plan = self._query_plan('''
+            SELECT o.id FROM orders o LEFT JOIN customers c ON o.customer_id = c.id
+            WHERE COALESCE(o.order_date, '') <= ? AND (COALESCE(o.order_date, ''), o.id) < (?, ?)
+            ORDER BY COALESCE(o.order_date, '') DESC, o.id DESC LIMIT 10
+        ''', ("2024-01-02", "2024-01-02", 5))
+        self.assertIn('SEARCH o USING INDEX idx_orders_date_key', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_orders_page_without_date(self):
+        """Тест: заказы без даты попадают на страницы (в конец списка)"""
+        dated = [self._create_order(1, f"2024-01-0{i + 1} 10:00:00") for i in range(2)]
+        path = self._write_file('orders.csv', 'customer_id,status\n' + f'{self.customer.id},pending\n' * 3)
+        self.db.import_from_csv('orders', path)
+        undated = [order_id for order_id, in self.db._get_connection().execute(
+            'SELECT id FROM orders WHERE order_date IS NULL ORDER BY id DESC')]
+
+        pages = [self.db.get_orders_page(limit=2)]
+        while pages[-1].has_more:
+            pages.append(self.db.get_orders_page(pages[-1].last_key, limit=2))
+        self.assertEqual([row[0] for page in pages for row in page.rows], dated[::-1] + undated)
+        self.assertEqual(pages[-1].last_key, ('', undated[-1]))
+
+        # Обратно от последней страницы, ключ которой - заказ без даты
+        previous = self.db.get_orders_page(pages[-1].first_key, limit=2, direction='prev')
+        self.assertEqual(previous.rows, pages[-2].rows)
+
+    def test_rollups(self):
+        """Тест агрегатных таблиц: добавление заказа, импорт, проверка и пересчет"""
+        self._create_order(2, "2024-01-01 10:00:00")
+        self._create_order(3, "2024-01-05 10:00:00")
+        conn = self.db._get_connection()
+        self.assertEqual(conn.execute('SELECT * FROM customer_stats').fetchall(),
+                         [(self.customer.id, 2, 50000, "2024-01-05 10:00:00")])
+        self.assertEqual(conn.execute('SELECT * FROM product_stats').fetchall(),
+                         [(self.product.id, 2, 5, 50000, "2024-01-05 10:00:00")])
+
+        # Импорт заказов обновляет агрегаты по новому диапазону ID
+        path = self._write_file('orders.csv', 'customer_id,order_date,status,total_amount\n'
+                                              f'{self.customer.id},2024-02-01,completed,50.0\n')
+        self.db.import_from_csv('orders', path)
+        self.assertEqual(conn.execute('SELECT order_count, total_spent_cents, last_order_date FROM customer_stats')
+                         .fetchall(), [(3, 55000, "2024-02-01")])
+        self.assertEqual(conn.execute('SELECT * FROM sales_daily').fetchall(),
+                         [("2024-01-01", 1, 20000), ("2024-01-05", 1, 30000), ("2024-02-01", 1, 5000)])
+        self.assertEqual(self.db.check_rollups(), {'customer_stats': [], 'product_stats': [], 'sales_daily': []})
+
+        analyzer = DataAnalyzer(self.db.db_path)
+        try:
+            top = analyzer.get_top_customers()
+            self.assertEqual(list(top['order_count']), [3])
+            top = analyzer.get_top_products()
+            self.assertEqual(list(top['total_revenue']), [500.0])
+            trend = analyzer.get_sales_trend('M', end='2024-01-31')
+            self.assertEqual(list(trend), [500.0])
+        finally:
+            analyzer.close()
+
+        plan = self._query_plan('''
+            SELECT customer_id FROM customer_stats
+            ORDER BY order_count DESC, total_spent_cents DESC LIMIT 5
+        ''')
+        self.assertIn('idx_customer_stats_top', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+        # Расхождение находится проверкой и исправляется пересчетом
+        conn.execute('UPDATE product_stats SET total_quantity = 1')
+        conn.commit()
+        self.assertEqual(self.db.check_rollups()['product_stats'], [self.product.id])
+        self.db.rebuild_rollups()
+        self.assertEqual(self.db.check_rollups(), {'customer_stats': [], 'product_stats': [], 'sales_daily': []})
+
+    def test_rollups_items_before_orders(self):
+        """Тест: элементы заказов, импортированные раньше самих заказов, получают дату заказа"""
+        conn = self.db._get_connection()
+        next_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM orders').fetchone()[0]
+        path = self._write_file('order_items.csv', 'order_id,product_id,quantity,unit_price\n'
+                                f'{next_id},{self.product.id},1,10.0\n100,{self.product.id},2,10.0\n')
+        self.db.import_from_csv('order_items', path)
+        self.assertEqual(conn.execute('SELECT order_count, last_order_date FROM product_stats').fetchall(),
+                         [(2, None)])
+
+        # Заказы без ID: агрегаты по новому диапазону ID
+        path = self._write_file('orders.csv', 'customer_id,order_date,status,total_amount\n'
+                                              f'{self.customer.id},2024-03-01,completed,10.0\n')
+        self.db.import_from_csv('orders', path)
+        self.assertEqual(conn.execute('SELECT last_order_date FROM product_stats').fetchall(), [("2024-03-01",)])
+
+        # Заказы с ID из данных: полный пересчет
+        path = self._write_file('orders.csv', 'id,customer_id,order_date,status,total_amount\n'
+                                              f'100,{self.customer.id},2024-04-01,completed,20.0\n')
+        self.db.import_from_csv('orders', path)
+        self.assertEqual(conn.execute('SELECT last_order_date FROM product_stats').fetchall(), [("2024-04-01",)])
+        self.assertEqual(self.db.check_rollups(), {'customer_stats': [], 'product_stats': [], 'sales_daily': []})
+
+    def test_customer_city(self):
+        """Тест колонки города: заполнение при добавлении и импорте, группировка по регионам"""
+        self.db.add_customer(Customer(name="Анна", address="Казань, ул. Баумана, 5"))
+        path = self._write_file('customers.csv', 'name,address\nБорис,"Самара, ул. Ленина"\nВера,\n')
+        self.db.import_from_csv('customers', path)
+
+        conn = self.db._get_connection()
+        cities = conn.execute('SELECT name, city FROM customers ORDER BY id').fetchall()
+        self.assertEqual(cities, [("Иван Иванов", "Москва"), ("Анна", "Казань"),
+                                  ("Борис", "Самара"), ("Вера", "Не указан")])
+        self.assertIn('COVERING INDEX idx_customers_city',
+                      self._query_plan('SELECT city, COUNT(*) FROM customers GROUP BY city'))
+
+        analyzer = DataAnalyzer(self.db.db_path)
+        try:
+            by_city = analyzer.get_customer_geography()
+            self.assertEqual(dict(zip(by_city['city'], by_city['count'])),
+                             {"Москва": 1, "Казань": 1, "Самара": 1, "Не указан": 1})
+            by_region = analyzer.get_customer_geography('region', regions={"Казань": "Приволжский",
+                                                                           "Самара": "Приволжский"})
+            self.assertEqual(list(zip(by_region['region'], by_region['count'])),
+                             [("Приволжский", 2), ("Другие", 1), ("Не указан", 1)])
+        finally:
+            analyzer.close()
+
+    def test_change_notifications(self):
+        """Тест уведомлений об изменениях в формате строк постраничных запросов"""
+        changes = []
+        self.db.subscribe(changes.append)
+
+        customer_id = self.db.add_customer(Customer(name="Петр Петров"))
+        order_id = self._create_order(1, "2024-01-01 10:00:00")
+        path = self._write_file('products.csv', 'name,price\nA,1.0\n')
+        self.db.import_from_csv('products', path)
+
+        self.assertEqual([(c.table, c.action) for c in changes],
+                         [('customers', 'insert'), ('orders', 'insert'), ('products', 'reload')])
+        page_row = next(row for row in self.db.get_customers_page().rows if row[0] == customer_id)
+        self.assertEqual(changes[0].rows, [page_row])
+        self.assertEqual(changes[1].rows, [self.db.get_orders_page().rows[0]])
+        self.assertEqual(changes[1].rows[0][0], order_id)
+
+        self.db.unsubscribe(changes.append)
+        self.db.add_customer(Customer(name="Сидор Сидоров"))
+        self.assertEqual(len(changes), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
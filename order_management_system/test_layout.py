@@ -0,0 +1,75 @@
+import unittest
+import os
+import shutil
+import tempfile
+import networkx as nx
+import layout
+from layout import LayoutCache, graph_version, top_subgraph
+
+
+class TestLayout(unittest.TestCase):
+
+    def setUp(self):
+        """Граф из двух связанных групп клиентов"""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "network_layout.json")
+        self.G = nx.Graph()
+        self.G.add_weighted_edges_from([(1, 2, 3), (2, 3, 1), (3, 4, 2), (4, 5, 1), (5, 1, 1), (6, 7, 1)])
+        self.calls = []
+        self.spring_positions = layout.spring_positions
+
+        def counting(G, known=None):
+            self.calls.append(len(known or {}))
+            return self.spring_positions(G, known)
+        layout.spring_positions = counting
+
+    def tearDown(self):
+        """Очистка временных файлов"""
+        layout.spring_positions = self.spring_positions
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_cached_and_persisted(self):
+        """Тест повторного использования и сохранения раскладки"""
+        cache = LayoutCache(self.path)
+        pos = cache.layout(self.G)
+        self.assertEqual(set(pos), set(self.G))
+        self.assertEqual(cache.layout(self.G.copy()), pos)
+        self.assertEqual(len(self.calls), 1)
+
+        # Раскладка переживает перезапуск
+        restored = LayoutCache(self.path).layout(self.G)
+        self.assertEqual(restored, pos)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_incremental(self):
+        """Тест дорасчета только новых узлов"""
+        cache = LayoutCache(self.path)
+        pos = cache.layout(self.G)
+
+        self.G.add_edge(8, 1, weight=2)
+        updated = cache.layout(self.G)
+        self.assertEqual(self.calls, [0, len(pos)])
+        self.assertIn(8, updated)
+        for node, xy in pos.items():
+            self.assertEqual(updated[node], xy)
+
+    def test_top_subgraph(self):
+        """Тест отбора самых связанных клиентов"""
+        H = top_subgraph(self.G, 3)
+        self.assertEqual(sorted(H), [1, 2, 3])
+        self.assertIs(top_subgraph(self.G, None), self.G)
+
+        pos = LayoutCache().layout(self.G, max_nodes=3)
+        self.assertEqual(sorted(pos), [1, 2, 3])
+        self.assertNotEqual(graph_version(H), graph_version(self.G))
+
+    def test_corrupted_file(self):
+        """Тест пересчета раскладки при поврежденном файле кэша"""
+        with open(self.path, 'w') as f:
+            f.write("{")
+        pos = LayoutCache(self.path).layout(self.G)
+        self.assertEqual(set(pos), set(self.G))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -92,6 +92,47 @@ class TestModels(unittest.TestCase):
         self.assertEqual(item_dict['quantity'], 3)
         self.assertEqual(item_dict['total_price'], 300.0)
 
+    def test_money_cents(self):
+        """Тест точных сумм в копейках"""
+        product = Product(name="Копеечный товар", price=0.1)
+        self.assertEqual(product.price_cents, 10)
+
+        order = Order(customer=self.customer)
+        for _ in range(3):
+            order.add_item(product, 1)
+        self.assertEqual(order.total_cents, 30)
+        self.assertEqual(order.total_amount, 0.3)
+
+        product.price = 19.99
+        self.assertEqual(product.price_cents, 1999)
+        self.assertEqual(OrderItem(product, 1000).total_cents, 1999000)
+        self.assertEqual(Product(name="Товар", price_cents=999).price, 9.99)
+
+        # Цена и итог могут быть не указаны (NULL в базе)
+        unpriced = Product(name="Без цены", price=None)
+        self.assertIsNone(unpriced.price)
+        self.assertIsNone(unpriced.to_dict()['price'])
+        self.assertEqual(OrderItem(unpriced, 2).total_cents, 0)
+        untotaled = Order(customer=self.customer)
+        untotaled.total_cents = None
+        self.assertIsNone(untotaled.total_amount)
+        self.assertIsNone(untotaled.to_dict()['total_amount'])
+        untotaled.add_item(product, 2)
+        self.assertEqual(untotaled.total_cents, 3998)
+
+    def test_slots(self):
+        """Тест компактных моделей без __dict__"""
+        for obj in (self.customer, self.product, self.order, self.order.items[0]):
+            self.assertFalse(hasattr(obj, '__dict__'))
+            with self.assertRaises(AttributeError):
+                obj.unknown_field = 1
+
+        # Объявленные поля по-прежнему изменяемы
+        self.customer.id = 5
+        self.order.status = "completed"
+        self.assertEqual(self.order.to_dict()['customer_id'], 5)
+        self.assertEqual(self.order.to_dict()['status'], "completed")
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import sqlite3
+import unittest
+from decimal import Decimal
+from money import cents_sql, from_cents, to_cents
+
+
+class TestMoney(unittest.TestCase):
+
+    def test_to_cents(self):
+        """Тест перевода сумм в копейки"""
+        self.assertEqual(to_cents(9.99), 999)
+        self.assertEqual(to_cents(0.1), 10)
+        self.assertEqual(to_cents(100), 10000)
+        self.assertEqual(to_cents("19.995"), 2000)
+        self.assertEqual(to_cents(-0.005), -1)
+        self.assertEqual(to_cents(Decimal("1.01")), 101)
+        self.assertIsInstance(to_cents(1.5), int)
+
+        self.assertIsNone(to_cents(None))
+        for value in ("abc", float('nan')):
+            with self.assertRaises(ValueError):
+                to_cents(value)
+
+    def test_from_cents(self):
+        """Тест перевода копеек в рубли"""
+        self.assertEqual(from_cents(999), 9.99)
+        self.assertIsNone(from_cents(None))
+        self.assertEqual(from_cents(sum(to_cents(0.1) for _ in range(10))), 1.0)
+
+    def test_cents_sql(self):
+        """Тест SQL-выражения перевода в копейки"""
+        conn = sqlite3.connect(':memory:')
+        self.assertEqual(conn.execute(f"SELECT {cents_sql('?')}", (9.99,)).fetchone(), (999,))
+        self.assertEqual(conn.execute(f"SELECT {cents_sql('?')}", ("0.1",)).fetchone(), (10,))
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
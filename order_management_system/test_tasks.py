@@ -0,0 +1,152 @@
+import unittest
+import threading
+import time
+from tasks import TaskRunner
+
+
+class FakeRoot:
+    """Заглушка Tk: отложенные вызовы выполняются вручную в тестовом потоке"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+
+    def pump(self, timeout=5.0):
+        """Обработка отложенных вызовов, пока они есть"""
+        deadline = time.time() + timeout
+        while self.callbacks and time.time() < deadline:
+            callbacks, self.callbacks = self.callbacks, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.01)
+
+
+class TestTaskRunner(unittest.TestCase):
+
+    def setUp(self):
+        """Настройка пула задач"""
+        self.root = FakeRoot()
+        self.runner = TaskRunner(self.root, max_workers=2, poll_interval=1)
+
+    def tearDown(self):
+        """Остановка пула задач"""
+        self.runner.shutdown()
+
+    def test_result_in_ui_thread(self):
+        """Тест передачи результата в поток интерфейса"""
+        results = []
+        ui_thread = threading.current_thread()
+
+        self.runner.submit('sum', lambda task, a, b: a + b, 2, 3,
+                           on_success=lambda r: results.append((r, threading.current_thread())))
+        self.root.pump()
+
+        self.assertEqual(results, [(5, ui_thread)])
+        self.assertFalse(self.runner.is_running('sum'))
+
+    def test_duplicate_task_rejected(self):
+        """Тест запрета повторного запуска выполняющейся задачи"""
+        release = threading.Event()
+        results = []
+
+        self.assertTrue(self.runner.submit('load', lambda task: release.wait(5),
+                                           on_success=results.append))
+        self.assertFalse(self.runner.submit('load', lambda task: None))
+        release.set()
+        self.root.pump()
+
+        self.assertEqual(results, [True])
+        self.assertTrue(self.runner.submit('load', lambda task: None))
+        self.root.pump()
+
+    def test_error_and_progress(self):
+        """Тест обработки ошибок и прогресса"""
+        progress = []
+        errors = []
+
+        def failing(task):
+            task.progress(0.5, "половина")
+            raise ValueError("ошибка")
+
+        self.runner.submit('fail', failing, on_error=errors.append,
+                           on_progress=lambda f, m: progress.append((f, m)))
+        self.root.pump()
+
+        self.assertEqual(progress, [(0.5, "половина")])
+        self.assertIsInstance(errors[0], ValueError)
+
+    def test_cancel(self):
+        """Тест отмены задачи"""
+        started = threading.Event()
+        cancelled = []
+        results = []
+
+        def long_task(task):
+            started.set()
+            while True:
+                task.check_cancelled()
+                time.sleep(0.01)
+
+        self.runner.submit('long', long_task, on_success=results.append,
+                           on_cancel=lambda: cancelled.append(True))
+        started.wait(5)
+        self.runner.cancel('long')
+        self.root.pump()
+
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(results, [])
+
+    def test_cancel_after_completion(self):
+        """Тест: отмена после завершения работы не теряет результат"""
+        finished = threading.Event()
+        release = threading.Event()
+        cancelled = []
+        results = []
+
+        def committed(task):
+            finished.set()
+            # Работа выполнена; отмена приходит до возврата результата
+            release.wait(5)
+            return 42
+
+        self.runner.submit('order', committed, on_success=results.append,
+                           on_cancel=lambda: cancelled.append(True))
+        finished.wait(5)
+        self.runner.cancel()
+        release.set()
+        self.root.pump()
+
+        self.assertEqual(results, [42])
+        self.assertEqual(cancelled, [])
+
+    def test_shutdown_waits(self):
+        """Тест: остановка пула не блокирует поток интерфейса, on_done - после выполняющихся задач"""
+        started = threading.Event()
+        finished = []
+        queued = []
+
+        def long_task(task):
+            started.set()
+            for _ in range(20):
+                time.sleep(0.01)
+            finished.append(True)
+
+        runner = TaskRunner(self.root, max_workers=1, poll_interval=1)
+        runner.submit('long', long_task)
+        runner.submit('queued', lambda task: queued.append(True))
+        started.wait(5)
+        done = []
+        runner.shutdown(on_done=lambda: done.append(list(finished)))
+        self.assertEqual(done, [])
+        self.root.pump()
+
+        # on_done вызван после завершения запущенной задачи, задача из очереди не начиналась
+        self.assertEqual(done, [[True]])
+        self.assertEqual(queued, [])
+        self.assertFalse(runner.submit('late', lambda task: None))
+
+
+if __name__ == '__main__':
+    unittest.main()
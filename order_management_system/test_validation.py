@@ -0,0 +1,72 @@
+import unittest
+import pandas as pd
+from models import Customer, Product
+from validation import compile_validator, validate_frame, validate_rows
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        """Строки клиентов и товаров с ошибками разных видов"""
+        self.customer_columns = ['name', 'email', 'phone', 'address']
+        self.customers = [
+            ["Иван", "ivan@example.com", "+7 916 123 45 67", "Москва"],
+            ["  ", "ivan@example.com", "", ""],
+            ["Петр", "invalid-email", "abc", ""],
+            ["Анна", None, "0123", ""],
+            ["Вера", "", None, ""],
+        ]
+        self.product_columns = ['name', 'price', 'stock']
+        self.products = [
+            ["Товар", "10.5", "3"],
+            ["Товар", "-1", "3"],
+            ["Товар", "x", "-3"],
+            ["Товар", 5, -1],
+            [None, -1, 0],
+            ["Товар", "", None],
+        ]
+
+    def test_validate_rows(self):
+        """Тест кодов ошибок пакетной проверки строк"""
+        self.assertEqual(validate_rows('customers', self.customer_columns, self.customers),
+                         [None, 'empty_name', 'invalid_email', 'invalid_phone', None])
+        self.assertEqual(validate_rows('products', self.product_columns, self.products),
+                         [None, 'negative_price', 'invalid_price', 'negative_stock', 'empty_name', None])
+
+        # Проверяются только присутствующие колонки
+        self.assertEqual(validate_rows('products', ['stock'], [["-1"]]), ['negative_stock'])
+        self.assertIsNone(compile_validator('products', ['description']))
+        self.assertIsNone(compile_validator('orders', ['status']))
+
+    def test_validate_frame(self):
+        """Тест проверки DataFrame"""
+        customers = pd.DataFrame(self.customers, columns=self.customer_columns, index=range(10, 15))
+        codes = validate_frame('customers', customers)
+        self.assertEqual(list(codes.index), list(customers.index))
+        self.assertEqual(list(codes), validate_rows('customers', self.customer_columns, self.customers))
+
+        products = pd.DataFrame(self.products, columns=self.product_columns)
+        self.assertEqual(list(validate_frame('products', products)),
+                         validate_rows('products', self.product_columns, self.products))
+
+        # Столбцы любого типа (object, строки, числа) проверяются по тем же правилам
+        rows = [["\t", "a@b.cc\n", " "], ["Б", "a@b.cc", "+7 9"], ["В", None, "1 234"]]
+        frame = pd.DataFrame(rows, columns=['name', 'email', 'phone'], dtype=object)
+        self.assertEqual(list(validate_frame('customers', frame)),
+                         validate_rows('customers', ['name', 'email', 'phone'], rows))
+        numbers = pd.DataFrame({'price': [1.5, -2.0, None], 'stock': [1, 2, 3]})
+        self.assertEqual(list(validate_frame('products', numbers)), [None, 'negative_price', None])
+
+    def test_models_use_same_rules(self):
+        """Тест согласованности Person.validate и Product.validate с пакетной проверкой"""
+        for name, email, phone, _ in self.customers:
+            expected = validate_rows('customers', ['name', 'email', 'phone'], [[name, email, phone]])
+            customer = Customer(name=name or "", email=email or "", phone=phone or "")
+            self.assertEqual(customer.validate(), expected == [None])
+
+        self.assertTrue(Product(name="Товар", price=1.0, stock=0).validate())
+        self.assertFalse(Product(name="Товар", price=1.0, stock=-1).validate())
+
+
+if __name__ == '__main__':
+    unittest.main()
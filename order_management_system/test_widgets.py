@@ -0,0 +1,309 @@
+import unittest
+import os
+import shutil
+import tempfile
+from db import Database
+from models import Customer, Order, Product
+from tasks import TaskRunner
+from test_tasks import FakeRoot
+from widgets import LazyChoices, VirtualTreeview
+
+
+class FakeTreeview:
+    """Заглушка ttk.Treeview: строки в списке, прокрутка - доля первой видимой строки"""
+
+    def __init__(self):
+        self.iids = []
+        self.values = {}
+        self.first = 0.0
+
+    def configure(self, **options):
+        pass
+
+    def get_children(self):
+        return tuple(self.iids)
+
+    def insert(self, parent, index, iid, values):
+        self.iids.insert(index, iid)
+        self.values[iid] = values
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.iids.remove(iid)
+            del self.values[iid]
+
+    def exists(self, iid):
+        return iid in self.values
+
+    def item(self, iid, values):
+        self.values[iid] = values
+
+    def yview(self, *args):
+        return self.first, min(self.first + 0.1, 1.0)
+
+    def yview_moveto(self, fraction):
+        self.first = fraction
+
+
+class FakeScrollbar:
+    def configure(self, **options):
+        pass
+
+    def set(self, first, last):
+        pass
+
+
+class FakeCombobox:
+    """Заглушка ttk.Combobox с выбором по индексу"""
+
+    def __init__(self):
+        self.options = {'values': []}
+        self.index = -1
+        self.handlers = []
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def __setitem__(self, name, value):
+        self.options[name] = list(value)
+
+    def current(self):
+        return self.index
+
+    def set(self, value):
+        self.index = self.options['values'].index(value) if value in self.options['values'] else -1
+
+    def bind(self, event, handler, add=None):
+        self.handlers.append(handler)
+
+    def select(self, index):
+        """Выбор значения пользователем"""
+        self.index = index
+        for handler in self.handlers:
+            handler(None)
+
+
+class TestWidgets(unittest.TestCase):
+
+    def setUp(self):
+        """Временная база: 50 клиентов и 50 заказов с разными датами"""
+        self.test_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.test_dir, "test_widgets.db"))
+        self.db.bulk_insert('customers', ['name'], ([f"Клиент {i:02d}"] for i in range(50)))
+        self.db.bulk_insert('orders', ['customer_id', 'order_date', 'status', 'total_amount'],
+                            ([i + 1, f"2024-01-01 {i // 60:02d}:{i % 60:02d}:00", "pending", 1.0]
+                             for i in range(50)))
+        # Порядок списков: клиенты по имени, заказы от новых к старым
+        self.customer_ids = [str(i) for i in range(1, 51)]
+        self.order_ids = [str(i) for i in range(50, 0, -1)]
+        self.changes = []
+        self.db.subscribe(self.changes.append)
+
+    def tearDown(self):
+        """Очистка временной базы"""
+        self.db.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _customers_view(self):
+        view = VirtualTreeview(FakeTreeview(), FakeScrollbar(), self.db.get_customers_page,
+                               key=lambda row: (row[1], row[0]), page_size=5, max_pages=3)
+        view.reset()
+        return view
+
+    def _orders_view(self):
+        view = VirtualTreeview(FakeTreeview(), FakeScrollbar(), self.db.get_orders_page,
+                               key=lambda row: (row[2] or '', row[0]), descending=True,
+                               page_size=5, max_pages=3)
+        view.reset()
+        return view
+
+    def _assert_window(self, view, expected):
+        self.assertEqual(list(view.tree.get_children()), expected)
+        self.assertEqual(sum(view.page_counts), len(view.keys))
+        self.assertEqual(len(view.keys), len(expected))
+        self.assertEqual(view.keys, sorted(view.keys, reverse=view.descending))
+
+    def _page_through(self, view, ids):
+        """Прокрутка окна до конца списка и обратно к началу"""
+        self._assert_window(view, ids[:5])
+        self.assertFalse(view.has_prev)
+        self.assertTrue(view.has_next)
+
+        view.load_next()
+        view.load_next()
+        self._assert_window(view, ids[:15])
+        self.assertFalse(view.has_prev)
+
+        # Окно не больше max_pages страниц: верхняя страница удаляется
+        view.load_next()
+        self._assert_window(view, ids[5:20])
+        self.assertTrue(view.has_prev)
+
+        while view.has_next:
+            view.load_next()
+        self._assert_window(view, ids[35:])
+        self.assertTrue(view.has_prev)
+        view.load_next()
+        self._assert_window(view, ids[35:])
+
+        view.load_prev()
+        self._assert_window(view, ids[30:45])
+        self.assertTrue(view.has_next)
+
+        while view.has_prev:
+            view.load_prev()
+        self._assert_window(view, ids[:15])
+        self.assertTrue(view.has_next)
+
+    def test_paging_window(self):
+        """Тест подгрузки страниц в обе стороны и удаления страниц за пределами окна"""
+        self._page_through(self._customers_view(), self.customer_ids)
+
+    def test_paging_window_descending(self):
+        """Тест окна заказов, упорядоченных от новых к старым"""
+        self._page_through(self._orders_view(), self.order_ids)
+
+    def _new_row(self, table):
+        return next(row for change in self.changes if change.table == table for row in change.rows)
+
+    def test_apply_insert(self):
+        """Тест вставки новой строки в загруженное окно и пропуска строки за его пределами"""
+        view = self._customers_view()
+        view.load_next()
+
+        # Внутри окна: строка встает на свое место по ключу
+        customer_id = self.db.add_customer(Customer(name="Клиент 03a"))
+        view.apply_insert(self._new_row('customers'))
+        expected = self.customer_ids[:4] + [str(customer_id)] + self.customer_ids[4:10]
+        self._assert_window(view, expected)
+        self.assertEqual(view.page_counts, [6, 5])
+
+        # За пределами окна (дальше загруженных страниц): строка не вставляется
+        self.changes.clear()
+        self.db.add_customer(Customer(name="Клиент 99"))
+        view.apply_insert(self._new_row('customers'))
+        self._assert_window(view, expected)
+
+        # Перед окном, когда верхние страницы уже удалены: тоже не вставляется
+        for _ in range(3):
+            view.load_next()
+        window = list(view.tree.get_children())
+        self.changes.clear()
+        self.db.add_customer(Customer(name="Клиент 00a"))
+        view.apply_insert(self._new_row('customers'))
+        self._assert_window(view, window)
+
+    def test_apply_insert_descending(self):
+        """Тест вставки заказа в окно, упорядоченное по убыванию"""
+        view = self._orders_view()
+        view.load_next()
+        customer = Customer(id=1, name="Клиент 00")
+
+        # Новый заказ с датой между загруженными встает между ними
+        order_id = self.db.add_order(Order(customer=customer, order_date="2024-01-01 00:45:30"))
+        view.apply_insert(self._new_row('orders'))
+        expected = self.order_ids[:4] + [str(order_id)] + self.order_ids[4:10]
+        self._assert_window(view, expected)
+
+        # Самый новый заказ - в начало окна (выше него страниц нет)
+        self.changes.clear()
+        order_id = self.db.add_order(Order(customer=customer, order_date="2024-02-01 10:00:00"))
+        view.apply_insert(self._new_row('orders'))
+        expected = [str(order_id)] + expected
+        self._assert_window(view, expected)
+
+        # Самый старый - ниже загруженных страниц, не вставляется
+        self.changes.clear()
+        self.db.add_order(Order(customer=customer, order_date="2023-01-01 10:00:00"))
+        view.apply_insert(self._new_row('orders'))
+        self._assert_window(view, expected)
+
+    def test_apply_update(self):
+        """Тест обновления показанной строки"""
+        view = self._customers_view()
+        row = self.db.get_customers_page(limit=1).rows[0]
+        view.apply_update((row[0], row[1], "new@test.com") + row[3:])
+        self.assertEqual(view.tree.values[str(row[0])][2], "new@test.com")
+
+        # Строки вне окна игнорируются
+        view.apply_update((999, "Нет", "", "", "", ""))
+        self.assertFalse(view.tree.exists('999'))
+
+    def test_lazy_choices(self):
+        """Тест списка комбобокса: загрузка при открытии, вставка, обновление и выбор"""
+        product = Product(name="Товар Б", price=2.0, stock=3)
+        product.id = self.db.add_product(product)
+        combo = FakeCombobox()
+        choices = LazyChoices(combo, self.db.get_products_page, key=lambda row: (row[1], row[0]),
+                              format_row=lambda row: f"{row[0]}: {row[1]}", page_size=1)
+        self.assertIsNone(choices.selected_row())
+
+        # Вставки до загрузки игнорируются: список будет выбран при открытии
+        self.changes.clear()
+        self.db.add_product(Product(name="Товар В", price=1.0))
+        choices.apply_insert(self._new_row('products'))
+        self.assertEqual(combo.options['values'], [])
+
+        # Страницы подгружаются по одной: служебная строка в конце загружает следующую
+        combo.options['postcommand']()
+        self.assertEqual([row[1] for row in choices.rows], ["Товар Б"])
+        self.assertEqual(combo.options['values'][-1], LazyChoices.MORE_LABEL)
+        combo.select(1)
+        self.assertEqual(combo.current(), -1)
+        self.assertEqual([row[1] for row in choices.rows], ["Товар Б", "Товар В"])
+        self.assertEqual(len(combo.options['values']), 2)
+
+        self.changes.clear()
+        self.db.add_product(Product(name="Товар А", price=1.0))
+        choices.apply_insert(self._new_row('products'))
+        self.assertEqual([value.split(': ')[1] for value in combo.options['values']],
+                         ["Товар А", "Товар Б", "Товар В"])
+
+        order = Order(customer=Customer(id=1, name="Клиент 00"))
+        order.add_item(product, 2)
+        self.changes.clear()
+        self.db.place_order(order)
+        choices.apply_update(next(change.rows[0] for change in self.changes if change.table == 'products'))
+        combo.index = 1
+        self.assertEqual(choices.selected_row()[5], 1)
+
+    def test_lazy_choices_background(self):
+        """Тест списка комбобокса: страницы выбираются в фоновом потоке, не в потоке интерфейса"""
+        root = FakeRoot()
+        runner = TaskRunner(root, max_workers=1, poll_interval=1)
+        self.addCleanup(runner.shutdown)
+        combo = FakeCombobox()
+        choices = LazyChoices(combo, self.db.get_customers_page, key=lambda row: (row[1], row[0]),
+                              format_row=lambda row: row[1], page_size=20, runner=runner)
+
+        combo.options['postcommand']()
+        self.assertEqual(combo.options['values'], [LazyChoices.LOADING_LABEL])
+        combo.options['postcommand']()
+        root.pump()
+        self.assertEqual(combo.options['values'][:2] + combo.options['values'][-1:],
+                         ["Клиент 00", "Клиент 01", LazyChoices.MORE_LABEL])
+        self.assertEqual(len(choices.rows), 20)
+
+        # Запись после загруженных страниц появится вместе с ними
+        self.changes.clear()
+        self.db.add_customer(Customer(name="Клиент 99"))
+        choices.apply_insert(self._new_row('customers'))
+        self.assertEqual(len(choices.rows), 20)
+
+        for _ in range(2):
+            combo.select(len(choices.rows))
+            root.pump()
+        self.assertEqual([row[1] for row in choices.rows],
+                         [f"Клиент {i:02d}" for i in range(50)] + ["Клиент 99"])
+        self.assertFalse(choices.has_more)
+
+        # Страница, выбранная до сброса списка, отбрасывается
+        choices.invalidate()
+        combo.options['postcommand']()
+        choices.invalidate()
+        root.pump()
+        self.assertIsNone(choices.keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
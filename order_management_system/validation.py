@@ -0,0 +1,174 @@
+"""
+Проверка данных клиентов и товаров
+Шаблоны компилируются один раз при импорте модуля; пакетные функции
+проверяют сразу много строк и возвращают код ошибки для каждой строки
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_PATTERN = re.compile(r'^\+?[1-9]\d{1,14}$')
+
+# Коды ошибок и их описания (сообщения BulkImportError и ImportStats.errors)
+ERROR_MESSAGES = {
+    'empty_name': "Name is empty",
+    'invalid_email': "Invalid email",
+    'invalid_phone': "Invalid phone",
+    'invalid_price': "Price is not a number",
+    'negative_price': "Price is negative",
+    'invalid_stock': "Stock is not a number",
+    'negative_stock': "Stock is negative",
+}
+
+# Проверяемые поля таблиц в порядке проверки: первая ошибка строки - ее код
+TABLE_FIELDS = {
+    'customers': ('name', 'email', 'phone'),
+    'products': ('name', 'price', 'stock'),
+}
+
+RowValidator = Callable[[Sequence[Sequence[Any]]], List[Optional[str]]]
+
+
+def check_name(value: Any) -> Optional[str]:
+    if value is None or not str(value).strip():
+        return 'empty_name'
+    return None
+
+
+def check_email(value: Any) -> Optional[str]:
+    if value and not EMAIL_PATTERN.match(str(value)):
+        return 'invalid_email'
+    return None
+
+
+def check_phone(value: Any) -> Optional[str]:
+    if value and not PHONE_PATTERN.match(str(value).replace(" ", "")):
+        return 'invalid_phone'
+    return None
+
+
+def _number_check(field: str) -> Callable[[Any], Optional[str]]:
+    """Проверка неотрицательного числа; пустое значение допустимо (значение по умолчанию)"""
+    invalid, negative = f'invalid_{field}', f'negative_{field}'
+
+    def check(value: Any) -> Optional[str]:
+        if value is None or value == '':
+            return None
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return invalid
+        if number != number:
+            return invalid
+        return negative if number < 0 else None
+    return check
+
+
+FIELD_CHECKS: Dict[str, Callable[[Any], Optional[str]]] = {
+    'name': check_name,
+    'email': check_email,
+    'phone': check_phone,
+    'price': _number_check('price'),
+    'stock': _number_check('stock'),
+}
+
+
+def person_error(name: str, email: str, phone: str) -> Optional[str]:
+    """Код ошибки контактных данных или None"""
+    return check_name(name) or check_email(email) or check_phone(phone)
+
+
+def product_error(name: str, price: float, stock: int) -> Optional[str]:
+    """Код ошибки товара или None"""
+    return check_name(name) or FIELD_CHECKS['price'](price) or FIELD_CHECKS['stock'](stock)
+
+
+def compile_validator(table_name: str, columns: Sequence[str]) -> Optional[RowValidator]:
+    """
+    Пакетная проверка строк таблицы с колонками columns.
+
+    Возвращает функцию, которая принимает список строк (списков значений
+    в порядке columns) и возвращает код первой ошибки каждой строки или
+    None. Проверяются только присутствующие колонки; None - если
+    проверять нечего.
+    """
+    checks: List[Tuple[int, Callable[[Any], Optional[str]]]] = [
+        (columns.index(field), FIELD_CHECKS[field])
+        for field in TABLE_FIELDS.get(table_name, ()) if field in columns
+    ]
+    if not checks:
+        return None
+
+    def validate(rows: Sequence[Sequence[Any]]) -> List[Optional[str]]:
+        codes: List[Optional[str]] = [None] * len(rows)
+        # Проверки идут по колонкам: одна функция на весь столбец пачки
+        for index, check in checks:
+            for i, row in enumerate(rows):
+                if codes[i] is None:
+                    codes[i] = check(row[index])
+        return codes
+    return validate
+
+
+def validate_rows(table_name: str, columns: Sequence[str],
+                  rows: Sequence[Sequence[Any]]) -> List[Optional[str]]:
+    """Коды ошибок строк rows таблицы table_name (None - строка корректна)"""
+    validator = compile_validator(table_name, columns)
+    return validator(rows) if validator else [None] * len(rows)
+
+
+# Числовые поля: в validate_frame проверяются векторно через pd.to_numeric
+NUMERIC_FIELDS = ('price', 'stock')
+
+
+def _column_errors(field: str, column) -> List[Tuple[Any, str]]:
+    """
+    Ошибки столбца column для validate_frame: список (маска строк, код) в
+    порядке проверки. Правила те же, что у функций FIELD_CHECKS.
+    """
+    import numpy as np
+    import pandas as pd
+
+    missing = column.isna().to_numpy()
+    text = column.astype(str).where(~missing, '')
+    present = ~missing & (text != '').to_numpy()
+    if field in NUMERIC_FIELDS:
+        numbers = pd.to_numeric(column.where(present, None), errors='coerce')
+        numbers = numbers.to_numpy(dtype=float, na_value=np.nan)
+        invalid = present & np.isnan(numbers)
+        return [(invalid, f'invalid_{field}'), (~invalid & (numbers < 0), f'negative_{field}')]
+    if field == 'name':
+        return [((text.str.strip() == '').to_numpy(), 'empty_name')]
+    # Пустые email и телефон допустимы, как и в check_email/check_phone
+    if field == 'phone':
+        text = text.str.replace(' ', '', regex=False)
+    pattern = EMAIL_PATTERN if field == 'email' else PHONE_PATTERN
+    matched = text.str.match(pattern.pattern).to_numpy(dtype=bool)
+    return [(present & ~matched, f'invalid_{field}')]
+
+
+def validate_frame(table_name: str, df):
+    """
+    Проверка DataFrame с записями таблицы table_name.
+
+    Возвращает Series кодов ошибок с индексом df (None - строка корректна;
+    пропуски NaN считаются пустыми значениями). Каждое поле проверяется
+    целым столбцом: числа - через pd.to_numeric, строки - методами .str
+    (strip, match) с теми же шаблонами, что и в validate_rows. Для
+    столбцов string[pyarrow] методы .str выполняются в Arrow; без pyarrow
+    pandas применяет их к значениям по одному.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes = np.full(len(df), None, dtype=object)
+    pending = np.ones(len(df), dtype=bool)
+    for field in TABLE_FIELDS.get(table_name, ()):
+        if field not in df.columns:
+            continue
+        for mask, code in _column_errors(field, df[field]):
+            mask = pending & mask
+            codes[mask] = code
+            pending &= ~mask
+    return pd.Series(codes, index=df.index, dtype=object)
@@ -0,0 +1,342 @@
+"""
+Вспомогательные виджеты графического интерфейса
+"""
+
+import bisect
+from tkinter import ttk
+from typing import Callable, List, Optional
+
+from db import Page, PAGE_SIZE
+from tasks import TaskRunner
+
+# Функция выборки страницы: (ключ, размер, направление) -> Page
+FetchPage = Callable[[Optional[tuple], int, str], Page]
+
+
+class VirtualTreeview:
+    """
+    Виртуализированный список на основе ttk.Treeview.
+
+    В дереве хранится только окно из нескольких страниц вокруг видимой
+    области; при прокрутке к краю окна следующая страница подгружается из
+    базы, а самая дальняя удаляется. Идентификатор элемента - первая
+    колонка строки (ID записи), key - функция ключа сортировки строки.
+    """
+
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar, fetch_page: FetchPage,
+                 key: Callable[[tuple], tuple], descending: bool = False,
+                 format_row: Optional[Callable[[tuple], tuple]] = None,
+                 page_size: int = PAGE_SIZE, max_pages: int = 5, threshold: float = 0.1):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.fetch_page = fetch_page
+        self.key = key
+        self.descending = descending
+        self.format_row = format_row or (lambda row: row)
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.threshold = threshold
+
+        # Ключи строк окна в порядке дерева и размеры загруженных страниц
+        self.keys: List[tuple] = []
+        self.page_counts: List[int] = []
+        self.has_prev = False
+        self.has_next = False
+        self._loading = False
+
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.scrollbar.configure(command=self.tree.yview)
+
+    def fetch_first(self) -> Page:
+        """Выборка первой страницы (может выполняться в фоновом потоке)"""
+        return self.fetch_page(None, self.page_size, 'next')
+
+    def reset(self, page: Optional[Page] = None):
+        """Перезагрузка списка с первой страницы (или с заранее выбранной page)"""
+        if page is None:
+            page = self.fetch_first()
+
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self.keys = []
+        self.page_counts = []
+        self.has_prev = False
+        self.has_next = False
+
+        self._append(page)
+        self.tree.yview_moveto(0)
+
+    def _insert_rows(self, rows: List[tuple], index: int) -> int:
+        """Вставка строк начиная с позиции index; уже показанные строки пропускаются"""
+        inserted = 0
+        for row in rows:
+            iid = str(row[0])
+            if self.tree.exists(iid):
+                continue
+            self.tree.insert('', index + inserted, iid=iid, values=self.format_row(row))
+            self.keys.insert(index + inserted, self.key(row))
+            inserted += 1
+        return inserted
+
+    def _append(self, page: Page):
+        """Добавление страницы в конец окна"""
+        self.has_next = page.has_more
+        count = self._insert_rows(page.rows, len(self.keys))
+        if count:
+            self.page_counts.append(count)
+
+    def _prepend(self, page: Page):
+        """Добавление страницы в начало окна"""
+        self.has_prev = page.has_more
+        count = self._insert_rows(page.rows, 0)
+        if count:
+            self.page_counts.insert(0, count)
+        return count
+
+    def _delete_range(self, start: int, end: int):
+        """Удаление строк окна с позициями [start, end)"""
+        children = self.tree.get_children()[start:end]
+        if children:
+            self.tree.delete(*children)
+        del self.keys[start:end]
+
+    def _top_index(self) -> int:
+        """Индекс первой видимой строки"""
+        if not self.keys:
+            return 0
+        first, _ = self.tree.yview()
+        return int(round(first * len(self.keys)))
+
+    def _move_to(self, index: int):
+        """Прокрутка к строке с индексом index, не вызывая повторной подгрузки"""
+        if self.keys:
+            self.tree.yview_moveto(max(index, 0) / len(self.keys))
+
+    def load_next(self):
+        """Подгрузка следующей страницы и удаление самой верхней"""
+        if not self.has_next or not self.keys:
+            return
+        top = self._top_index()
+        self._append(self.fetch_page(self.keys[-1], self.page_size, 'next'))
+        if len(self.page_counts) > self.max_pages:
+            count = self.page_counts.pop(0)
+            self._delete_range(0, count)
+            self.has_prev = True
+            top -= count
+        self._move_to(top)
+
+    def load_prev(self):
+        """Подгрузка предыдущей страницы и удаление самой нижней"""
+        if not self.has_prev or not self.keys:
+            return
+        top = self._top_index() + self._prepend(self.fetch_page(self.keys[0], self.page_size, 'prev'))
+        if len(self.page_counts) > self.max_pages:
+            count = self.page_counts.pop()
+            self._delete_range(len(self.keys) - count, len(self.keys))
+            self.has_next = True
+        self._move_to(top)
+
+    def apply_insert(self, row: tuple):
+        """
+        Вставка новой строки без перезагрузки списка.
+
+        Строка добавляется на свое место по ключу, если оно попадает в
+        загруженное окно; иначе она появится при прокрутке к ней.
+        """
+        key = self.key(row)
+        # Позиция в окне с учетом направления сортировки
+        if self.descending:
+            index = len(self.keys) - bisect.bisect_left(self.keys[::-1], key)
+        else:
+            index = bisect.bisect_right(self.keys, key)
+        if (index == 0 and self.has_prev) or (index == len(self.keys) and self.has_next):
+            return
+        if not self._insert_rows([row], index):
+            return
+
+        # Строка учитывается в странице, в которую она попала
+        if not self.page_counts:
+            self.page_counts.append(1)
+            return
+        position = 0
+        for page_index, count in enumerate(self.page_counts):
+            position += count
+            if index < position or page_index == len(self.page_counts) - 1:
+                self.page_counts[page_index] += 1
+                break
+
+    def apply_update(self, row: tuple):
+        """Обновление значений показанной строки"""
+        iid = str(row[0])
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.format_row(row))
+
+    def _on_tree_scroll(self, first: str, last: str):
+        """Обработчик прокрутки: синхронизация полосы и подгрузка у краев окна"""
+        self.scrollbar.set(first, last)
+        if self._loading:
+            return
+        if float(last) >= 1.0 - self.threshold and self.has_next:
+            self._schedule(self.load_next)
+        elif float(first) <= self.threshold and self.has_prev:
+            self._schedule(self.load_prev)
+
+    def _schedule(self, loader: Callable[[], None]):
+        """Подгрузка вне обработчика прокрутки, чтобы не менять дерево во время перерисовки"""
+        self._loading = True
+
+        def run():
+            try:
+                loader()
+            finally:
+                self._loading = False
+
+        self.tree.after_idle(run)
+
+
+class LazyChoices:
+    """
+    Список значений комбобокса, загружаемый постранично при открытии.
+
+    Страницы выбираются в фоновом потоке через TaskRunner (без runner -
+    сразу, в вызывающем потоке): первая - при первом открытии списка,
+    следующие - при выборе последнего значения MORE_LABEL. Загруженная
+    страница видна при следующем открытии списка. После загрузки новые
+    записи добавляются на свое место по ключу без повторной выборки.
+    Строки списка хранятся вместе со значениями, поэтому выбранную запись
+    можно получить без запроса к базе.
+    """
+
+    MORE_LABEL = "Загрузить еще..."
+    LOADING_LABEL = "Загрузка..."
+
+    def __init__(self, combo: ttk.Combobox, fetch_page: FetchPage, key: Callable[[tuple], tuple],
+                 format_row: Callable[[tuple], str], page_size: int = PAGE_SIZE,
+                 runner: Optional[TaskRunner] = None, task_key: str = 'choices'):
+        self.combo = combo
+        self.fetch_page = fetch_page
+        self.key = key
+        self.format_row = format_row
+        self.page_size = page_size
+        self.runner = runner
+        self.task_key = task_key
+        self.keys: Optional[List[tuple]] = None
+        self.values: List[str] = []
+        self.rows: List[tuple] = []
+        self.has_more = False
+        self._loading = False
+        # Номер загрузки: страницы, выбранные до invalidate, отбрасываются
+        self._generation = 0
+        self.combo.configure(postcommand=self.load)
+        self.combo.bind('<<ComboboxSelected>>', self._on_select, add='+')
+
+    def load(self):
+        """Загрузка первой страницы при первом открытии списка"""
+        if self.keys is None:
+            self._request(None)
+
+    def load_more(self):
+        """Загрузка следующей страницы после уже загруженных"""
+        if self.keys and self.has_more:
+            self._request(self.keys[-1])
+
+    def _request(self, after: Optional[tuple]):
+        """Выборка страницы после ключа after в фоне; результат - в _add_page"""
+        if self._loading:
+            return
+        generation = self._generation
+
+        def fetch(task=None) -> Page:
+            return self.fetch_page(after, self.page_size, 'next')
+
+        def on_page(page: Page):
+            self._add_page(page, generation)
+
+        if self.runner is None:
+            on_page(fetch())
+            return
+
+        def on_failure(*_):
+            self._loading = False
+            self._show()
+
+        if self.runner.submit(self.task_key, fetch, on_success=on_page,
+                              on_error=on_failure, on_cancel=on_failure):
+            self._loading = True
+            self._show()
+
+    def _add_page(self, page: Page, generation: int):
+        """Добавление выбранной страницы в конец списка (в потоке интерфейса)"""
+        self._loading = False
+        if generation != self._generation:
+            return
+        if self.keys is None:
+            self.keys, self.values, self.rows = [], [], []
+        for row in page.rows:
+            self.keys.append(self.key(row))
+            self.values.append(self.format_row(row))
+            self.rows.append(row)
+        self.has_more = page.has_more
+        self._show()
+
+    def _show(self):
+        """Передача значений комбобоксу (со служебной последней строкой)"""
+        if self._loading:
+            tail = [self.LOADING_LABEL]
+        elif self.has_more:
+            tail = [self.MORE_LABEL]
+        else:
+            tail = []
+        self.combo['values'] = self.values + tail
+
+    def _on_select(self, event=None):
+        """Выбор служебной строки подгружает следующую страницу"""
+        if self.keys is not None and self.combo.current() >= len(self.rows):
+            self.combo.set('')
+            self.load_more()
+
+    def invalidate(self):
+        """Сброс списка: он будет загружен заново при следующем открытии"""
+        self._generation += 1
+        self._loading = False
+        self.keys = None
+        self.values = []
+        self.rows = []
+        self.has_more = False
+
+    def selected_row(self) -> Optional[tuple]:
+        """Строка выбранного значения (None, если ничего не выбрано)"""
+        index = self.combo.current()
+        if self.keys is None or not 0 <= index < len(self.rows):
+            return None
+        return self.rows[index]
+
+    def apply_insert(self, row: tuple):
+        """
+        Добавление новой записи в уже загруженный список.
+
+        Запись после последней загруженной не добавляется, если есть
+        незагруженные страницы: она появится с ними.
+        """
+        if self.keys is None:
+            return
+        key = self.key(row)
+        index = bisect.bisect_right(self.keys, key)
+        if index == len(self.keys) and self.has_more:
+            return
+        self.keys.insert(index, key)
+        self.values.insert(index, self.format_row(row))
+        self.rows.insert(index, row)
+        self._show()
+
+    def apply_update(self, row: tuple):
+        """Обновление записи уже загруженного списка (ключ записи не меняется)"""
+        if self.keys is None:
+            return
+        key = self.key(row)
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            self.values[index] = self.format_row(row)
+            self.rows[index] = row
+            self._show()